@@ -0,0 +1,250 @@
+"""
+Benchmarks of the storage backends and MovieApp commands on synthetic catalogs.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_catalog --sizes 1000,10000 --output bench.json
+    python -m benchmarks.bench_catalog --sizes 1000,10000 --compare bench.json
+
+Every catalog size runs in its own child process, so the reported peak RSS belongs to that size.
+The results are written as JSON and can be compared against an earlier run to find regressions.
+"""
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+WORDS = ["Star", "Dark", "Night", "Iron", "Man", "Return", "Lost", "City", "Dream", "War", "King",
+         "Love", "Ghost", "Storm", "River", "Empire", "Secret", "Last", "First", "Shadow"]
+
+
+def generate_catalog(size: int, seed: int = 42):
+    """
+    Generates a synthetic catalog in the dictionary format of the data files.
+
+    Args:
+        size (int): Number of movies.
+        seed (int): Seed of the random generator, the same seed gives the same catalog.
+
+    Returns:
+        dict: Movie title mapped to a dictionary with "year", "rating" and "poster_url".
+    """
+    generator = random.Random(seed)
+    catalog = {}
+    for number in range(size):
+        title = f"{' '.join(generator.sample(WORDS, 3))} {number}"
+        catalog[title] = {
+            "year": str(generator.randint(1920, 2024)),
+            "rating": f"{generator.randint(10, 100) / 10}/10",
+            "poster_url": f"https://posters.example.com/{number}.jpg",
+        }
+    return catalog
+
+
+def measure(operation, prepare=None, repeat: int = 3, trace_allocations: bool = True):
+    """
+    Measures wall time, allocations and peak RSS of an operation.
+
+    Args:
+        operation: Function without arguments to measure.
+        prepare: Function without arguments called before every run and not measured, e.g. to drop a cache.
+        repeat (int): Number of timed runs, the fastest one is reported.
+        trace_allocations (bool): If True, one extra run is made with tracemalloc switched on.
+
+    Returns:
+        dict: "seconds", "peak_alloc_bytes", "net_alloc_blocks" and "rss_peak_kb" of the process so far.
+    """
+    timings = []
+    for _ in range(repeat):
+        if prepare:
+            prepare()
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+    result = {"seconds": min(timings), "peak_alloc_bytes": None, "net_alloc_blocks": None}
+    if trace_allocations:
+        if prepare:
+            prepare()
+        blocks_before = sys.getallocatedblocks()
+        tracemalloc.start()
+        operation()
+        result["peak_alloc_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        result["net_alloc_blocks"] = sys.getallocatedblocks() - blocks_before
+    result["rss_peak_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+@contextlib.contextmanager
+def scripted_input(*answers):
+    """
+    Answers input() prompts of MovieApp commands and swallows their output.
+
+    Args:
+        *answers (str): The answers, repeated from the start when they are used up.
+    """
+    original_input = builtins.input
+    position = [0]
+
+    def fake_input(prompt=""):
+        answer = answers[position[0] % len(answers)]
+        position[0] += 1
+        return answer
+
+    builtins.input = fake_input
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        builtins.input = original_input
+
+
+def run_size(size: int, repeat: int, trace_allocations: bool):
+    """
+    Runs all benchmarks for one catalog size in a fresh working directory.
+
+    Args:
+        size (int): Number of movies in the synthetic catalog.
+        repeat (int): Number of timed runs per operation.
+        trace_allocations (bool): If True, allocations are traced in one extra run per operation.
+
+    Returns:
+        list: One result dictionary per backend and operation.
+    """
+    sys.path.insert(0, REPO_ROOT)
+    from storage.movie import Movie
+    from storage.storage_csv import StorageCsv
+    from storage.storage_json import StorageJson
+    from movie_app.movie_app import MovieApp
+    from movie_app.generate_website import generate_website
+
+    work_dir = tempfile.mkdtemp(prefix="movie_bench_")
+    os.chdir(work_dir)
+    os.makedirs("static")
+    for file_name in ("index_template.html", "style.css"):
+        shutil.copy(os.path.join(REPO_ROOT, "static", file_name), "static")
+    catalog = {title: Movie.from_dict(title, info) for title, info in generate_catalog(size).items()}
+    titles = list(catalog)
+    results = []
+
+    def record(backend, operation_name, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = measure(repeat=repeat, trace_allocations=trace_allocations, **kwargs)
+        result.update({"size": size, "backend": backend, "operation": operation_name})
+        results.append(result)
+
+    try:
+        for backend, storage in (("json", StorageJson("movies.json")), ("csv", StorageCsv("movies.csv"))):
+            record(backend, "write_movies", operation=lambda: storage.write_movies(dict(catalog)))
+            record(backend, "read_movies", operation=storage.read_movies, prepare=storage.cache.invalidate)
+            record(backend, "read_movies_cached", operation=storage.read_movies, prepare=storage.read_movies)
+            record(backend, "add_movie", operation=lambda: storage.add_movie("Benchmark Movie", "2020", "5.0/10", "x"),
+                   prepare=lambda: storage.delete_movie("Benchmark Movie"))
+            record(backend, "update_movie", operation=lambda: storage.update_movie(titles[size // 2], 7.5))
+            record(backend, "delete_movie", operation=lambda: storage.delete_movie("Benchmark Movie"),
+                   prepare=lambda: storage.add_movie("Benchmark Movie", "2020", "5.0/10", "x"))
+
+        storage = StorageJson("movies.json")
+        movie_app = MovieApp(storage)
+        movies = storage.read_movies()
+        record("app", "show_stats", operation=lambda: movie_app.show_stats(movies))
+        record("app", "sorted_by_rating", operation=lambda: movie_app.print_movies_sorted_by_rating(movies))
+
+        def sorted_by_year():
+            with scripted_input("y"):
+                movie_app._print_movies_sorted_by_year(movies)
+
+        def filter_movies():
+            with scripted_input("7.5", "1990", "2010"):
+                movie_app.filter_movie(movies)
+
+        def search_movies():
+            with scripted_input("night 12"):
+                movie_app.search_movies(movies)
+
+        record("app", "sorted_by_year", operation=sorted_by_year)
+        record("app", "filter", operation=filter_movies)
+        record("app", "search", operation=search_movies)
+        record("app", "generate_website", operation=lambda: generate_website(movies, force=True, fetch_posters=False))
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(results: list, baseline: list, threshold: float):
+    """
+    Compares the results with an earlier run.
+
+    Args:
+        results (list): Results of this run.
+        baseline (list): Results of the earlier run.
+        threshold (float): Relative slowdown that counts as regression, e.g. 0.2 for 20%.
+
+    Returns:
+        list: One dictionary per regressed operation with both timings and the ratio.
+    """
+    baseline_timings = {(r["size"], r["backend"], r["operation"]): r["seconds"] for r in baseline}
+    regressions = []
+    for result in results:
+        before = baseline_timings.get((result["size"], result["backend"], result["operation"]))
+        if before and result["seconds"] > before * (1 + threshold):
+            regressions.append({"size": result["size"], "backend": result["backend"],
+                                "operation": result["operation"], "baseline_seconds": before,
+                                "seconds": result["seconds"], "ratio": result["seconds"] / before})
+    return regressions
+
+
+def main():
+    """Parses the command line, runs the benchmarks and writes or compares the results."""
+    parser = argparse.ArgumentParser(description="Benchmark storage backends and MovieApp commands.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma separated catalog sizes, default: %(default)s")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per operation, the fastest counts")
+    parser.add_argument("--no-alloc", action="store_true", help="Do not trace allocations (faster)")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown counted as regression")
+    args = parser.parse_args()
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for size in (int(size) for size in args.sizes.split(",")):
+        print(f"Benchmarking {size} movies ...", file=sys.stderr)
+        with context.Pool(1) as pool:
+            results.extend(pool.apply(run_size, (size, args.repeat, not args.no_alloc)))
+
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": args.repeat},
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare, "r") as handle:
+            report["regressions"] = compare(results, json.load(handle)["results"], args.threshold)
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output)
+    else:
+        print(output)
+    if report.get("regressions"):
+        print(f"{len(report['regressions'])} regressions found", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Benchmark of the bulk import against a local stand-in of the OMDB API.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import --titles 300 --concurrency 8 --rate 50 --latency 0.02
+
+A stand-in OMDB server is started in a thread. It answers ?t=<title> requests like the OMDB
+API and misbehaves on purpose: every tenth title is not found, and some titles are answered
+with 429 Too Many Requests, 503 Service Unavailable or a "Request limit reached!" body on their
+first attempts. Above --server-rate requests per second it answers 429 as well. The titles are
+imported twice into a JSON catalog in a temporary folder, cold and again with the warm response
+cache. For every run the time, the import report, the requests seen by the server by answer and
+the highest number of requests started within one second are printed.
+
+The exit status is 1 if a title was not imported or reported as expected, if the client started
+more requests per second than --rate allows, or if the warm run sent a request.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Answers of the first attempts of a title, chosen by title number modulo FAULT_CYCLE.
+FAULT_CYCLE = 7
+FAULTS = {1: (HTTPStatus.SERVICE_UNAVAILABLE,), 2: (HTTPStatus.TOO_MANY_REQUESTS,),
+          3: ("limit",), 4: (HTTPStatus.SERVICE_UNAVAILABLE, HTTPStatus.TOO_MANY_REQUESTS)}
+NOT_FOUND_CYCLE = 10
+
+
+def title_kind(title: str):
+    """
+    Returns how the stand-in server treats a title of the benchmark.
+
+    Args:
+        title (str): A title made by make_titles().
+
+    Returns:
+        tuple: (found (bool), faults (tuple)), faults are the answers of the first attempts.
+    """
+    number = int(title.rsplit(" ", 1)[-1])
+    return number % NOT_FOUND_CYCLE != 0, FAULTS.get(number % FAULT_CYCLE, ())
+
+
+def make_titles(count: int):
+    """
+    Returns the titles imported by the benchmark.
+
+    Args:
+        count (int): Number of titles.
+
+    Returns:
+        list: "Movie <number>" for found titles, "Missing movie <number>" for titles the server does not know.
+    """
+    return [f"Movie {number}" if number % NOT_FOUND_CYCLE else f"Missing movie {number}" for number in range(count)]
+
+
+class OmdbServer(ThreadingHTTPServer):
+    """Stand-in OMDB API with a server-side rate limit and planned faults, counts the answers."""
+
+    daemon_threads = True
+
+
+    def __init__(self, latency: float, server_rate: float):
+        """
+        Starts listening on a free local port.
+
+        Args:
+            latency (float): Seconds every response is delayed, like the round trip to the real API.
+            server_rate (float): Requests per second above which 429 is answered, 0 for no limit.
+        """
+        super().__init__(("127.0.0.1", 0), OmdbRequestHandler)
+        self.latency = latency
+        self.server_rate = server_rate
+        self.lock = threading.Lock()
+        self.attempts = {}
+        self.recent = deque()
+        self.started = []
+        self.counters = {"requests": 0, "found": 0, "not_found": 0, "too_many_requests": 0,
+                         "service_unavailable": 0, "limit_bodies": 0, "rate_limited": 0}
+
+
+    def reset(self):
+        """Clears the counters and the attempts, e.g. before the next run."""
+        with self.lock:
+            self.attempts = {}
+            self.recent = deque()
+            self.started = []
+            self.counters = dict.fromkeys(self.counters, 0)
+
+
+    def register(self, title: str):
+        """
+        Counts a request and decides if it goes over the server-side rate limit.
+
+        Args:
+            title (str): The requested title.
+
+        Returns:
+            tuple: (attempt (int), rate_limited (bool)), attempt counts from 0 per title.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.counters["requests"] += 1
+            self.started.append(now)
+            while self.recent and now - self.recent[0] >= 1:
+                self.recent.popleft()
+            self.recent.append(now)
+            attempt = self.attempts.get(title, 0)
+            self.attempts[title] = attempt + 1
+            return attempt, bool(self.server_rate) and len(self.recent) > self.server_rate
+
+
+    def count(self, name: str):
+        """
+        Increases a counter, safe across the handler threads.
+
+        Args:
+            name (str): Key in counters.
+        """
+        with self.lock:
+            self.counters[name] += 1
+
+
+    def max_per_second(self):
+        """
+        Returns the highest number of requests started within any one second of the run.
+
+        Returns:
+            int: Requests in the busiest one second window.
+        """
+        with self.lock:
+            started = sorted(self.started)
+        busiest = 0
+        first = 0
+        for last, moment in enumerate(started):
+            while moment - started[first] >= 1:
+                first += 1
+            busiest = max(busiest, last - first + 1)
+        return busiest
+
+
+class OmdbRequestHandler(BaseHTTPRequestHandler):
+    """Answers GET /?apikey=...&t=<title> like the OMDB API, with the faults planned by title_kind()."""
+
+    protocol_version = "HTTP/1.1"
+
+
+    def do_GET(self):
+        """Sends the movie, a "Movie not found!" body or the planned fault of this attempt."""
+        server = self.server
+        title = parse_qs(urlsplit(self.path).query).get("t", [""])[0]
+        attempt, rate_limited = server.register(title)
+        time.sleep(server.latency)
+        if rate_limited:
+            server.count("rate_limited")
+            self.send_json(HTTPStatus.TOO_MANY_REQUESTS, {"Response": "False", "Error": "Too many requests"})
+            return
+        found, faults = title_kind(title)
+        fault = faults[attempt] if attempt < len(faults) else None
+        if fault == "limit":
+            server.count("limit_bodies")
+            self.send_json(HTTPStatus.OK, {"Response": "False", "Error": "Request limit reached!"})
+        elif fault == HTTPStatus.TOO_MANY_REQUESTS:
+            server.count("too_many_requests")
+            self.send_json(fault, {"Response": "False", "Error": "Too many requests"})
+        elif fault == HTTPStatus.SERVICE_UNAVAILABLE:
+            server.count("service_unavailable")
+            self.send_json(fault, {"Response": "False", "Error": "Service unavailable"})
+        elif not found:
+            server.count("not_found")
+            self.send_json(HTTPStatus.OK, {"Response": "False", "Error": "Movie not found!"})
+        else:
+            server.count("found")
+            self.send_json(HTTPStatus.OK, {"Title": title, "Year": "2001", "Poster": "N/A", "Response": "True",
+                                           "Ratings": [{"Source": "Internet Movie Database", "Value": "7.1/10"}]})
+
+
+    def send_json(self, status: int, body: dict):
+        """
+        Sends a JSON response.
+
+        Args:
+            status (int): The HTTP status code.
+            body (dict): The response body.
+        """
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+    def log_message(self, format, *args):
+        """Keeps the benchmark output free of access log lines."""
+
+
+def main():
+    """Parses the command line, runs the cold and the warm import and prints the report."""
+    parser = argparse.ArgumentParser(description="Benchmark the bulk import against a local OMDB stand-in.")
+    parser.add_argument("--titles", type=int, default=300, help="Titles to import")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests running at the same time")
+    parser.add_argument("--rate", type=float, default=50, help="Client-side limit of requests per second")
+    parser.add_argument("--server-rate", type=float, default=0,
+                        help="Requests per second above which the server answers 429, 0 for no limit")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds every response is delayed")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per title")
+    parser.add_argument("--backoff", type=float, default=0.05, help="Seconds before the first retry")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    from movie_app.API_Movies import set_response_cache
+    from movie_app.bulk_import import bulk_import
+    from movie_app.omdb_cache import ResponseCache
+    from storage.storage_json import StorageJson
+
+    server = OmdbServer(args.latency, args.server_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    titles = make_titles(args.titles)
+    expected_found = [title for title in titles if title_kind(title)[0]]
+    expected_not_found = [title for title in titles if not title_kind(title)[0]]
+    # The token bucket starts full, so the first second may hold one burst more.
+    allowed_per_second = args.rate + args.concurrency if args.rate else None
+
+    work_dir = tempfile.mkdtemp(prefix="movie_import_")
+    report = {}
+    failed = False
+    try:
+        os.chdir(work_dir)
+        set_response_cache(ResponseCache(os.path.join("data", "omdb_cache.sqlite")))
+        for run in ("cold", "warm"):
+            storage = StorageJson("movies.json")
+            storage.write_movies({})
+            server.reset()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = bulk_import(storage, titles, args.concurrency, retries=args.retries, backoff=args.backoff,
+                                     requests_per_second=args.rate, base_url=base_url)
+            seconds = time.perf_counter() - start
+            max_per_second = server.max_per_second()
+            imported_all = sorted(result["imported"]) == sorted(expected_found) and not result["failed"]
+            not_found_all = sorted(result["not_found"]) == sorted(expected_not_found)
+            rate_kept = allowed_per_second is None or max_per_second <= allowed_per_second
+            failed = (failed or not imported_all or not not_found_all or not rate_kept
+                      or (run == "warm" and server.counters["requests"] > 0))
+            report[run] = {"seconds": seconds, "imported": len(result["imported"]),
+                           "not_found": len(result["not_found"]), "failed": result["failed"],
+                           "server": dict(server.counters), "max_requests_per_second": max_per_second}
+            print(f"{run:>5}: {seconds:6.2f}s, {len(result['imported'])} imported, "
+                  f"{len(result['not_found'])} not found, {len(result['failed'])} failed, "
+                  f"server: {server.counters['requests']} requests ({server.counters['too_many_requests']} 429, "
+                  f"{server.counters['service_unavailable']} 503, {server.counters['limit_bodies']} limit bodies, "
+                  f"{server.counters['rate_limited']} over the server limit), "
+                  f"at most {max_per_second} requests/s (allowed {allowed_per_second or 'any'})")
+            for title, error in result["failed"].items():
+                print(f"       {title}: {error}")
+    finally:
+        set_response_cache(None)
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        server.shutdown()
+        server.server_close()
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=4)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
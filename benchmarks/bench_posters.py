@@ -0,0 +1,202 @@
+"""
+Benchmark of the poster prefetch stage of the website generation against a local image server.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_posters --movies 500 --posters 200 --latency 0.02
+
+A stand-in image server is started in a thread. It answers like a CDN, with ETag and
+Last-Modified, and with 304 Not Modified to conditional requests for unchanged images. The
+website of a synthetic catalog, whose movies share --posters poster URLs, is generated four
+times in a temporary folder: cold, again without changes, after --changed movies with new
+posters were added and, with the revalidation interval run out, after --changed posters were
+replaced on the server. For every run the time, the posters fetched and reused with their bytes
+and the requests and body bytes seen by the server are printed. The exit status is 1 if a
+poster failed, a page links a remote poster or the unchanged run sent a request.
+"""
+import argparse
+import contextlib
+import email.utils
+import glob
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ImageServer(ThreadingHTTPServer):
+    """Stand-in poster server holding a version per image, counts requests and body bytes."""
+
+    daemon_threads = True
+
+
+    def __init__(self, posters: int, image_bytes: int, latency: float):
+        """
+        Starts listening on a free local port.
+
+        Args:
+            posters (int): Number of images, served as /posters/<number>.jpg, more can be added later.
+            image_bytes (int): Size of every image.
+            latency (float): Seconds every response is delayed, like the round trip to a remote server.
+        """
+        super().__init__(("127.0.0.1", 0), ImageRequestHandler)
+        self.posters = posters
+        self.image_bytes = image_bytes
+        self.latency = latency
+        self.versions = [0] * posters
+        self.modified = email.utils.formatdate(time.time() - 3600, usegmt=True)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "not_modified": 0, "body_bytes": 0}
+
+
+    def image(self, number: int):
+        """
+        Returns the current content of an image.
+
+        Args:
+            number (int): Number of the image.
+
+        Returns:
+            bytes: The image data, it changes with the version of the image.
+        """
+        seed = f"{number}-{self.versions[number]}".encode()
+        return (seed * (self.image_bytes // len(seed) + 1))[:self.image_bytes]
+
+
+    def count(self, name: str, amount: int = 1):
+        """
+        Increases a counter, safe across the handler threads.
+
+        Args:
+            name (str): Key in counters.
+            amount (int): Amount to add.
+        """
+        with self.lock:
+            self.counters[name] += amount
+
+
+class ImageRequestHandler(BaseHTTPRequestHandler):
+    """Answers GET /posters/<number>.jpg, conditional requests with 304 if the image did not change."""
+
+    protocol_version = "HTTP/1.1"
+
+
+    def do_GET(self):
+        """Sends the image, or 304 if the validators of the client match."""
+        server = self.server
+        server.count("requests")
+        time.sleep(server.latency)
+        name = self.path.rsplit("/", 1)[-1].removesuffix(".jpg")
+        if not self.path.startswith("/posters/") or not name.isdigit() or int(name) >= server.posters:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        number = int(name)
+        etag = f'"{number}-{server.versions[number]}"'
+        if self.headers.get("If-None-Match") == etag:
+            server.count("not_modified")
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = server.image(number)
+        server.count("body_bytes", len(body))
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", server.modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args):
+        """Keeps the benchmark output free of access log lines."""
+
+
+def main():
+    """Parses the command line, runs the three generations and prints the report."""
+    parser = argparse.ArgumentParser(description="Benchmark the poster prefetch against a local image server.")
+    parser.add_argument("--movies", type=int, default=500, help="Movies in the synthetic catalog")
+    parser.add_argument("--posters", type=int, default=200, help="Distinct poster URLs, shared by the movies")
+    parser.add_argument("--image-bytes", type=int, default=30000, help="Size of every poster")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds every image response is delayed")
+    parser.add_argument("--changed", type=int, default=10,
+                        help="Movies with new posters added before the third run, posters replaced before the fourth")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    from benchmarks.bench_catalog import generate_catalog
+    from movie_app import generate_website as website
+    from storage.movie import Movie
+
+    server = ImageServer(args.posters, args.image_bytes, args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/posters/"
+    catalog = {}
+    for number, (title, info) in enumerate(generate_catalog(args.movies).items()):
+        info["poster_url"] = f"{base_url}{number % args.posters}.jpg"
+        catalog[title] = Movie.from_dict(title, info)
+
+    work_dir = tempfile.mkdtemp(prefix="movie_posters_")
+    report = {}
+    failed = False
+    revalidate_seconds = website.POSTER_REVALIDATE_SECONDS
+    try:
+        os.chdir(work_dir)
+        os.makedirs("static")
+        for file_name in ("index_template.html", "style.css"):
+            shutil.copy(os.path.join(REPO_ROOT, "static", file_name), "static")
+        for run in ("cold", "unchanged", "new", "revalidate"):
+            if run == "new":
+                server.posters += args.changed
+                server.versions += [0] * args.changed
+                for number in range(args.posters, server.posters):
+                    catalog[f"New movie {number}"] = Movie(f"New movie {number}", "2024", "7.0/10",
+                                                           f"{base_url}{number}.jpg")
+            elif run == "revalidate":
+                website.POSTER_REVALIDATE_SECONDS = 0
+                for number in range(min(args.changed, args.posters)):
+                    server.versions[number] += 1
+            server.counters = dict.fromkeys(server.counters, 0)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = website.generate_website(catalog, cards_per_page=100, fetch_posters=True)
+            seconds = time.perf_counter() - start
+            if result is None:
+                raise RuntimeError("The website could not be generated")
+            posters = result["posters"] or {"fetched": 0, "reused": 0, "failed": 0, "bytes_fetched": 0,
+                                            "bytes_reused": 0}
+            remote_links = sum(open(path).read().count(base_url) for path in glob.glob(os.path.join("static", "*.html")))
+            failed = (failed or posters["failed"] > 0 or remote_links > 0
+                      or (run == "unchanged" and server.counters["requests"] > 0))
+            report[run] = dict(posters, seconds=seconds, skipped=result["skipped"], server=dict(server.counters),
+                               remote_links=remote_links)
+            print(f"{run:>10}: {seconds:6.2f}s, {'skipped, ' if result['skipped'] else ''}"
+                  f"{posters['fetched']:>4} fetched ({posters['bytes_fetched'] // 1024} KB), "
+                  f"{posters['reused']:>4} reused ({posters['bytes_reused'] // 1024} KB), {posters['failed']} failed, "
+                  f"server: {server.counters['requests']} requests, {server.counters['not_modified']} not modified, "
+                  f"{server.counters['body_bytes'] // 1024} KB sent")
+    finally:
+        website.POSTER_REVALIDATE_SECONDS = revalidate_seconds
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        server.shutdown()
+        server.server_close()
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=4)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Load test of the JSON API in movie_app/api_server.py.
+
+Run from the repository root:
+
+    python -m benchmarks.load_api --movies 10000 --connections 32 --seconds 10
+    python -m benchmarks.load_api --url http://127.0.0.1:8000 --write-ratio 0.1
+
+Without --url a server is started on a synthetic catalog in a temporary folder.
+Every connection sends requests one after the other over a kept-alive connection,
+a mix of the read endpoints and, with --write-ratio, rating updates. At the end the
+requests per second and the p50/p99 latency overall and per endpoint are printed.
+The exit status is 1 if a request failed.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote, urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READ_ENDPOINTS = ["list", "sorted", "search", "filter", "stats", "movie"]
+SEARCH_WORDS = ["star", "dark", "night", "iron", "city", "dream", "king", "lost"]
+
+
+def percentile(latencies: list, percent: float):
+    """
+    Returns the nearest-rank percentile of sorted latencies.
+
+    Args:
+        latencies (list): Latencies in seconds, sorted ascending.
+        percent (float): The percentile, e.g. 99.
+
+    Returns:
+        float: The latency in milliseconds, 0 if there are none.
+    """
+    if not latencies:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(latencies)) - 1, 0)
+    return latencies[rank] * 1000
+
+
+def build_request(endpoint: str, titles: list, rng: random.Random):
+    """
+    Builds one request of the load mix.
+
+    Args:
+        endpoint (str): One of READ_ENDPOINTS or "update".
+        titles (list): Titles of the catalog, for the movie and update requests.
+        rng (random.Random): Random number generator of the connection.
+
+    Returns:
+        tuple: Method, target and body (bytes) of the request.
+    """
+    if endpoint == "list":
+        return "GET", f"/movies?offset={rng.randrange(max(len(titles) - 50, 1))}&limit=50", b""
+    if endpoint == "sorted":
+        return "GET", f"/sorted?by={rng.choice(['year', 'rating'])}&limit=20", b""
+    if endpoint == "search":
+        return "GET", f"/search?q={rng.choice(SEARCH_WORDS)}&limit=20", b""
+    if endpoint == "filter":
+        low = rng.randint(1950, 2015)
+        return "GET", f"/filter?min_rating=7&start_year={low}&end_year={low + 5}&limit=20", b""
+    if endpoint == "stats":
+        return "GET", "/stats", b""
+    target = "/movies/" + quote(rng.choice(titles), safe="")
+    if endpoint == "movie":
+        return "GET", target, b""
+    return "PUT", target, json.dumps({"rating": round(rng.uniform(1, 10), 1)}).encode()
+
+
+async def send(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str, request: tuple):
+    """
+    Sends one request over a kept-alive connection and reads the response.
+
+    Args:
+        reader (asyncio.StreamReader): Reads the response.
+        writer (asyncio.StreamWriter): Writes the request.
+        host (str): Value of the Host header.
+        request (tuple): Method, target and body, see build_request().
+
+    Returns:
+        int: The HTTP status code.
+    """
+    method, target, body = request
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    status = int(head.split(" ", 2)[1])
+    length = 0
+    for line in head.split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def run_connection(host: str, port: int, titles: list, mix: list, deadline: float, seed: int, results: dict):
+    """
+    Sends requests over one connection until the deadline.
+
+    Args:
+        host (str): Address of the server.
+        port (int): Port of the server.
+        titles (list): Titles of the catalog.
+        mix (list): Endpoints to pick from, see build_request().
+        deadline (float): time.perf_counter() value to stop at.
+        seed (int): Seed of the random choices of this connection.
+        results (dict): Endpoint mapped to a list of (latency, status) pairs, filled in.
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            endpoint = rng.choice(mix)
+            request = build_request(endpoint, titles, rng)
+            start = time.perf_counter()
+            status = await send(reader, writer, host, request)
+            results.setdefault(endpoint, []).append((time.perf_counter() - start, status))
+    finally:
+        writer.close()
+
+
+async def fetch_titles(host: str, port: int, count: int = 1000):
+    """
+    Fetches titles of the catalog from the server, for the movie and update requests.
+
+    Args:
+        host (str): Address of the server.
+        port (int): Port of the server.
+        count (int): Number of titles to fetch.
+
+    Returns:
+        list: The titles.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"GET /movies?limit={count} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        response = await reader.read()
+    finally:
+        writer.close()
+    body = json.loads(response.split(b"\r\n\r\n", 1)[1])
+    return [movie["title"] for movie in body["movies"]]
+
+
+async def load_test(host: str, port: int, connections: int, seconds: float, write_ratio: float):
+    """
+    Runs the load test against a running server.
+
+    Args:
+        host (str): Address of the server.
+        port (int): Port of the server.
+        connections (int): Number of concurrent connections.
+        seconds (float): Duration of the test.
+        write_ratio (float): Share of the requests that update a rating.
+
+    Returns:
+        dict: Endpoint mapped to a list of (latency, status) pairs.
+    """
+    titles = await fetch_titles(host, port)
+    if not titles:
+        raise RuntimeError("The catalog of the server is empty")
+    writes = round(write_ratio * 100)
+    mix = READ_ENDPOINTS * ((100 - writes) // len(READ_ENDPOINTS) or 1) + ["update"] * writes
+    results = {}
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(run_connection(host, port, titles, mix, deadline, seed, results)
+                           for seed in range(connections)))
+    return results
+
+
+def start_server(movies: int, work_dir: str, journal: bool = False):
+    """
+    Writes a synthetic catalog to the work directory and starts a server on it.
+
+    Args:
+        movies (int): Number of movies in the catalog.
+        work_dir (str): Working directory of the server, holding the data folder.
+        journal (bool): If True, the server saves changes to the journal of the data file.
+
+    Returns:
+        tuple: The server process and its port.
+    """
+    sys.path.insert(0, REPO_ROOT)
+    from benchmarks.bench_catalog import generate_catalog
+    from storage.movie import Movie
+    from storage.storage_json import StorageJson
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            StorageJson("movies.json").write_movies({title: Movie.from_dict(title, info)
+                                                     for title, info in generate_catalog(movies).items()})
+    finally:
+        os.chdir(previous_dir)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    environment = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    command = [sys.executable, "-m", "movie_app.api_server", "--file", "movies.json", "--port", str(port)]
+    if journal:
+        command.append("--journal")
+    process = subprocess.Popen(command, cwd=work_dir, env=environment, stdout=subprocess.DEVNULL)
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The server exited on startup")
+        with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=1):
+            return process, port
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The server did not start within 60s")
+
+
+def main():
+    """Parses the command line, runs the load test and prints the report."""
+    parser = argparse.ArgumentParser(description="Load test the movie JSON API.")
+    parser.add_argument("--url", help="URL of a running server, by default one is started on a synthetic catalog")
+    parser.add_argument("--movies", type=int, default=10000, help="Movies in the synthetic catalog")
+    parser.add_argument("--connections", type=int, default=32, help="Concurrent connections")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of the test")
+    parser.add_argument("--write-ratio", type=float, default=0.0, help="Share of rating updates, e.g. 0.1")
+    parser.add_argument("--journal", action="store_true", help="Start the server in journal mode")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    process = None
+    work_dir = None
+    try:
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            work_dir = tempfile.mkdtemp(prefix="movie_load_")
+            process, port = start_server(args.movies, work_dir, args.journal)
+            host = "127.0.0.1"
+        results = asyncio.run(load_test(host, port, args.connections, args.seconds, args.write_ratio))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {}
+    samples = [sample for endpoint_samples in results.values() for sample in endpoint_samples]
+    for endpoint, endpoint_samples in [("all", samples)] + sorted(results.items()):
+        latencies = sorted(latency for latency, _ in endpoint_samples)
+        report[endpoint] = {"requests": len(endpoint_samples),
+                            "requests_per_second": len(endpoint_samples) / args.seconds,
+                            "p50_ms": percentile(latencies, 50), "p99_ms": percentile(latencies, 99),
+                            "errors": sum(1 for _, status in endpoint_samples if status >= 400)}
+        print(f"{endpoint:>8}: {report[endpoint]['requests']:>7} requests, "
+              f"{report[endpoint]['requests_per_second']:>8.0f} req/s, p50 {report[endpoint]['p50_ms']:.2f}ms, "
+              f"p99 {report[endpoint]['p99_ms']:.2f}ms, {report[endpoint]['errors']} errors")
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=4)
+    if report["all"]["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
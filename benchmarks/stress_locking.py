@@ -0,0 +1,188 @@
+"""
+Multi-process stress test of the file locking of StorageJson and StorageCsv.
+
+Run from the repository root:
+
+    python -m benchmarks.stress_locking --workers 8 --movies 100
+    python -m benchmarks.stress_locking --backends csv --journal --readers 1,2,4,8
+
+Several processes add movies to the same file at the same time. Afterwards every single
+movie must be in the file, otherwise an update was lost and the script exits with status 1.
+Then the read throughput is measured with a growing number of concurrent readers,
+which share the lock and should scale instead of waiting for each other.
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FILE_NAMES = {"json": "movies.json", "csv": "movies.csv"}
+
+
+def open_storage(backend: str, journal: bool):
+    """
+    Opens the storage of the given backend in the current working directory.
+
+    Args:
+        backend (str): "json" or "csv".
+        journal (bool): If True, the storage works in journal mode.
+
+    Returns:
+        IStorage: The storage object.
+    """
+    sys.path.insert(0, REPO_ROOT)
+    from storage.storage_csv import StorageCsv
+    from storage.storage_json import StorageJson
+    storage_class = StorageJson if backend == "json" else StorageCsv
+    return storage_class(FILE_NAMES[backend], journal=journal, max_journal_records=50)
+
+
+def add_worker(work_dir: str, backend: str, journal: bool, worker: int, count: int):
+    """
+    Adds count movies with titles unique to this worker, one add_movie() per movie.
+
+    Args:
+        work_dir (str): Working directory holding the data folder.
+        backend (str): "json" or "csv".
+        journal (bool): If True, the storage works in journal mode.
+        worker (int): Number of the worker, part of the titles.
+        count (int): Number of movies to add.
+
+    Returns:
+        list: The titles added.
+    """
+    os.chdir(work_dir)
+    storage = open_storage(backend, journal)
+    titles = [f"Worker {worker} Movie {number}" for number in range(count)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for number, title in enumerate(titles):
+            storage.add_movie(title, str(1950 + number % 70), f"{number % 100 / 10}/10", "")
+    return titles
+
+
+def read_worker(work_dir: str, backend: str, journal: bool, seconds: float):
+    """
+    Parses the file again and again for the given time.
+
+    Args:
+        work_dir (str): Working directory holding the data folder.
+        backend (str): "json" or "csv".
+        journal (bool): If True, the storage works in journal mode.
+        seconds (float): How long to read.
+
+    Returns:
+        int: Number of complete reads.
+    """
+    os.chdir(work_dir)
+    storage = open_storage(backend, journal)
+    reads = 0
+    deadline = time.perf_counter() + seconds
+    with contextlib.redirect_stdout(io.StringIO()):
+        while time.perf_counter() < deadline:
+            storage.cache.invalidate()
+            storage.read_movies()
+            reads += 1
+    return reads
+
+
+def stress_writes(backend: str, journal: bool, workers: int, movies: int):
+    """
+    Lets several processes add movies to the same file and checks that none is lost.
+
+    Args:
+        backend (str): "json" or "csv".
+        journal (bool): If True, the storage works in journal mode.
+        workers (int): Number of writing processes.
+        movies (int): Number of movies every process adds.
+
+    Returns:
+        dict: Expected and stored number of movies, the lost titles and the duration.
+    """
+    work_dir = tempfile.mkdtemp(prefix="movie_stress_")
+    try:
+        context = multiprocessing.get_context("spawn")
+        start = time.perf_counter()
+        with context.Pool(workers) as pool:
+            added = pool.starmap(add_worker, [(work_dir, backend, journal, worker, movies)
+                                              for worker in range(workers)])
+        seconds = time.perf_counter() - start
+        os.chdir(work_dir)
+        stored = open_storage(backend, journal).read_movies()
+        expected = [title for titles in added for title in titles]
+        lost = [title for title in expected if title not in stored]
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {"backend": backend, "journal": journal, "expected": len(expected), "stored": len(stored),
+            "lost": lost, "seconds": seconds}
+
+
+def measure_reads(backend: str, journal: bool, readers: list, seconds: float, size: int):
+    """
+    Measures the read throughput with different numbers of concurrent readers.
+
+    Args:
+        backend (str): "json" or "csv".
+        journal (bool): If True, the storage works in journal mode.
+        readers (list): Numbers of concurrent reader processes to try.
+        seconds (float): How long every reader reads.
+        size (int): Number of movies in the file.
+
+    Returns:
+        dict: Number of readers mapped to the total reads per second.
+    """
+    work_dir = tempfile.mkdtemp(prefix="movie_stress_")
+    try:
+        os.chdir(work_dir)
+        storage = open_storage(backend, journal)
+        with contextlib.redirect_stdout(io.StringIO()):
+            storage.add_movies([(f"Movie {number}", "2000", "5.0/10", "") for number in range(size)])
+        throughput = {}
+        context = multiprocessing.get_context("spawn")
+        for count in readers:
+            with context.Pool(count) as pool:
+                reads = pool.starmap(read_worker, [(work_dir, backend, journal, seconds)] * count)
+            throughput[count] = sum(reads) / seconds
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return throughput
+
+
+def main():
+    """Parses the command line, runs the write stress test and the read measurement."""
+    parser = argparse.ArgumentParser(description="Stress test concurrent access to the storage files.")
+    parser.add_argument("--backends", default="json,csv", help="Comma separated backends, default: %(default)s")
+    parser.add_argument("--workers", type=int, default=8, help="Writing processes")
+    parser.add_argument("--movies", type=int, default=50, help="Movies added by every writing process")
+    parser.add_argument("--journal", action="store_true", help="Use the storages in journal mode")
+    parser.add_argument("--readers", default="1,2,4,8", help="Comma separated numbers of concurrent readers")
+    parser.add_argument("--read-seconds", type=float, default=2.0, help="Duration of every read measurement")
+    parser.add_argument("--read-size", type=int, default=5000, help="Movies in the file for the read measurement")
+    args = parser.parse_args()
+
+    failed = False
+    for backend in args.backends.split(","):
+        result = stress_writes(backend, args.journal, args.workers, args.movies)
+        print(f"{backend}: {args.workers} writers added {result['expected']} movies in {result['seconds']:.2f}s, "
+              f"{result['stored']} stored, {len(result['lost'])} lost")
+        if result["lost"]:
+            failed = True
+            print(f"  lost e.g.: {', '.join(result['lost'][:5])}")
+        readers = [int(count) for count in args.readers.split(",")]
+        throughput = measure_reads(backend, args.journal, readers, args.read_seconds, args.read_size)
+        for count, reads_per_second in throughput.items():
+            print(f"{backend}: {count} readers: {reads_per_second:.0f} reads/s "
+                  f"({reads_per_second / throughput[readers[0]]:.1f}x)")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
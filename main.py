@@ -1,14 +1,18 @@
-from storage.storage_csv import StorageCsv
+import sys
+from storage.storage_factory import open_storage
 from movie_app.movie_app import MovieApp
+from movie_app import cli
 
 def main():
-    """Main program sequence of movie project."""
-    #storage = StorageJson('movies.json')
-    #movie_app = MovieApp(storage)
-    #movie_app.run()
-    storage = StorageCsv('movies.csv')
+    """Main program sequence of movie project, with arguments the commands run without the menu."""
+    if len(sys.argv) > 1:
+        sys.exit(cli.main(sys.argv[1:]))
+    storage = open_storage('movies.csv', snapshot=True)
     movie_app = MovieApp(storage)
-    movie_app.run()
+    try:
+        movie_app.run()
+    finally:
+        storage.save_snapshot()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,13 +1,172 @@
 from movie_app.API_Key import KEY
-import requests
+from movie_app.omdb_cache import ResponseCache
+import threading
+import time
+from storage.metrics import add_bytes, instrumented
 
+OMDB_URL = "http://www.omdbapi.com/"
+# Seconds to wait for the connection and for the response.
+REQUEST_TIMEOUT = (3.05, 10)
+# Error of the OMDB API for an unknown title, the only error answer that is cached.
+NOT_FOUND_ERROR = "Movie not found!"
+# Errors of the OMDB API that may go away if the request is sent again later.
+RETRYABLE_ERRORS = ("Request limit reached!", "Something went wrong.")
 
-def api_request_data(title: str):
+_session = None
+_response_cache = None
+_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the shared HTTP session, created on first use.
+
+    The session keeps connections alive and pools them, so repeated requests to the
+    OMDB API do not open a new connection every time. requests is imported here on first
+    use, importing it takes longer than loading a cached catalog, so commands that never
+    call the API start faster.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def get_response_cache():
+    """
+    Returns the shared response cache, opened on first use.
+
+    Returns:
+        ResponseCache or None: The cache, or None if caching was switched off with set_response_cache(None).
+    """
+    global _response_cache
+    with _lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache or None
+
+
+def set_response_cache(response_cache):
+    """
+    Replaces the shared response cache, e.g. with one using another file or TTL.
+
+    Args:
+        response_cache (ResponseCache): The new cache, None to switch caching off.
+    """
+    global _response_cache
+    with _lock:
+        _response_cache = response_cache if response_cache is not None else False
+
+
+def cache_stats():
+    """
+    Returns hit ratio and latency figures of the response cache.
+
+    Returns:
+        dict: See ResponseCache.stats(), empty if caching is switched off.
+    """
+    response_cache = get_response_cache()
+    return response_cache.stats() if response_cache else {}
+
+
+@instrumented("omdb.fetch_movie_infos")
+def fetch_movie_infos(title: str, timeout=REQUEST_TIMEOUT, base_url: str = OMDB_URL, rate_limiter=None):
+    """
+    Sends the title request to the OMDB API (https://www.omdbapi.com/), answered from the cache if possible.
+
+    Found movies and "movie not found" answers are cached, other errors like an invalid API key
+    or a reached request limit are not.
+
+    Parameters:
+        title (str): The title of the movie to search for.
+        timeout: Seconds to wait for the server, a number or a (connect, read) tuple.
+        base_url (str): URL of the OMDB API, can point to a local stand-in server.
+        rate_limiter (RateLimiter): Acquired before a request goes over the network, cache hits are not limited.
+
+    Returns:
+        tuple: (status_code (int), movie_infos (dict)). movie_infos is None if the status is not 200.
+
+    Exceptions:
+        requests.exceptions.RequestException: Raised if there is a network-related error.
+        ValueError: Raised if the response is not valid JSON.
+    """
+    response_cache = get_response_cache()
+    if response_cache:
+        movie_infos = response_cache.get(title)
+        if movie_infos is not None:
+            return 200, movie_infos
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    start = time.perf_counter()
+    api_response = get_session().get(base_url, params={"apikey": KEY, "t": title}, timeout=timeout)
+    add_bytes("omdb.fetch_movie_infos", read=len(api_response.content))
+    if response_cache:
+        response_cache.record_network_request(time.perf_counter() - start)
+    if api_response.status_code != 200:
+        return api_response.status_code, None
+    movie_infos = api_response.json()
+    if response_cache:
+        if parse_movie_infos(movie_infos):
+            response_cache.put(title, movie_infos, True)
+        elif api_error(movie_infos) == NOT_FOUND_ERROR:
+            response_cache.put(title, movie_infos, False)
+    return 200, movie_infos
+
+
+def api_error(movie_infos: dict):
+    """
+    Returns the error message of a decoded OMDB API response.
+
+    Parameters:
+        movie_infos (dict): The JSON body of the API response.
+
+    Returns:
+        str: The "Error" of the response, e.g. NOT_FOUND_ERROR or "Invalid API key!".
+        None: If the response holds no error.
+    """
+    if isinstance(movie_infos, dict) and movie_infos.get("Response") == "False":
+        return movie_infos.get("Error") or "Unknown error"
+    return None
+
+
+def parse_movie_infos(movie_infos: dict):
+    """
+    Extracts the movie details from a decoded OMDB API response.
+
+    Parameters:
+        movie_infos (dict): The JSON body of the API response.
+
+    Returns:
+        tuple: (title, year, rating, poster_url), see api_request_data().
+        False: If expected data is missing, e.g. because the movie was not found.
+    """
+    if "Title" in movie_infos and "Year" in movie_infos and "Poster" in movie_infos:
+        title = movie_infos["Title"]
+        year = movie_infos["Year"]
+        rating = movie_infos["Ratings"][0]["Value"] if movie_infos.get("Ratings") else "No rating available"
+        poster_url = movie_infos["Poster"]
+        return title, year, rating, poster_url
+    return False
+
+
+@instrumented("omdb.api_request_data")
+def api_request_data(title: str, timeout=REQUEST_TIMEOUT, base_url: str = OMDB_URL):
     """
     Fetches movie data from the OMDB API based on the provided movie title. (https://www.omdbapi.com/)
 
     Parameters:
         title (str): The title of the movie to search for.
+        timeout: Seconds to wait for the server, a number or a (connect, read) tuple.
+        base_url (str): URL of the OMDB API, can point to a local stand-in server.
 
     Returns:
         tuple: A tuple containing:
@@ -21,31 +180,25 @@ def api_request_data(title: str):
         requests.exceptions.RequestException: Raised if there is a network-related error.
         KeyError: Raised if an expected key is missing in the API response.
     """
+    import requests
     try:
-        title_request = "&t=" + "+".join(title.split(" "))
-        api_response = requests.get(f"http://www.omdbapi.com/?apikey={KEY}{title_request}")
-        if api_response.status_code == 200:
-            movie_infos = api_response.json()
-            if "Title" in movie_infos and "Year" in movie_infos and "Poster" in movie_infos:
-                title = movie_infos["Title"]
-                year = movie_infos["Year"]
-                rating = movie_infos["Ratings"][0]["Value"] if "Ratings" in movie_infos  else "No rating available"
-                poster_url = movie_infos["Poster"]
-                return title, year, rating, poster_url
+        status_code, movie_infos = fetch_movie_infos(title, timeout, base_url)
+        if status_code == 200:
+            movie_data = parse_movie_infos(movie_infos)
+            if movie_data:
+                return movie_data
             else:
                 print("Error: Missing expected data in the response")
                 return False
         else:
-            print(f"Error: Received a non-OK status code: {api_response.status_code}")
+            print(f"Error: Received a non-OK status code: {status_code}")
             return False
     except requests.exceptions.RequestException as e:
-        return f"Network error occurred: {e}"
+        print(f"Network error occurred: {e}")
+        return False
     except ValueError as e:
-        return f"Error translation json response: {e}"
+        print(f"Error translation json response: {e}")
+        return False
     except KeyError as e:
-        return f"Key error, key nicht vorhanden: Missing {e} in the response"
-
-
-
-
-
+        print(f"Key error, key nicht vorhanden: Missing {e} in the response")
+        return False
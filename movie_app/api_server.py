@@ -0,0 +1,548 @@
+"""
+HTTP JSON API of the movie app, built on asyncio from the standard library.
+
+    python -m movie_app.api_server --file movies.csv --port 8000
+
+    GET    /movies?offset=0&limit=50                  movies in file order
+    GET    /sorted?by=rating&order=desc&offset&limit  movies sorted by year or rating
+    GET    /search?q=matrix&offset&limit              best matches first, typo-tolerant
+    GET    /filter?min_rating&max_rating&start_year&end_year&offset&limit
+    GET    /stats                                     average, median, best and worst rating
+    GET    /movies/<title>                            one movie, title case-insensitive
+    POST   /movies       {"title", "year", "rating", "poster_url"}, without year and rating from OMDB
+    PUT    /movies/<title>   {"rating": 8.5}
+    DELETE /movies/<title>
+
+The catalog is loaded once and pinned in memory (see IStorage.pinned()), reads are answered
+from it and its indexes without touching the disk. All changes go through one writer task:
+it takes every change that is waiting, applies them in one storage batch and answers the
+requests after the file was written, so many concurrent writes share one write of the file.
+The changes are applied in memory on the event loop, the file is written in a worker thread,
+so reads are answered meanwhile. With --journal a change only appends to the log instead.
+Lists are paginated with offset and limit, the response holds the total number of matches
+(None for search, which only ranks the matches up to the requested page) and has_more.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+from http import HTTPStatus
+from itertools import islice
+from urllib.parse import parse_qs, unquote, urlsplit
+from storage.storage_factory import open_storage
+from storage.movie import Movie
+from movie_app.API_Movies import api_request_data
+from movie_app.cli import DEFAULT_FILE, movie_to_json, stats_to_json
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class HTTPError(Exception):
+    """An error answered with the given HTTP status and a JSON {"error": message} body."""
+
+    def __init__(self, status: int, message: str):
+        """
+        Initializes the HTTPError.
+
+        Args:
+            status (int): The HTTP status code, e.g. 404.
+            message (str): Description of the error for the client.
+        """
+        super().__init__(message)
+        self.status = status
+
+
+def query_int(query: dict, name: str, default: int = None):
+    """
+    Reads an integer query parameter.
+
+    Args:
+        query (dict): The parsed query string, see urllib.parse.parse_qs().
+        name (str): Name of the parameter.
+        default (int): Value if the parameter is missing.
+
+    Returns:
+        int: The value of the parameter.
+
+    Raises:
+        HTTPError: 400, if the value is not an integer.
+    """
+    if name not in query:
+        return default
+    try:
+        return int(query[name][-1])
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer")
+
+
+def query_float(query: dict, name: str):
+    """
+    Reads a number query parameter.
+
+    Args:
+        query (dict): The parsed query string, see urllib.parse.parse_qs().
+        name (str): Name of the parameter.
+
+    Returns:
+        float or None: The value of the parameter, None if it is missing.
+
+    Raises:
+        HTTPError: 400, if the value is not a number.
+    """
+    if name not in query:
+        return None
+    try:
+        return float(query[name][-1])
+    except ValueError:
+        raise HTTPError(400, f"{name} must be a number")
+
+
+def page_range(query: dict):
+    """
+    Reads the pagination parameters offset (default 0) and limit (default DEFAULT_LIMIT).
+
+    Args:
+        query (dict): The parsed query string.
+
+    Returns:
+        tuple: offset and limit.
+
+    Raises:
+        HTTPError: 400, if offset or limit are out of range.
+    """
+    offset = query_int(query, "offset", 0)
+    limit = query_int(query, "limit", DEFAULT_LIMIT)
+    if offset < 0 or not 0 < limit <= MAX_LIMIT:
+        raise HTTPError(400, f"offset must not be negative, limit must be between 1 and {MAX_LIMIT}")
+    return offset, limit
+
+
+def paginate(titles, total, movies: dict, query: dict):
+    """
+    Returns one page of movies.
+
+    Args:
+        titles: Iterable of the matching titles in the order of the response, at least up to the end of the page.
+        total (int): Number of matching titles, None if only the titles up to the next page are known.
+        movies (dict): The movie data, the Movie records of the page are looked up in it.
+        query (dict): The parsed query string with the optional offset and limit parameters.
+
+    Returns:
+        dict: "total", "offset", "limit", "has_more" and the "movies" of the page in the JSON output format.
+
+    Raises:
+        HTTPError: 400, if offset or limit are out of range.
+    """
+    offset, limit = page_range(query)
+    titles = list(islice(titles, offset, offset + limit + 1))
+    page = [movie_to_json(title, movies[title]) for title in titles[:limit]]
+    return {"total": total, "offset": offset, "limit": limit, "has_more": len(titles) > limit, "movies": page}
+
+
+class MovieApiServer:
+    """Serves the operations of the movie app as a JSON API on top of any IStorage backend."""
+
+    def __init__(self, storage):
+        """
+        Initializes the MovieApiServer.
+
+        Args:
+            storage (IStorage): The storage the API works on.
+        """
+        self.storage = storage
+        self.changes = None
+        self.read_routes = {
+            "/movies": self.list_movies,
+            "/sorted": self.sorted_movies,
+            "/search": self.search_movies,
+            "/filter": self.filter_movies,
+            "/stats": self.show_stats,
+        }
+
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000, ready=None):
+        """
+        Loads the catalog and answers requests until the task is cancelled.
+
+        Args:
+            host (str): Address to listen on.
+            port (int): Port to listen on, 0 for any free port.
+            ready (asyncio.Future): If given, set to the (host, port) the server listens on once it accepts requests.
+        """
+        with self.storage.pinned():
+            self.changes = asyncio.Queue()
+            writer_task = asyncio.create_task(self.write_changes())
+            server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+            address = server.sockets[0].getsockname()[:2]
+            print(f"Serving {self.storage.file_path} on http://{address[0]}:{address[1]}")
+            if ready is not None:
+                ready.set_result(address)
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                writer_task.cancel()
+
+
+    async def write_changes(self):
+        """
+        The single writer task, applies the waiting changes in one batch and resolves their futures.
+
+        A change is a (function, future) pair. The function changes the storage and returns the
+        response body, or raises HTTPError. The futures are resolved after the batch was written.
+        In journal mode every change only appends to the log, so no batch is needed, and a change
+        failing with an unexpected error only fails its own request. Without journal such an error
+        rolls back the batch and fails all of its changes.
+
+        The changes run on the event loop, as the readers use the same movie data. Only the end of
+        the batch, which writes the file, runs in a worker thread. Meanwhile the readers go on and
+        nothing changes the data, the next changes wait for this task.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            changes = [await self.changes.get()]
+            while not self.changes.empty():
+                changes.append(self.changes.get_nowait())
+            results = []
+            journal = self.storage.journal is not None
+            try:
+                batch = contextlib.nullcontext() if journal else self.storage.batch()
+                with contextlib.redirect_stdout(io.StringIO()), contextlib.ExitStack() as stack:
+                    stack.enter_context(batch)
+                    for change, future in changes:
+                        try:
+                            results.append((future, change(), None))
+                        except HTTPError as e:
+                            results.append((future, None, e))
+                        except Exception as e:
+                            if not journal:
+                                raise
+                            # The changes before this one are already appended to the log.
+                            results.append((future, None, HTTPError(500, f"Change could not be saved: {e}")))
+                    pending_write = stack.pop_all()
+                await loop.run_in_executor(None, pending_write.close)
+            except Exception as e:
+                # Without journal the batch was rolled back, none of the changes was saved.
+                results = [(future, None, HTTPError(500, f"Changes could not be saved: {e}"))
+                           for _, future in changes]
+            for future, result, error in results:
+                if future.cancelled():
+                    continue
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+
+    async def submit(self, change):
+        """
+        Hands a change to the writer task and waits until it was saved.
+
+        Args:
+            change: Function changing the storage, see write_changes().
+
+        Returns:
+            The response body returned by the function.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.changes.put((change, future))
+        return await future
+
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Answers the requests of one connection, kept alive between requests unless the client closes it.
+
+        Args:
+            reader (asyncio.StreamReader): Reads the requests.
+            writer (asyncio.StreamWriter): Writes the responses.
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, 431, {"error": "Request header too large"}, False)
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.split(" ")
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Malformed request line"}, False)
+                    break
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                length = int(headers.get("content-length", "0") or 0)
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {"error": "Request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, response = await self.dispatch(method, target, body)
+                await self.respond(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+    async def respond(self, writer: asyncio.StreamWriter, status: int, response: dict, keep_alive: bool):
+        """
+        Writes one JSON response.
+
+        Args:
+            writer (asyncio.StreamWriter): Writes the response.
+            status (int): The HTTP status code.
+            response (dict): The response body.
+            keep_alive (bool): If False, the client is told that the connection is closed.
+        """
+        body = json.dumps(response).encode()
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+    async def dispatch(self, method: str, target: str, body: bytes):
+        """
+        Routes a request to its operation.
+
+        Args:
+            method (str): The HTTP method.
+            target (str): The request target, path and query string.
+            body (bytes): The request body.
+
+        Returns:
+            tuple: The HTTP status code and the response body.
+        """
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        try:
+            if url.path in self.read_routes:
+                if method == "POST" and url.path == "/movies":
+                    return 201, await self.add_movie(self.parse_body(body))
+                if method != "GET":
+                    raise HTTPError(405, f"{method} is not allowed on {url.path}")
+                return 200, self.read_routes[url.path](query)
+            if url.path.startswith("/movies/") and len(url.path) > len("/movies/"):
+                title = unquote(url.path[len("/movies/"):])
+                if method == "GET":
+                    return 200, self.get_movie(title)
+                if method == "PUT":
+                    return 200, await self.update_movie(title, self.parse_body(body))
+                if method == "DELETE":
+                    return 200, await self.delete_movie(title)
+                raise HTTPError(405, f"{method} is not allowed on /movies/<title>")
+            raise HTTPError(404, f"No such endpoint {url.path}")
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+
+
+    def parse_body(self, body: bytes):
+        """
+        Parses a JSON object request body.
+
+        Args:
+            body (bytes): The request body.
+
+        Returns:
+            dict: The parsed object.
+
+        Raises:
+            HTTPError: 400, if the body is not a JSON object.
+        """
+        try:
+            data = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise HTTPError(400, "Request body must be JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return data
+
+
+    def list_movies(self, query: dict):
+        """Returns one page of the movies in file order."""
+        movies = self.storage.read_movies()
+        return paginate(movies, len(movies), movies, query)
+
+
+    def sorted_movies(self, query: dict):
+        """Returns one page of the movies sorted by year or rating, "by" and "order" (asc or desc) select the order."""
+        key = query.get("by", ["rating"])[-1]
+        order = query.get("order", ["desc"])[-1]
+        if order not in ("asc", "desc"):
+            raise HTTPError(400, "order must be asc or desc")
+        try:
+            view = self.storage.sorted_movies(key, descending=order == "desc")
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return paginate(view, len(view), self.storage.read_movies(), query)
+
+
+    def search_movies(self, query: dict):
+        """
+        Returns one page of the titles matching the "q" parameter, best matches first.
+
+        Only the matches up to the end of the page are ranked, so the total is not known (None).
+        """
+        if not query.get("q"):
+            raise HTTPError(400, "q is required")
+        offset, limit = page_range(query)
+        titles = self.storage.search(query["q"][-1], limit=offset + limit + 1)
+        return paginate(titles, None, self.storage.read_movies(), query)
+
+
+    def filter_movies(self, query: dict):
+        """Returns one page of the movies within the rating and year range given by the parameters."""
+        filtered_movies = self.storage.filter_movies(min_rating=query_float(query, "min_rating"),
+                                                     max_rating=query_float(query, "max_rating"),
+                                                     start_year=query_int(query, "start_year"),
+                                                     end_year=query_int(query, "end_year"))
+        return paginate(filtered_movies, len(filtered_movies), filtered_movies, query)
+
+
+    def show_stats(self, query: dict):
+        """Returns the rating statistics, see stats_to_json()."""
+        return stats_to_json(self.storage)
+
+
+    def get_movie(self, title: str):
+        """Returns one movie, the title is matched case-insensitive."""
+        title = self._existing_title(title)
+        return movie_to_json(title, self.storage.read_movies()[title])
+
+
+    async def add_movie(self, data: dict):
+        """
+        Adds a movie with the year and rating of the request, or with the details found by the OMDB API.
+
+        The OMDB request runs in a worker thread, so other requests are served meanwhile.
+
+        Args:
+            data (dict): "title" and optional "year", "rating" and "poster_url".
+
+        Returns:
+            dict: The added movie in the JSON output format.
+
+        Raises:
+            HTTPError: 400 if the title is missing, 404 if OMDB does not know the movie, 409 if it already exists.
+        """
+        title = data.get("title")
+        if not isinstance(title, str) or not title.strip():
+            raise HTTPError(400, "title is required")
+        if data.get("year") is not None and data.get("rating") is not None:
+            api_data = (title, data["year"], data["rating"], data.get("poster_url", ""))
+        else:
+            api_data = await asyncio.get_running_loop().run_in_executor(None, api_request_data, title)
+            if not api_data:
+                raise HTTPError(404, f"Movie {title} was not found")
+
+        def change():
+            title, year, rating, poster_url = api_data
+            existing_title = self.storage.find_title(title)
+            if existing_title:
+                raise HTTPError(409, f"Movie {existing_title} already exist!")
+            self.storage.add_movie(title, year, rating, poster_url)
+            return movie_to_json(title, Movie(title, year, rating, poster_url))
+        return await self.submit(change)
+
+
+    async def update_movie(self, title: str, data: dict):
+        """
+        Updates the rating of a movie, the title is matched case-insensitive.
+
+        Args:
+            title (str): Title of the movie in any casing.
+            data (dict): "rating", the new rating as a number.
+
+        Returns:
+            dict: The updated movie in the JSON output format.
+
+        Raises:
+            HTTPError: 400 if the rating is not a number, 404 if the movie does not exist.
+        """
+        rating = data.get("rating")
+        if isinstance(rating, bool) or not isinstance(rating, (int, float)):
+            raise HTTPError(400, "rating must be a number")
+
+        def change():
+            existing_title = self._existing_title(title)
+            movie = self.storage.read_movies()[existing_title]
+            self.storage.update_movie(existing_title, float(rating))
+            return movie_to_json(existing_title, movie.updated({"rating": str(float(rating)) + "/10"}))
+        return await self.submit(change)
+
+
+    async def delete_movie(self, title: str):
+        """
+        Deletes a movie, the title is matched case-insensitive.
+
+        Args:
+            title (str): Title of the movie in any casing.
+
+        Returns:
+            dict: "deleted", the title as it was stored.
+
+        Raises:
+            HTTPError: 404, if the movie does not exist.
+        """
+        def change():
+            existing_title = self._existing_title(title)
+            self.storage.delete_movie(existing_title)
+            return {"deleted": existing_title}
+        return await self.submit(change)
+
+
+    def _existing_title(self, title: str):
+        """
+        Looks up a title case-insensitive.
+
+        Args:
+            title (str): Title of the movie in any casing.
+
+        Returns:
+            str: The title as stored.
+
+        Raises:
+            HTTPError: 404, if the movie does not exist.
+        """
+        existing_title = self.storage.find_title(title)
+        if not existing_title:
+            raise HTTPError(404, f"Movie {title} doesn't exist!")
+        return existing_title
+
+
+def main():
+    """Parses the command line and runs the server until it is interrupted."""
+    parser = argparse.ArgumentParser(description="Serve the movie catalog as a JSON API.")
+    parser.add_argument("--file", default=DEFAULT_FILE,
+                        help=f"data file in the data folder, the extension picks the storage (default {DEFAULT_FILE})")
+    parser.add_argument("--journal", action="store_true", help="append changes to the journal of the data file")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default %(default)s)")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on (default %(default)s)")
+    args = parser.parse_args()
+    options = {"journal": True} if args.journal else {}
+    storage = open_storage(args.file, snapshot=True, **options)
+    try:
+        asyncio.run(MovieApiServer(storage).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Bye!")
+    finally:
+        storage.save_snapshot()
+
+
+if __name__ == "__main__":
+    main()
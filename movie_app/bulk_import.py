@@ -0,0 +1,169 @@
+import csv
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from movie_app.API_Movies import (NOT_FOUND_ERROR, OMDB_URL, REQUEST_TIMEOUT, RETRYABLE_ERRORS, api_error,
+                                  fetch_movie_infos, parse_movie_infos)
+from storage.title_index import normalize_title
+
+
+class RateLimiter:
+    """Thread-safe token bucket that limits how many requests are started per second."""
+
+    def __init__(self, requests_per_second: float, burst: int = 1):
+        """
+        Initializes the RateLimiter with a full bucket.
+
+        Args:
+            requests_per_second (float): Number of requests allowed per second, None or 0 for no limit.
+            burst (int): Number of requests that may be started at once after a pause.
+        """
+        self.rate = requests_per_second
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+
+    def acquire(self):
+        """Blocks until a request may be started."""
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def read_titles(file_path: str):
+    """
+    Reads movie titles from a text file (one title per line) or a CSV file.
+
+    For CSV files the "title" column is used, or the first column if there is no such header.
+    Empty lines and titles that only differ in case are skipped.
+
+    Args:
+        file_path (str): Path to the .txt or .csv file.
+
+    Returns:
+        list: The titles in file order.
+    """
+    with open(file_path, "r", newline="") as handle:
+        if file_path.lower().endswith(".csv"):
+            rows = list(csv.reader(handle))
+            column = 0
+            if rows and "title" in [cell.strip().lower() for cell in rows[0]]:
+                column = [cell.strip().lower() for cell in rows[0]].index("title")
+                rows = rows[1:]
+            candidates = [row[column] for row in rows if len(row) > column]
+        else:
+            candidates = handle.read().splitlines()
+    titles = []
+    seen = set()
+    for title in candidates:
+        title = title.strip()
+        if title and normalize_title(title) not in seen:
+            seen.add(normalize_title(title))
+            titles.append(title)
+    return titles
+
+
+def fetch_with_retry(title: str, rate_limiter: RateLimiter, timeout=REQUEST_TIMEOUT, retries: int = 3,
+                     backoff: float = 0.5, base_url: str = OMDB_URL):
+    """
+    Fetches one title from the OMDB API, retrying network errors, 429 and 5xx responses.
+
+    Only the "Movie not found!" answer counts as not found. Error answers listed in
+    RETRYABLE_ERRORS, like a reached request limit, are retried, any other error answer,
+    like an invalid API key, fails the title with the error message.
+
+    Args:
+        title (str): The title of the movie to search for.
+        rate_limiter (RateLimiter): Shared limiter, every attempt sent over the network takes one token.
+        timeout: Seconds to wait for the server per attempt, a number or a (connect, read) tuple.
+        retries (int): Number of retries after the first attempt.
+        backoff (float): Seconds to wait before the first retry, doubled for every further retry.
+        base_url (str): URL of the OMDB API, can point to a local stand-in server.
+
+    Returns:
+        tuple: ("found", (title, year, rating, poster_url)), ("not_found", None) or ("failed", error message).
+    """
+    import requests
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            status_code, movie_infos = fetch_movie_infos(title, timeout, base_url, rate_limiter)
+        except requests.exceptions.RequestException as e:
+            error = f"Network error occurred: {e}"
+            continue
+        except ValueError as e:
+            return "failed", f"Invalid response: {e}"
+        if status_code == 429 or status_code >= 500:
+            error = f"Received a non-OK status code: {status_code}"
+            continue
+        if status_code != 200:
+            return "failed", f"Received a non-OK status code: {status_code}"
+        try:
+            movie_data = parse_movie_infos(movie_infos)
+        except KeyError as e:
+            return "failed", f"Invalid response: {e}"
+        if movie_data:
+            return "found", movie_data
+        message = api_error(movie_infos)
+        if message == NOT_FOUND_ERROR:
+            return "not_found", None
+        if message in RETRYABLE_ERRORS:
+            error = f"OMDB API error: {message}"
+            continue
+        return "failed", f"OMDB API error: {message}" if message else "Missing expected data in the response"
+    return "failed", error
+
+
+def bulk_import(storage, titles: list, concurrency: int = 8, timeout=REQUEST_TIMEOUT, retries: int = 3,
+                backoff: float = 0.5, requests_per_second: float = 10, base_url: str = OMDB_URL):
+    """
+    Resolves many titles concurrently with the OMDB API and adds them with one storage write.
+
+    Args:
+        storage: The storage object responsible for handling movie data.
+        titles (list): The titles to import.
+        concurrency (int): Number of requests running at the same time.
+        timeout: Seconds to wait for the server per request, a number or a (connect, read) tuple.
+        retries (int): Number of retries per title for network errors, 429 and 5xx responses and retryable API errors.
+        backoff (float): Seconds to wait before the first retry, doubled for every further retry.
+        requests_per_second (float): Client-side rate limit over all threads, None or 0 for no limit.
+        base_url (str): URL of the OMDB API, can point to a local stand-in server.
+
+    Returns:
+        dict: Report with the lists "imported", "duplicates", "not_found" and the dict "failed" (title: error).
+    """
+    rate_limiter = RateLimiter(requests_per_second, burst=concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            lambda title: fetch_with_retry(title, rate_limiter, timeout, retries, backoff, base_url), titles))
+
+    report = {"imported": [], "duplicates": [], "not_found": [], "failed": {}}
+    new_movies = []
+    new_titles = set()
+    for title, (status, result) in zip(titles, results):
+        if status == "not_found":
+            report["not_found"].append(title)
+        elif status == "failed":
+            report["failed"][title] = result
+        elif storage.find_title(result[0]) or normalize_title(result[0]) in new_titles:
+            report["duplicates"].append(result[0])
+        else:
+            new_titles.add(normalize_title(result[0]))
+            new_movies.append(result)
+            report["imported"].append(result[0])
+    if new_movies:
+        storage.add_movies(new_movies)
+    return report
@@ -0,0 +1,87 @@
+import hashlib
+import sqlite3
+
+# Bump when the HTML of a movie card changes, so old fragments are not reused.
+CARD_FORMAT_VERSION = 2
+# Number of cards looked up with one query, below the SQLite limit of query parameters.
+LOOKUP_BATCH_SIZE = 500
+
+
+def card_key(movie_name: str, movie, poster_src: str = None):
+    """
+    Returns the hash of all fields a movie card is rendered from.
+
+    Args:
+        movie_name (str): Title of the movie.
+        movie (Movie): The movie record.
+        poster_src (str): Path of the local copy of the poster, None if the remote URL is used.
+
+    Returns:
+        str: Hex digest identifying the rendered card.
+    """
+    # The repr of the tuple tells str from None like JSON would, and is much faster to build.
+    fields = (CARD_FORMAT_VERSION, movie_name, movie.raw_year, movie.raw_rating, movie.poster_url, poster_src)
+    return hashlib.sha1(repr(fields).encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class CardCache:
+    """On-disk cache of rendered movie card fragments, keyed by card_key()."""
+
+    def __init__(self, path: str):
+        """
+        Opens or creates the fragment cache.
+
+        Args:
+            path (str): Path of the SQLite file holding the fragments.
+        """
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS cards (key TEXT PRIMARY KEY, html TEXT NOT NULL)")
+        self.connection.execute("CREATE TEMP TABLE used_keys (key TEXT PRIMARY KEY)")
+        self.reused = 0
+        self.rendered = 0
+
+
+    def get_or_render_many(self, cards: list):
+        """
+        Returns the cached fragments of many cards, rendering and storing the missing ones.
+
+        The keys are marked as used and looked up with one statement each per LOOKUP_BATCH_SIZE
+        cards, and the new fragments are stored with one statement, instead of a round trip to
+        SQLite per card.
+
+        Args:
+            cards (list): (key, render) pairs. key is the card key, see card_key(), render a
+                          function without arguments returning the HTML of the card.
+
+        Returns:
+            list: The HTML of the cards, in the order of cards.
+        """
+        keys = [key for key, _ in cards]
+        self.connection.executemany("INSERT OR IGNORE INTO used_keys VALUES (?)", ((key,) for key in keys))
+        cached = {}
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            batch_keys = keys[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch_keys))
+            cached.update(self.connection.execute(f"SELECT key, html FROM cards WHERE key IN ({placeholders})",
+                                                  batch_keys))
+        html_codes = []
+        new_cards = []
+        for key, render in cards:
+            html = cached.get(key)
+            if html is None:
+                html = render()
+                cached[key] = html
+                new_cards.append((key, html))
+                self.rendered += 1
+            else:
+                self.reused += 1
+            html_codes.append(html)
+        self.connection.executemany("INSERT OR REPLACE INTO cards VALUES (?, ?)", new_cards)
+        return html_codes
+
+
+    def close(self):
+        """Removes fragments that were not used in this run, commits and closes the cache."""
+        self.connection.execute("DELETE FROM cards WHERE key NOT IN (SELECT key FROM used_keys)")
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,459 @@
+"""
+Non-interactive command mode of the movie app, for scripts and automation.
+
+    python main.py stats
+    python main.py add "The Matrix" --year 1999 --rating 8.7/10
+    python main.py --file movies.json filter --min-rating 8 --start-year 2000
+    python main.py run commands.txt
+    printf 'delete Alien\\nstats\\n' | python main.py run -
+
+The catalog is loaded once per call. From the first command that changes it, the commands
+run inside one batch, so the data file is written once at the end, however many commands
+changed it. Commands that only read, like list or stats, do not take the write lock.
+A script holds one command per line, in the same syntax as on the command line,
+empty lines and lines starting with # are skipped.
+
+Every command prints one JSON object with "command", "ok", "result" or "error", and the
+"messages" the storage printed while it ran. Single commands are printed indented,
+scripts print one object per line (JSON Lines). The exit status is 1 if a command failed.
+"""
+import argparse
+import contextlib
+import io
+import json
+import shlex
+import sys
+from itertools import islice
+from storage.storage_factory import open_storage
+from storage.metrics import command
+from storage.movie import Movie
+from movie_app.API_Movies import api_request_data
+from movie_app.generate_website import generate_website
+
+DEFAULT_FILE = "movies.csv"
+# Commands that change the catalog, the batch is opened before the first of them.
+CHANGING_COMMANDS = {"add", "delete", "update"}
+
+
+def movie_to_json(title: str, movie):
+    """
+    Returns a movie in the JSON output format.
+
+    Args:
+        title (str): Title of the movie.
+        movie (Movie): The movie record.
+
+    Returns:
+        dict: "title", "year", "rating" and "poster_url", values as stored.
+    """
+    return {"title": title, **movie.to_dict()}
+
+
+def stats_to_json(storage):
+    """
+    Returns the rating statistics of a storage in the JSON output format.
+
+    Args:
+        storage (IStorage): The storage, its statistics are kept up to date by the mutators.
+
+    Returns:
+        dict: "movies", "average", "median", "best" and "worst", the last two as lists of movies.
+        Average and median are None if there are no rated movies.
+    """
+    movies = storage.read_movies()
+    stats = storage.rating_stats()
+    return {
+        "movies": len(movies),
+        "average": stats.mean(),
+        "median": stats.median(),
+        "best": [movie_to_json(title, movies[title]) for title in stats.best()],
+        "worst": [movie_to_json(title, movies[title]) for title in stats.worst()],
+    }
+
+
+def positive_int(text: str):
+    """
+    Argument type for counts that must be at least 1.
+
+    Args:
+        text (str): The argument as given on the command line.
+
+    Returns:
+        int: The number.
+
+    Raises:
+        argparse.ArgumentTypeError: If the argument is not an integer of at least 1.
+    """
+    try:
+        number = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {text!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def add_commands(subparsers):
+    """
+    Adds the movie commands to the subparsers of an argument parser.
+
+    Args:
+        subparsers: The object returned by ArgumentParser.add_subparsers().
+    """
+    command = subparsers.add_parser("list", help="list all movies")
+    command.add_argument("--sort", choices=["year", "rating"], help="sort by year or rating, highest first")
+    command.add_argument("--ascending", action="store_true", help="with --sort, lowest first")
+    command.add_argument("--limit", type=int, help="only the first LIMIT movies")
+
+    command = subparsers.add_parser("add", help="add a movie, looked up with the OMDB API "
+                                                "unless --year and --rating are given")
+    command.add_argument("title")
+    command.add_argument("--year", help='release year, e.g. "1999"')
+    command.add_argument("--rating", help='rating, e.g. "8.7/10"')
+    command.add_argument("--poster", default="", help="URL of the poster image")
+
+    command = subparsers.add_parser("delete", help="delete a movie")
+    command.add_argument("title")
+
+    command = subparsers.add_parser("update", help="update the rating of a movie")
+    command.add_argument("title")
+    command.add_argument("rating", type=float)
+
+    subparsers.add_parser("stats", help="average, median, best and worst rating")
+
+    command = subparsers.add_parser("search", help="search titles, best matches first, typo-tolerant")
+    command.add_argument("query")
+    command.add_argument("--limit", type=int, help="at most LIMIT matches")
+    command.add_argument("--exact", action="store_true", help="only titles containing the query")
+
+    command = subparsers.add_parser("filter", help="movies within a rating and year range, bounds inclusive")
+    command.add_argument("--min-rating", type=float)
+    command.add_argument("--max-rating", type=float)
+    command.add_argument("--start-year", type=int)
+    command.add_argument("--end-year", type=int)
+
+    command = subparsers.add_parser("generate", help="generate the website")
+    command.add_argument("--cards-per-page", type=positive_int, help="split the website into pages")
+    command.add_argument("--force", action="store_true", help="write the website even if nothing changed")
+    command.add_argument("--xz", action="store_true", help="precompress the static files with xz next to gzip")
+    command.add_argument("--no-posters", action="store_true", help="link the remote posters instead of local copies")
+
+
+def build_parser():
+    """
+    Builds the parser of the command line.
+
+    Returns:
+        argparse.ArgumentParser: Parser for the global options, the movie commands and "run".
+    """
+    parser = argparse.ArgumentParser(prog="main.py", description="Run movie app commands without the menu.")
+    parser.add_argument("--file", default=DEFAULT_FILE,
+                        help=f"data file in the data folder, the extension picks the storage (default {DEFAULT_FILE})")
+    parser.add_argument("--journal", action="store_true", help="append changes to the journal of the data file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    add_commands(subparsers)
+    command = subparsers.add_parser("run", help="run the commands of a script file, - for stdin")
+    command.add_argument("script")
+    return parser
+
+
+def build_script_parser():
+    """
+    Builds the parser of a single script line.
+
+    Returns:
+        argparse.ArgumentParser: Parser for the movie commands, without global options and "run".
+    """
+    parser = argparse.ArgumentParser(prog="", add_help=False)
+    add_commands(parser.add_subparsers(dest="command", required=True))
+    return parser
+
+
+class CommandRunner:
+    """Runs parsed commands against one storage and returns their results as JSON objects."""
+
+    def __init__(self, storage):
+        """
+        Initializes the CommandRunner.
+
+        Args:
+            storage (IStorage): The storage the commands work on.
+        """
+        self.storage = storage
+        self.commands = {
+            "list": self.list_movies,
+            "add": self.add_movie,
+            "delete": self.delete_movie,
+            "update": self.update_movie,
+            "stats": self.show_stats,
+            "search": self.search_movies,
+            "filter": self.filter_movies,
+            "generate": self.generate_website,
+        }
+
+
+    def execute(self, args):
+        """
+        Runs one command and collects what the storage printed meanwhile.
+
+        Args:
+            args (argparse.Namespace): The parsed command.
+
+        Returns:
+            dict: "command", "ok", "result" (or "error" if the command failed) and "messages".
+
+        Handles:
+            ValueError: If the command can not be run, e.g. the movie does not exist, ok is False.
+            Exception: Any other error of the command, e.g. of the storage, is reported the same way,
+                       so the other commands of a script still run and are saved.
+        """
+        messages = io.StringIO()
+        output = {"command": args.command, "ok": True}
+        try:
+            with contextlib.redirect_stdout(messages), command(args.command):
+                output["result"] = self.commands[args.command](args)
+        except ValueError as e:
+            output["ok"] = False
+            output["error"] = str(e)
+        except Exception as e:
+            output["ok"] = False
+            output["error"] = f"Unexpected error: {type(e).__name__}: {e}"
+        output["messages"] = messages.getvalue().splitlines()
+        return output
+
+
+    def list_movies(self, args):
+        """
+        Lists the movies in file order, or sorted by year or rating.
+
+        Returns:
+            list: The movies in the JSON output format.
+        """
+        movies = self.storage.read_movies()
+        if args.sort is None:
+            titles = islice(movies, args.limit)
+        elif args.limit is None:
+            titles = self.storage.sorted_movies(args.sort, descending=not args.ascending)
+        else:
+            titles = self.storage.top_movies(args.sort, args.limit, descending=not args.ascending)
+        return [movie_to_json(title, movies[title]) for title in titles]
+
+
+    def add_movie(self, args):
+        """
+        Adds a movie with the given year and rating, or with the details found by the OMDB API.
+
+        Returns:
+            dict: The added movie in the JSON output format.
+
+        Raises:
+            ValueError: If the movie already exists or the OMDB API did not find it.
+        """
+        if args.year is not None and args.rating is not None:
+            title, year, rating, poster_url = args.title, args.year, args.rating, args.poster
+        else:
+            api_data = api_request_data(args.title)
+            if not api_data:
+                raise ValueError(f"Movie {args.title} was not found")
+            title, year, rating, poster_url = api_data
+        existing_title = self.storage.find_title(title)
+        if existing_title:
+            raise ValueError(f"Movie {existing_title} already exist!")
+        self.storage.add_movie(title, year, rating, poster_url)
+        return movie_to_json(title, Movie(title, year, rating, poster_url))
+
+
+    def delete_movie(self, args):
+        """
+        Deletes a movie, the title is matched case-insensitive.
+
+        Returns:
+            dict: "deleted", the title as it was stored.
+
+        Raises:
+            ValueError: If the movie does not exist.
+        """
+        title = self._existing_title(args.title)
+        self.storage.delete_movie(title)
+        return {"deleted": title}
+
+
+    def update_movie(self, args):
+        """
+        Updates the rating of a movie, the title is matched case-insensitive.
+
+        Returns:
+            dict: The updated movie in the JSON output format.
+
+        Raises:
+            ValueError: If the movie does not exist.
+        """
+        title = self._existing_title(args.title)
+        movie = self.storage.read_movies()[title]
+        self.storage.update_movie(title, args.rating)
+        return movie_to_json(title, movie.updated({"rating": str(args.rating) + "/10"}))
+
+
+    def show_stats(self, args):
+        """
+        Returns the rating statistics, kept up to date by the storage.
+
+        Returns:
+            dict: See stats_to_json().
+        """
+        return stats_to_json(self.storage)
+
+
+    def search_movies(self, args):
+        """
+        Searches the titles with the trigram index of the storage.
+
+        Returns:
+            list: The matching movies in the JSON output format, best matches first.
+        """
+        movies = self.storage.read_movies()
+        return [movie_to_json(title, movies[title])
+                for title in self.storage.search(args.query, limit=args.limit, fuzzy=not args.exact)]
+
+
+    def filter_movies(self, args):
+        """
+        Finds the movies within the rating and year range.
+
+        Returns:
+            list: The matching movies in the JSON output format.
+        """
+        filtered_movies = self.storage.filter_movies(min_rating=args.min_rating, max_rating=args.max_rating,
+                                                     start_year=args.start_year, end_year=args.end_year)
+        return [movie_to_json(title, movie) for title, movie in filtered_movies.items()]
+
+
+    def generate_website(self, args):
+        """
+        Generates the website from the current catalog, including the changes of earlier commands.
+
+        Returns:
+            dict: The report of generate_website(), "skipped", "reused", "rendered", "posters" and "assets".
+
+        Raises:
+            ValueError: If the template could not be read or the website could not be written.
+        """
+        encodings = ("gzip", "xz") if args.xz else ("gzip",)
+        report = generate_website(self.storage.stream(), args.cards_per_page, args.force, encodings,
+                                  fetch_posters=not args.no_posters)
+        if report is None:
+            raise ValueError("Website could not be generated")
+        return report
+
+
+    def _existing_title(self, title: str):
+        """
+        Looks up a title case-insensitive.
+
+        Args:
+            title (str): Title of the movie in any casing.
+
+        Returns:
+            str: The title as stored.
+
+        Raises:
+            ValueError: If the movie does not exist.
+        """
+        existing_title = self.storage.find_title(title)
+        if not existing_title:
+            raise ValueError(f"Movie {title} doesn't exist!")
+        return existing_title
+
+
+def parse_script(lines, parser: argparse.ArgumentParser):
+    """
+    Parses the lines of a script one by one, as they are read.
+
+    Args:
+        lines: Iterable of script lines, e.g. an open file or sys.stdin.
+        parser (argparse.ArgumentParser): Parser for a single command, see build_script_parser().
+
+    Yields:
+        argparse.Namespace or dict: The parsed command, or the failed output object of a line
+        that could not be parsed.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        errors = io.StringIO()
+        try:
+            with contextlib.redirect_stderr(errors):
+                args = parser.parse_args(shlex.split(line))
+        except (SystemExit, ValueError) as e:
+            # argparse prints the usage and exits, the last line of its output names the problem.
+            error = (errors.getvalue().strip().splitlines() or [str(e)])[-1]
+            args = {"command": line, "ok": False, "error": error.split("error: ", 1)[-1], "messages": []}
+        yield args
+
+
+def run_commands(storage, commands, output, indent: int = None):
+    """
+    Runs commands against one loaded catalog and writes it back once at the end.
+
+    Commands are run as they are read. The batch, and with it the exclusive lock, is only
+    opened before the first command that changes the catalog, read-only scripts use shared reads.
+
+    Args:
+        storage (IStorage): The storage the commands work on.
+        commands: Iterable of parsed commands, or of output objects of lines that could not be parsed.
+        output: Text handle the JSON objects are written to.
+        indent (int): Indentation of the JSON objects, None for one object per line.
+
+    Returns:
+        bool: True if all commands succeeded.
+    """
+    runner = CommandRunner(storage)
+    all_ok = True
+    # Messages of loading and saving the catalog go to stderr, stdout only carries JSON.
+    with contextlib.redirect_stdout(sys.stderr), contextlib.ExitStack() as stack:
+        in_batch = False
+        for args in commands:
+            if not in_batch and not isinstance(args, dict) and args.command in CHANGING_COMMANDS:
+                stack.enter_context(storage.batch())
+                in_batch = True
+            result = args if isinstance(args, dict) else runner.execute(args)
+            all_ok = all_ok and result["ok"]
+            print(json.dumps(result, indent=indent), file=output, flush=True)
+    return all_ok
+
+
+def main(argv: list = None):
+    """
+    Parses the command line and runs the command or the script.
+
+    Args:
+        argv (list): The arguments, without the program name. Defaults to sys.argv[1:].
+
+    Returns:
+        int: The exit status, 0 if all commands succeeded, otherwise 1.
+    """
+    args = build_parser().parse_args(argv)
+    try:
+        options = {"journal": True} if args.journal else {}
+        storage = open_storage(args.file, snapshot=True, **options)
+    except (ValueError, TypeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    output = sys.stdout
+    try:
+        if args.command != "run":
+            return 0 if run_commands(storage, [args], output, indent=4) else 1
+        try:
+            with contextlib.nullcontext(sys.stdin) if args.script == "-" else open(args.script, "r") as lines:
+                all_ok = run_commands(storage, parse_script(lines, build_script_parser()), output)
+        except (IOError, UnicodeDecodeError) as e:
+            print(f"Could not read {args.script}: {e}", file=sys.stderr)
+            return 1
+        return 0 if all_ok else 1
+    finally:
+        storage.save_snapshot()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,54 +1,390 @@
 import os
+import glob
+import hashlib
+import json
+import time
+from functools import partial
+from itertools import islice
+from movie_app.card_cache import LOOKUP_BATCH_SIZE, CardCache, card_key
+from movie_app.poster_cache import prefetch_posters
+from movie_app.static_assets import update_static_assets
+from storage.atomic_file import atomic_write
+from storage.metrics import add_file_bytes, instrumented
 
-def generate_website(movies_data: dict):
+MOVIE_GRID_PLACEHOLDER = "__TEMPLATE_MOVIE_GRID__"
+TITLE_PLACEHOLDER = "__TEMPLATE_TITLE__"
+MANIFEST_PATH = os.path.join('static', '.website_manifest.json')
+CARD_CACHE_PATH = os.path.join('static', '.card_cache.sqlite')
+# Seconds after which the downloaded posters are revalidated with their servers again.
+POSTER_REVALIDATE_SECONDS = 24 * 3600
+
+
+@instrumented("website.generate_website")
+def generate_website(movies_data: dict, cards_per_page: int = None, force: bool = False,
+                     encodings: tuple = ("gzip",), fetch_posters: bool = False):
     """
     Generate an HTML file for the movie website based on movie_data.
 
-    This function creates the movie grid HTML, updates a base HTML template.
-    Both are put into the old html and saved in a new html file.
+    The base HTML template is split at the movie grid placeholder. The template head,
+    the movie cards and the template tail are streamed straight into the output file,
+    so the page is never built as one string in memory.
+    With cards_per_page the grid is split into index.html, page-2.html, page-3.html, ...
+
+    A hash of the catalog and the template is kept in a manifest. If nothing changed since the
+    last run, the website is not written again and no poster is requested. Otherwise the cards
+    are taken from an on-disk fragment cache and only new or changed movies are rendered.
+
+    With fetch_posters the new posters are downloaded to static/posters, see prefetch_posters().
+    The cards then point at the local copies, so a page view does not fetch every poster from the
+    remote servers. Posters downloaded before are reused without a request, every
+    POSTER_REVALIDATE_SECONDS they are revalidated with their servers, even if nothing else changed.
+    If a poster could not be downloaded, the next run tries again.
+    Afterwards the precompressed siblings and the hash manifest of the static files are updated
+    for the static server, see update_static_assets().
 
     Args:
         movies_data (dict): A dictionary containing the movie details. Each key is the movie name,
-                                and its value is another dictionary with "year" and "poster_url" "ratings" keys.
+                                and its value is a Movie record with year, poster_url and rating.
+                                Only items() is used, it is called up to three times, so a MovieStream from
+                                IStorage.stream() works as well and keeps memory flat.
+        cards_per_page (int): Number of movie cards per page, None for a single page.
+        force (bool): If True, the website is written even if nothing changed.
+        encodings (tuple): Encodings the static text files are precompressed with, "gzip" and/or "xz".
+        fetch_posters (bool): If True, the cards use local copies of the posters instead of the remote URLs.
+                              Off by default, as it sends requests to the poster servers.
+
+    Returns:
+        dict: Report with "skipped" (bool), "reused" and "rendered" (number of cards), "posters",
+              the report of prefetch_posters() or None without fetch_posters, and "assets", the
+              report of update_static_assets(), or None if the template could not be read or
+              the website could not be written.
+
+    Raises:
+        ValueError: If cards_per_page is neither None nor a positive number.
     """
-    html_code_movie_grid = create_html_code_for_website(movies_data)
+    validate_cards_per_page(cards_per_page)
     html_code_title = "The movie app"
     base_html = open_base_html()
-    updated_html = base_html.replace("__TEMPLATE_MOVIE_GRID__", html_code_movie_grid)
-    final_html = updated_html.replace("__TEMPLATE_TITLE__", html_code_title)
-    save_final_html_in_document(final_html)
+    if base_html is None:
+        return None
+    website_hash = hash_website(movies_data, base_html, cards_per_page, fetch_posters)
+    manifest = read_manifest()
+    posters_checked_at = manifest.get("posters_checked_at", 0)
+    revalidate = fetch_posters and time.time() - posters_checked_at >= POSTER_REVALIDATE_SECONDS
+    posters_missing = fetch_posters and manifest.get("posters_failed", 0) > 0
+    index_path = os.path.join('static', page_file_name(1))
+    if (not force and not revalidate and not posters_missing and os.path.exists(index_path)
+            and manifest.get("website_hash") == website_hash):
+        return {"skipped": True, "reused": 0, "rendered": 0, "posters": None,
+                "assets": update_static_assets(encodings)}
+    poster_sources, poster_report = {}, None
+    if fetch_posters:
+        poster_sources, poster_report = prefetch_posters((movie.poster_url for _, movie in movies_data.items()),
+                                                         revalidate=revalidate)
+        if revalidate:
+            posters_checked_at = time.time()
+    html_head, html_tail = split_base_html(base_html, html_code_title)
+    card_cache = CardCache(CARD_CACHE_PATH)
+    try:
+        written = write_website_pages(iter_cached_movie_cards(movies_data, card_cache, poster_sources),
+                                      html_head, html_tail, cards_per_page)
+    finally:
+        card_cache.close()
+    if not written:
+        return None
+    save_manifest({"website_hash": website_hash, "posters_checked_at": posters_checked_at,
+                   "posters_failed": poster_report["failed"] if poster_report else 0})
+    return {"skipped": False, "reused": card_cache.reused, "rendered": card_cache.rendered,
+            "posters": poster_report, "assets": update_static_assets(encodings)}
 
 
-def create_html_code_for_website(movies_data: dict):
+def validate_cards_per_page(cards_per_page):
     """
-    Creates the HTML code for the grid of the html.
+    Checks the number of movie cards per page.
 
-    This function generates an HTML list of movie cards based on the provided movie data.
-    Each movie card includes the poster image, title, and release year.
+    Args:
+        cards_per_page (int): Number of movie cards per page, None for a single page.
+
+    Raises:
+        ValueError: If cards_per_page is neither None nor an integer of at least 1. With 0 no
+                    card would fit on a page, and pages would be written without end.
+    """
+    if cards_per_page is None:
+        return
+    if isinstance(cards_per_page, bool) or not isinstance(cards_per_page, int) or cards_per_page < 1:
+        raise ValueError(f"Cards per page must be at least 1, got {cards_per_page!r}")
+
+
+def hash_website(movies_data: dict, base_html: str, cards_per_page: int = None, fetch_posters: bool = False):
+    """
+    Hashes everything the website is generated from.
+
+    The local poster paths are not part of the hash, they follow from the poster URLs, so the
+    hash is known before any poster is requested.
 
     Args:
-        movies_data (dict): A dictionary containing the movie details. Each key is the movie name,
-                                and its value is another dictionary with "year" and "poster_url" "ratings" keys.
+        movies_data (dict): A dictionary containing the movie details, see generate_website().
+        base_html (str): The content of the base HTML template.
+        cards_per_page (int): Number of movie cards per page, None for a single page.
+        fetch_posters (bool): If True, the cards use local copies of the posters.
+
     Returns:
-        str: An HTML string representing the movie grid.
+        str: Hex digest over the template, the page size, the poster mode and all movie cards in order.
+    """
+    website_hash = hashlib.sha256()
+    website_hash.update(base_html.encode("utf-8"))
+    website_hash.update(str(cards_per_page).encode("utf-8"))
+    website_hash.update(str(fetch_posters).encode("utf-8"))
+    for movie_name, movie in movies_data.items():
+        website_hash.update(card_key(movie_name, movie).encode("ascii"))
+    return website_hash.hexdigest()
+
+
+def read_manifest():
+    """
+    Reads the manifest of the last generated website.
+
+    Returns:
+        dict: The manifest, empty if there is none or it can not be read.
+    """
+    try:
+        with open(MANIFEST_PATH, "r") as handle:
+            return json.load(handle)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_manifest(manifest: dict):
+    """
+    Saves the manifest of the generated website.
+
+    Args:
+        manifest (dict): The manifest to save.
     """
-    html_code = ""
-    for movie in movies_data:
-        movie_name = movie
-        movie_year = movies_data[movie]["year"]
-        movie_poster = movies_data[movie]["poster_url"]
-        movie_rating = movies_data[movie]["rating"]             #Get rating if later added
-        html_code += (f'''
+    try:
+        with open(MANIFEST_PATH, "w") as handle:
+            json.dump(manifest, handle, indent=4)
+    except IOError:
+        print("There was an issue saving the website manifest.")
+
+
+def create_movie_card(movie_name: str, movie, poster_src: str = None):
+    """
+    Creates the HTML code of a single movie card.
+
+    The poster is loaded lazily, so the browser only fetches the posters near the visible part of the page.
+
+    Args:
+        movie_name (str): Title of the movie.
+        movie (Movie): The movie record with year, poster_url and rating.
+        poster_src (str): Path of the local copy of the poster, None to use the remote poster_url.
+
+    Returns:
+        str: An HTML string of one list entry of the movie grid.
+    """
+    movie_year = movie.raw_year
+    movie_poster = poster_src or movie.poster_url
+    movie_rating = movie.raw_rating             #Get rating if later added
+    return f'''
         <li>
             <div class="movie">
-                <img class="movie-poster" src="{movie_poster}" alt="Poster {movie_name}">
+                <img class="movie-poster" src="{movie_poster}" alt="Poster {movie_name}" loading="lazy">
                 <div class="movie-title">{movie_name}</div>
                 <div class="movie-year">{movie_year}</div>
                 <div class="movie-year">{movie_rating}</div>
             </div>
         </li>
-        ''')
-    return html_code
+        '''
+
+
+def iter_movie_cards(movies_data: dict):
+    """
+    Yields the HTML code of the movie cards one by one.
+
+    Args:
+        movies_data (dict): A dictionary containing the movie details, see generate_website().
+
+    Yields:
+        str: An HTML string of one movie card.
+    """
+    for movie_name, movie in movies_data.items():
+        yield create_movie_card(movie_name, movie)
+
+
+def iter_cached_movie_cards(movies_data: dict, card_cache: CardCache, poster_sources: dict = None):
+    """
+    Yields the HTML code of the movie cards, reusing fragments from the card cache.
+
+    The movies are looked up in batches of LOOKUP_BATCH_SIZE, so only one batch of cards is
+    held in memory.
+
+    Args:
+        movies_data (dict): A dictionary containing the movie details, see generate_website().
+        card_cache (CardCache): The fragment cache, counts reused and rendered cards.
+        poster_sources (dict): Poster URL mapped to the path of its local copy, see prefetch_posters().
+
+    Yields:
+        str: An HTML string of one movie card.
+    """
+    movies = iter(movies_data.items())
+    while True:
+        cards = []
+        for movie_name, movie in islice(movies, LOOKUP_BATCH_SIZE):
+            poster_src = poster_sources.get(movie.poster_url) if poster_sources else None
+            cards.append((card_key(movie_name, movie, poster_src),
+                          partial(create_movie_card, movie_name, movie, poster_src)))
+        if not cards:
+            return
+        yield from card_cache.get_or_render_many(cards)
+
+
+def create_html_code_for_website(movies_data: dict):
+    """
+    Creates the HTML code for the grid of the html.
+
+    This function generates an HTML list of movie cards based on the provided movie data.
+    Each movie card includes the poster image, title, and release year.
+
+    Args:
+        movies_data (dict): A dictionary containing the movie details. Each key is the movie name,
+                                and its value is a Movie record with year, poster_url and rating.
+    Returns:
+        str: An HTML string representing the movie grid.
+    """
+    return "".join(iter_movie_cards(movies_data))
+
+
+def split_base_html(base_html: str, html_code_title: str):
+    """
+    Fills in the title and splits the base HTML template at the movie grid placeholder.
+
+    Args:
+        base_html (str): The content of the base HTML template.
+        html_code_title (str): The title shown on top of the page.
+
+    Returns:
+        tuple: (head (str), tail (str)), the HTML code before and after the movie grid.
+    """
+    html_head, html_tail = base_html.replace(TITLE_PLACEHOLDER, html_code_title).split(MOVIE_GRID_PLACEHOLDER, 1)
+    return html_head, html_tail
+
+
+def page_file_name(page_number: int):
+    """
+    Returns the file name of a page of the website.
+
+    Args:
+        page_number (int): Number of the page, starting at 1.
+
+    Returns:
+        str: "index.html" for the first page, "page-<number>.html" for all others.
+    """
+    return "index.html" if page_number == 1 else f"page-{page_number}.html"
+
+
+def create_page_navigation(page_number: int, has_next_page: bool):
+    """
+    Creates the links to the previous and next page.
+
+    Args:
+        page_number (int): Number of the current page, starting at 1.
+        has_next_page (bool): True if there is a page after the current one.
+
+    Returns:
+        str: An HTML string with the navigation, empty if there is only one page.
+    """
+    if page_number == 1 and not has_next_page:
+        return ""
+    links = []
+    if page_number > 1:
+        links.append(f'<a href="{page_file_name(page_number - 1)}">Previous</a>')
+    links.append(f'<span>Page {page_number}</span>')
+    if has_next_page:
+        links.append(f'<a href="{page_file_name(page_number + 1)}">Next</a>')
+    return f'    <nav class="pagination">{" ".join(links)}</nav>\n'
+
+
+def insert_before_body_end(html_tail: str, html_code: str):
+    """
+    Inserts HTML code right before the closing body tag of the template tail.
+
+    Args:
+        html_tail (str): The HTML code after the movie grid.
+        html_code (str): The HTML code to insert.
+
+    Returns:
+        str: The template tail with the code inserted, or appended if there is no body tag.
+    """
+    if not html_code:
+        return html_tail
+    position = html_tail.rfind("</body>")
+    if position == -1:
+        return html_tail + html_code
+    return html_tail[:position] + html_code + html_tail[position:]
+
+
+def write_website_pages(movie_cards, html_head: str, html_tail: str, cards_per_page: int = None):
+    """
+    Streams the movie cards into one or more HTML pages in the static folder.
+
+    Each page gets the template head, its movie cards and the template tail with a navigation
+    to the neighbouring pages. Pages left over from an earlier, longer website are removed.
+    A page is written to a temporary file and moved into place once it is complete, so the
+    static server never serves a half-written page.
+
+    Args:
+        movie_cards: An iterable of HTML strings, one per movie card.
+        html_head (str): The HTML code before the movie grid.
+        html_tail (str): The HTML code after the movie grid.
+        cards_per_page (int): Number of movie cards per page, None for a single page.
+
+    Returns:
+        bool: True if all pages were written.
+
+    Handles:
+        PermissionError: If there is no permission to write the files.
+        IOError: If there is an issue writing the files.
+    """
+    cards = iter(movie_cards)
+    next_card = next(cards, None)
+    page_number = 1
+    try:
+        while True:
+            path = os.path.join('static', page_file_name(page_number))
+            with atomic_write(path) as handle:
+                handle.write(html_head)
+                cards_on_page = 0
+                while next_card is not None and (cards_per_page is None or cards_on_page < cards_per_page):
+                    handle.write(next_card)
+                    cards_on_page += 1
+                    next_card = next(cards, None)
+                has_next_page = next_card is not None
+                handle.write(insert_before_body_end(html_tail, create_page_navigation(page_number, has_next_page)))
+            add_file_bytes("website.generate_website", path, written=True)
+            if not has_next_page:
+                break
+            page_number += 1
+        remove_stale_pages(page_number)
+        return True
+    except PermissionError:
+        print("You do not have permission to write to this file.")
+    except IOError:
+        print("There was an issue saving the file.")
+    return False
+
+
+def remove_stale_pages(page_count: int):
+    """
+    Removes page files of an earlier website that had more pages than the current one.
+
+    Args:
+        page_count (int): Number of pages of the current website.
+    """
+    for path in glob.glob(os.path.join('static', 'page-*.html')):
+        page_number = os.path.basename(path)[len("page-"):-len(".html")]
+        if page_number.isdigit() and int(page_number) > page_count:
+            os.remove(path)
+
 
 def open_base_html():
     """
@@ -69,23 +405,3 @@ def open_base_html():
         print("The file 'index_template.html' was not found.")
     except IOError:
         print("There was an issue opening the file.")
-
-
-def save_final_html_in_document(final_html: str):
-    """
-    Saves the final HTML code to a file.
-
-    This function writes the provided HTML string to a file named "index.html".
-    If an error occurs, an appropriate message is printed.
-
-    Args:
-        final_html (str): The HTML content to be saved.
-    """
-    try:
-        path = os.path.join('static', 'index.html')
-        with open(path, "w") as handle:
-            handle.write(final_html)
-    except PermissionError:
-        print("You do not have permission to write to this file.")
-    except IOError:
-        print("There was an issue saving the file.")
\ No newline at end of file
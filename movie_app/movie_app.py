@@ -1,21 +1,30 @@
-import statistics
 import random
-from movie_app.API_Movies import api_request_data
-from movie_app.generate_website import generate_website
+from movie_app.API_Movies import api_request_data, cache_stats
+from movie_app.generate_website import generate_website, validate_cards_per_page
+from movie_app.bulk_import import bulk_import, read_titles
+from storage.metrics import command
 
 
 class MovieApp:
     """user input is validated and the user can choose different commands."""
 
 
-    def __init__(self, storage):
+    def __init__(self, storage, cards_per_page: int = None, fetch_posters: bool = False):
         """
         Initializes where the data is taken from. Json or CSV.
 
         Args:
             storage: The storage object responsible for handling movie data.
+            cards_per_page (int): Number of movie cards per website page, None for a single page.
+            fetch_posters (bool): If True, the website uses local copies of the posters, downloaded on generation.
+
+        Raises:
+            ValueError: If cards_per_page is neither None nor a positive number.
         """
+        validate_cards_per_page(cards_per_page)
         self.storage = storage
+        self.cards_per_page = cards_per_page
+        self.fetch_posters = fetch_posters
 
 
     def run(self):
@@ -40,7 +49,8 @@ class MovieApp:
                 8: self.print_movies_sorted_by_rating,
                 9: self._print_movies_sorted_by_year,
                 10: self.filter_movie,
-                11: self.generate_website
+                11: self.generate_website,
+                12: self.import_movies
             }
             try:
                 print("""
@@ -57,18 +67,20 @@ class MovieApp:
         9. Movies sorted by year
         10. Filter movies
         11. Generate Website
+        12. Import movies from file
 
-        Enter choice (0-10): """, end='')
+        Enter choice (0-12): """, end='')
                 user_menu_choice = int(input(''))
                 print()
-                if 0 <= user_menu_choice <= 11:
+                if 0 <= user_menu_choice <= len(menu_functions) - 1:
                     if user_menu_choice == 0:
                         in_menu = menu_functions[user_menu_choice]()
                         break
-                    elif user_menu_choice in {1, 3, 4}:
-                        menu_functions[user_menu_choice]()
-                    elif user_menu_choice in {2, 5, 6, 7, 8, 9, 10, 11}:
-                        menu_functions[user_menu_choice](movies)
+                    with command(menu_functions[user_menu_choice].__name__):
+                        if user_menu_choice in {1, 3, 4, 12}:
+                            menu_functions[user_menu_choice]()
+                        elif user_menu_choice in {2, 5, 6, 7, 8, 9, 10, 11}:
+                            menu_functions[user_menu_choice](movies)
                         print()
                 else:
                     print(f"The number must be between 0 and {len(menu_functions) - 1}.")
@@ -78,12 +90,52 @@ class MovieApp:
             input('Press enter to continue')
 
     def generate_website(self, movies: dict):
-        """Generates a website with the movies saved in index.html"""
-        generate_website(movies)
-        print("Website successfully created")
+        """
+        Generates a website with the movies saved in index.html, only changed cards are rendered again.
+
+        The movies are streamed from the storage, the catalog is not loaded as a whole for the website.
+        """
+        report = generate_website(self.storage.stream(), self.cards_per_page, fetch_posters=self.fetch_posters)
+        if report is None:
+            return
+        if report["skipped"]:
+            print("Website is up to date, nothing changed")
+        else:
+            print(f"Website successfully created ({report['reused']} cards reused, {report['rendered']} rendered)")
+        posters = report["posters"]
+        if posters:
+            print(f"Posters: {posters['fetched']} fetched ({posters['bytes_fetched'] // 1024} KB), "
+                  f"{posters['reused']} reused ({posters['bytes_reused'] // 1024} KB), {posters['failed']} failed")
+        assets = report["assets"]
+        if assets["bytes"]:
+            print(f"Static files precompressed: {assets['bytes'] // 1024} KB to {assets['compressed_bytes'] // 1024} KB")
 
 
 
+    def import_movies(self):
+        """
+        Imports all titles of a text or CSV file with the OMDB API, using one storage write.
+
+        Prints:
+            How many movies were imported, already existed, were not found or failed.
+        """
+        file_path = input("Enter path of the file with movie titles: ").strip()
+        try:
+            titles = read_titles(file_path)
+        except (IOError, UnicodeDecodeError) as e:
+            print(f"Could not read {file_path}: {e}")
+            return
+        report = bulk_import(self.storage, titles)
+        print(f"Imported: {len(report['imported'])}, already existing: {len(report['duplicates'])}, "
+              f"not found: {len(report['not_found'])}, failed: {len(report['failed'])}")
+        for title, error in report["failed"].items():
+            print(f"{title}: {error}")
+        stats = cache_stats()
+        if stats:
+            print(f"OMDB cache hit ratio: {stats['hit_ratio']:.0%}, "
+                  f"network time saved: {stats['saved_seconds']:.1f}s")
+
+
     def exit_menu(self):
         """
         Exit the Interface.
@@ -163,8 +215,9 @@ class MovieApp:
                 title, year, rating, poster_url = api_data
             else:
                 return False
-            if title in movies:
-                print(f"Movie {title} already exist!")
+            existing_title = self.storage.find_title(title)
+            if existing_title:
+                print(f"Movie {existing_title} already exist!")
             else:
                 return api_data
 
@@ -189,6 +242,8 @@ class MovieApp:
         """
         Display statistics about the movies of the user instance.
 
+        The figures come from the rating statistics of the storage, which are updated with every change.
+
         Args:
             movies (dict): The current dictionary of movies.
 
@@ -198,61 +253,16 @@ class MovieApp:
             - Best movie
             - Worst movie
         """
-        list_of_ratings_string = [movie['rating'] for movie in movies.values()]
-        list_of_ratings_string_float = [float(rating.split("/")[0]) for rating in list_of_ratings_string]
-        print(f"Average rating: {round(statistics.mean(list_of_ratings_string_float), 1)}")
-        print(f"Median rating: {round(statistics.median(list_of_ratings_string_float), 1)}")
-        self._print_best_movie(movies)
-        self._print_worst_movie(movies)
-
-
-    def _print_best_movie(self, movies: dict):
-        """
-         Print the best rated movie from the user instance.
-
-         Args:
-             movies (dict): The current dictionary of movies.
-         """
-        movies_sorted_rating = self._movies_sorted_by_rating(movies)
-        last_movie_rating = movies[movies_sorted_rating[0]]['rating']
-        for movie in movies_sorted_rating:
-            if last_movie_rating <= movies[movie]['rating']:
-                print(f"Best movie: {movie}, {movies[movie]['rating']}")
-                last_movie_rating = movies[movie]['rating']
-            else:
-                break
-
-
-    def _print_worst_movie(self, movies: dict):
-        """
-         Print the worst rated movie from the user instance.
-
-         Args:
-             movies (dict): The current dictionary of movies.
-         """
-        movies_sorted_rating = self._movies_sorted_by_rating(movies)
-        movies_sorted_rating.reverse()
-        last_movie_rating = movies[movies_sorted_rating[0]]['rating']
-        for movie in movies_sorted_rating:
-            if last_movie_rating >= movies[movie]['rating']:
-                print(f"Worst movie: {movie}, {movies[movie]['rating']}")
-                last_movie_rating = movies[movie]['rating']
-            else:
-                break
-
-
-    def _movies_sorted_by_rating(self, movies: dict):
-        """
-        Returns a list sorted by ratings from highest to lowest.
-
-        Args:
-            movies (dict): The current dictionary of movies.
-
-        Returns:
-            list: A list of movie names sorted by rating, highest to lowest.
-        """
-        movies_sorted_rating = sorted(movies, key=lambda movie: movies[movie]['rating'], reverse=True)
-        return movies_sorted_rating
+        stats = self.storage.rating_stats()
+        if stats.mean() is None:
+            print("There are no rated movies.")
+            return
+        print(f"Average rating: {round(stats.mean(), 1)}")
+        print(f"Median rating: {round(stats.median(), 1)}")
+        for movie in stats.best():
+            print(f"Best movie: {movie}, {movies[movie].raw_rating}")
+        for movie in stats.worst():
+            print(f"Worst movie: {movie}, {movies[movie].raw_rating}")
 
 
     def print_random_movie(self, movies: dict):
@@ -263,13 +273,16 @@ class MovieApp:
              movies (dict): The current dictionary of movies.
          """
         random_movie = random.choice(list(movies.keys()))
-        print(f"Your movie for tonight: {random_movie}, it's rated {movies[random_movie]['rating']}")
+        print(f"Your movie for tonight: {random_movie}, it's rated {movies[random_movie].raw_rating}")
 
 
     def search_movies(self, movies: dict):
         """
         Get user input and search for a movie name(part) and print all related movies, case-insensitive.
 
+        The search uses the trigram index of the storage. Best matches come first,
+        if no title contains the keyword, similar titles are shown (typo-tolerant).
+
         Args:
             movies (dict): The current dictionary of movies.
 
@@ -277,9 +290,8 @@ class MovieApp:
             Movies matching the keyword (case-insensitive).
         """
         search_movie = input("Enter part of movie name: ")
-        for movie in movies:
-            if search_movie.lower() in movie.lower():
-                print(f"{movie}, {movies[movie]['rating']}")
+        for movie in self.storage.search(search_movie):
+            print(f"{movie}, {movies[movie].raw_rating}")
 
 
     def _print_movies_sorted_by_year(self, movies: dict):
@@ -289,17 +301,11 @@ class MovieApp:
         Args:
             movies (dict): The current dictionary of movies.
         """
-        movies_sorted_year = self.movies_sorted_by_year(movies)
         while True:
             user_choice = input("Do you want the latest movies first? (Y/N)").lower()
-            if user_choice == "y":
-                movies_sorted_year.reverse()
-                for movie in movies_sorted_year:
-                    print(f"{movie} ({movies[movie]['year']}): {movies[movie]['rating']}")
-                break
-            elif user_choice == "n":
-                for movie in movies_sorted_year:
-                    print(f"{movie} ({movies[movie]['year']}): {movies[movie]['rating']}")
+            if user_choice in ("y", "n"):
+                for movie in self.storage.sorted_movies("year", descending=user_choice == "y"):
+                    print(f"{movie} ({movies[movie].raw_year}): {movies[movie].raw_rating}")
                 break
             else:
                 print('Please enter "Y" or "N"')
@@ -312,9 +318,8 @@ class MovieApp:
         Args:
             movies (dict): The current dictionary of movies.
         """
-        movies_sorted_rating = self._movies_sorted_by_rating(movies)
-        for movie in movies_sorted_rating:
-            print(f"{movie} ({movies[movie]['year']}): {movies[movie]['rating']}")
+        for movie in self.storage.sorted_movies("rating", descending=True):
+            print(f"{movie} ({movies[movie].raw_year}): {movies[movie].raw_rating}")
 
 
     def movies_sorted_by_year(self, movies: dict):
@@ -327,14 +332,15 @@ class MovieApp:
         Returns:
             list: A list of movie names sorted by year, oldest to newest.
         """
-        movies_sorted_year = sorted(movies, key=lambda movie: movies[movie]['year'])
-        return movies_sorted_year
+        return list(self.storage.sorted_movies("year", descending=False))
 
 
     def filter_movie(self, movies: dict):
         """
         Filter movies based on user input. Based on minimum rating, start year, end year
 
+        The query runs on the sorted year and rating indexes of the storage, the given movies are not changed.
+
         Args:
             movies (dict): The current dictionary of movies.
 
@@ -344,22 +350,11 @@ class MovieApp:
         minimum_rating = self._get_movie_rating()
         start_year = self._get_movie_year("start")
         end_year = self._get_movie_year("end")
-        movies_to_delete = set()
-        if minimum_rating != "":
-            for movie in movies:
-                if minimum_rating > movies[movie]["rating"]:
-                    movies_to_delete.add(movie)
-        if start_year != "":
-            for movie in movies:
-                if start_year > movies[movie]["year"]:
-                    movies_to_delete.add(movie)
-        if end_year != "":
-            for movie in movies:
-                if end_year < movies[movie]["year"]:
-                    movies_to_delete.add(movie)
-        for movie_to_delete in movies_to_delete:  # movies_copy
-            del movies[movie_to_delete]
-        print(movies)
+        filtered_movies = self.storage.filter_movies(min_rating=None if minimum_rating == "" else minimum_rating,
+                                                     start_year=None if start_year == "" else start_year,
+                                                     end_year=None if end_year == "" else end_year)
+        for name, movie in filtered_movies.items():
+            print(f"{name} ({movie.raw_year}): {movie.raw_rating}")
 
 
     def _get_movie_rating(self):
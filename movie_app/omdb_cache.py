@@ -0,0 +1,149 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+DEFAULT_CACHE_PATH = os.path.join("data", "omdb_cache.sqlite")
+EVICTION_INTERVAL = 100
+
+
+def cache_key(title: str):
+    """
+    Normalizes a title into the key of the response cache.
+
+    Args:
+        title (str): The title as entered by the user.
+
+    Returns:
+        str: The NFKC normalized, casefolded title with collapsed whitespace.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", title).casefold()).strip()
+
+
+class ResponseCache:
+    """On-disk cache of OMDB API responses with TTL, negative caching and LRU eviction."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = 7 * 24 * 3600,
+                 negative_ttl: float = 24 * 3600, max_entries: int = 10000):
+        """
+        Opens or creates the response cache.
+
+        Args:
+            path (str): Path of the SQLite file holding the responses.
+            ttl (float): Seconds a found movie is served from the cache.
+            negative_ttl (float): Seconds a "movie not found" answer is served from the cache.
+            max_entries (int): Number of responses kept, the least recently used are evicted.
+        """
+        folder_path = os.path.dirname(path)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        # It is only a cache, losing the last writes on a crash is fine and keeps hits fast.
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    body TEXT NOT NULL,
+                    found INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)")
+        self.hits = 0
+        self.misses = 0
+        self.cache_seconds = 0.0
+        self.network_requests = 0
+        self.network_seconds = 0.0
+        self.puts_since_eviction = 0
+
+
+    def get(self, title: str):
+        """
+        Returns the cached response body for a title, if it is not expired.
+
+        Args:
+            title (str): The title as entered by the user.
+
+        Returns:
+            dict or None: The decoded response body, or None on a cache miss.
+        """
+        start = time.perf_counter()
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT body, found, stored_at FROM responses WHERE key = ?", (cache_key(title),)).fetchone()
+            if row and now - row[2] < (self.ttl if row[1] else self.negative_ttl):
+                with self.connection:
+                    self.connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?",
+                                            (now, cache_key(title)))
+                self.hits += 1
+                self.cache_seconds += time.perf_counter() - start
+                return json.loads(row[0])
+            self.misses += 1
+        return None
+
+
+    def put(self, title: str, body: dict, found: bool):
+        """
+        Stores a response body and evicts the least recently used entries above max_entries.
+
+        Eviction runs every EVICTION_INTERVAL puts, so the cache may briefly hold a few more entries.
+
+        Args:
+            title (str): The title as entered by the user.
+            body (dict): The decoded response body.
+            found (bool): False for "movie not found" answers, they expire after negative_ttl.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                                    (cache_key(title), json.dumps(body), int(found), now, now))
+            self.puts_since_eviction += 1
+            if self.puts_since_eviction < EVICTION_INTERVAL:
+                return
+            self.puts_since_eviction = 0
+            self.connection.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)""",
+                                    (self.max_entries,))
+
+
+    def record_network_request(self, seconds: float):
+        """
+        Counts a request that went over the network.
+
+        Args:
+            seconds (float): Latency of the request.
+        """
+        with self.lock:
+            self.network_requests += 1
+            self.network_seconds += seconds
+
+
+    def stats(self):
+        """
+        Returns hit ratio and latency figures of the cache.
+
+        Returns:
+            dict: Counters, average latencies in milliseconds and the estimated network time saved.
+        """
+        lookups = self.hits + self.misses
+        average_network = self.network_seconds / self.network_requests if self.network_requests else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "network_requests": self.network_requests,
+            "average_network_ms": average_network * 1000,
+            "average_cache_hit_ms": self.cache_seconds / self.hits * 1000 if self.hits else 0.0,
+            "saved_seconds": self.hits * average_network - self.cache_seconds,
+        }
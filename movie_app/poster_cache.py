@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from movie_app.API_Movies import REQUEST_TIMEOUT, get_session
+from storage.atomic_file import atomic_write
+from storage.metrics import add_bytes, instrumented
+
+POSTER_DIR = os.path.join('static', 'posters')
+POSTER_INDEX_PATH = os.path.join('static', '.poster_index.json')
+# Path of the poster folder as seen from the HTML pages in the static folder.
+POSTER_URL_PREFIX = "posters/"
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif", ".svg")
+
+
+def poster_file_name(url: str):
+    """
+    Returns the local file name of a poster, derived from the hash of its URL.
+
+    Args:
+        url (str): The remote URL of the poster.
+
+    Returns:
+        str: 32 hex characters of the SHA-256 of the URL plus the image suffix of the URL, ".jpg" by default.
+    """
+    suffix = os.path.splitext(urlsplit(url).path)[1].lower()
+    if suffix not in IMAGE_SUFFIXES:
+        suffix = ".jpg"
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + suffix
+
+
+def read_poster_index():
+    """
+    Reads the index of the downloaded posters.
+
+    Returns:
+        dict: Poster URL mapped to its entry, empty if there is no index or it can not be read.
+    """
+    try:
+        with open(POSTER_INDEX_PATH, "r") as handle:
+            return json.load(handle)
+    except (IOError, ValueError):
+        return {}
+
+
+@instrumented("posters.fetch_poster")
+def fetch_poster(url: str, entry: dict = None, timeout=REQUEST_TIMEOUT):
+    """
+    Downloads a poster, or revalidates the local copy with a conditional request.
+
+    The ETag and Last-Modified of the last download are sent as If-None-Match and
+    If-Modified-Since, so an unchanged poster is answered with 304 Not Modified and no body.
+
+    Args:
+        url (str): The remote URL of the poster.
+        entry (dict): The index entry of the local copy, None if there is none.
+        timeout: Seconds to wait for the server, a number or a (connect, read) tuple.
+
+    Returns:
+        tuple: (status, entry, size). status is "fetched", "reused" or "failed". entry is the new
+               index entry, the old one if the download failed, None if there is no local copy.
+               size is the number of bytes downloaded, or of the reused copy.
+    """
+    import requests
+    path = os.path.join(POSTER_DIR, poster_file_name(url))
+    if entry is not None and not os.path.exists(path):
+        entry = None
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    try:
+        response = get_session().get(url, headers=headers, timeout=timeout)
+    except requests.exceptions.RequestException:
+        return "failed", entry, 0
+    if response.status_code == 304 and entry is not None:
+        return "reused", entry, entry["size"]
+    if response.status_code != 200 or not response.content:
+        return "failed", entry, 0
+    try:
+        with atomic_write(path, binary=True) as handle:
+            handle.write(response.content)
+    except IOError:
+        return "failed", entry, 0
+    add_bytes("posters.fetch_poster", read=len(response.content))
+    entry = {"file": poster_file_name(url), "size": len(response.content),
+             "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+    return "fetched", entry, len(response.content)
+
+
+def reuse_or_fetch_poster(url: str, entry: dict = None, timeout=REQUEST_TIMEOUT, revalidate: bool = True):
+    """
+    Reuses the local copy of a poster without a request, or fetches the poster, see fetch_poster().
+
+    Args:
+        url (str): The remote URL of the poster.
+        entry (dict): The index entry of the local copy, None if there is none.
+        timeout: Seconds to wait for the server, a number or a (connect, read) tuple.
+        revalidate (bool): If True, an existing local copy is revalidated with the server.
+
+    Returns:
+        tuple: (status, entry, size), see fetch_poster().
+    """
+    if not revalidate and entry is not None and os.path.exists(os.path.join(POSTER_DIR, entry["file"])):
+        return "reused", entry, entry["size"]
+    return fetch_poster(url, entry, timeout)
+
+
+@instrumented("posters.prefetch_posters")
+def prefetch_posters(poster_urls, workers: int = 8, timeout=REQUEST_TIMEOUT, revalidate: bool = True):
+    """
+    Brings the local copies of the posters in the static folder up to date.
+
+    Every URL is downloaded once, however many movies share it. Posters that were downloaded
+    before are revalidated with a conditional request, see fetch_poster(), or without revalidate
+    reused as they are, so only new posters cause a request. The downloads run in
+    a thread pool of bounded size over the pooled session of the OMDB API. Posters that are no
+    longer used are deleted. If a poster can not be fetched, an older copy is still used.
+    URLs that are not http(s), like the "N/A" of the OMDB API, are skipped.
+
+    Args:
+        poster_urls: An iterable of poster URLs, duplicates are allowed.
+        workers (int): Number of downloads running at the same time.
+        timeout: Seconds to wait for the server per request, a number or a (connect, read) tuple.
+        revalidate (bool): If True, posters downloaded before are revalidated with the server.
+
+    Returns:
+        tuple: (sources, report). sources maps a poster URL to the path of its local copy relative
+               to the static folder. report holds "fetched", "reused" and "failed" (number of
+               posters) and "bytes_fetched" and "bytes_reused".
+    """
+    urls = sorted({url for url in poster_urls if url and urlsplit(url).scheme in ("http", "https")})
+    old_index = read_poster_index()
+    os.makedirs(POSTER_DIR, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        results = list(executor.map(lambda url: reuse_or_fetch_poster(url, old_index.get(url), timeout, revalidate),
+                                    urls))
+
+    index = {}
+    report = {"fetched": 0, "reused": 0, "failed": 0, "bytes_fetched": 0, "bytes_reused": 0}
+    for url, (status, entry, size) in zip(urls, results):
+        report[status] += 1
+        if status == "fetched":
+            report["bytes_fetched"] += size
+        elif status == "reused":
+            report["bytes_reused"] += size
+        if entry is not None:
+            index[url] = entry
+    used_files = {entry["file"] for entry in index.values()}
+    if os.path.isdir(POSTER_DIR):
+        for name in os.listdir(POSTER_DIR):
+            if name not in used_files and not name.startswith("."):
+                os.remove(os.path.join(POSTER_DIR, name))
+    try:
+        with atomic_write(POSTER_INDEX_PATH) as handle:
+            json.dump(index, handle, indent=4)
+    except IOError:
+        print("There was an issue saving the poster index.")
+    sources = {url: POSTER_URL_PREFIX + entry["file"] for url, entry in index.items()}
+    return sources, report
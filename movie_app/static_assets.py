@@ -0,0 +1,151 @@
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+from storage.atomic_file import atomic_write
+
+STATIC_DIR = 'static'
+ASSET_MANIFEST_PATH = os.path.join(STATIC_DIR, '.asset_manifest.json')
+# Content-Encoding name mapped to the file suffix of the precompressed sibling.
+ENCODINGS = {"gzip": ".gz", "xz": ".xz"}
+COMPRESSIBLE_SUFFIXES = (".html", ".css", ".js", ".json", ".svg", ".txt")
+# Smaller files gain next to nothing from compression.
+MIN_COMPRESS_BYTES = 512
+EXCLUDED_FILES = {"index_template.html"}
+
+
+def hash_file(path: str):
+    """
+    Hashes the content of a file in chunks.
+
+    Args:
+        path (str): The file to hash.
+
+    Returns:
+        str: Hex SHA-256 digest of the content.
+    """
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def compress_file(path: str, encoding: str):
+    """
+    Writes the precompressed sibling of a file, e.g. index.html.gz, streaming the content.
+
+    The gzip header holds no timestamp, so the same content always gives the same file.
+
+    Args:
+        path (str): The file to compress.
+        encoding (str): "gzip" or "xz".
+
+    Returns:
+        int: Size of the compressed file in bytes.
+    """
+    compressed_path = path + ENCODINGS[encoding]
+    with open(path, "rb") as source, atomic_write(compressed_path, binary=True) as handle:
+        if encoding == "gzip":
+            target = gzip.GzipFile(filename="", mode="wb", fileobj=handle, compresslevel=9, mtime=0)
+        else:
+            target = lzma.LZMAFile(handle, mode="wb", preset=6)
+        with target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+    return os.path.getsize(compressed_path)
+
+
+def list_static_files():
+    """
+    Lists the files in the static folder and its subfolders, like the downloaded posters.
+
+    Returns:
+        list: Sorted file names relative to the static folder, "/" separated. Hidden files and
+              folders, excluded files and precompressed siblings are left out.
+    """
+    names = []
+    compressed_suffixes = tuple(ENCODINGS.values())
+    for folder, subfolders, files in os.walk(STATIC_DIR):
+        subfolders[:] = [subfolder for subfolder in subfolders if not subfolder.startswith(".")]
+        prefix = os.path.relpath(folder, STATIC_DIR).replace(os.sep, "/")
+        for name in files:
+            if name.startswith(".") or name in EXCLUDED_FILES or name.endswith(compressed_suffixes):
+                continue
+            names.append(name if prefix == "." else f"{prefix}/{name}")
+    return sorted(names)
+
+
+def read_asset_manifest():
+    """
+    Reads the manifest of the static files.
+
+    Returns:
+        dict: File name mapped to its entry, empty if there is no manifest or it can not be read.
+    """
+    try:
+        with open(ASSET_MANIFEST_PATH, "r") as handle:
+            return json.load(handle)
+    except (IOError, ValueError):
+        return {}
+
+
+def update_static_assets(encodings: tuple = ("gzip",)):
+    """
+    Brings the precompressed siblings and the manifest of the static files up to date.
+
+    For every file in the static folder and its subfolders the manifest holds the SHA-256 of its content, which
+    the static server uses as ETag, its size and the precompressed siblings with their sizes.
+    Files with the same mtime and size as in the manifest are not hashed or compressed again,
+    so calling this after every website generation only costs a stat() for unchanged files.
+    Siblings of removed files and siblings that do not make the file smaller are deleted.
+
+    Args:
+        encodings (tuple): Encodings to precompress text files with, "gzip" and/or "xz".
+
+    Returns:
+        dict: "hashed" and "compressed", the number of files that were new or changed, and
+              "bytes" and "compressed_bytes", the total size of the compressible files and of
+              their smallest variant.
+    """
+    old_manifest = read_asset_manifest()
+    manifest = {}
+    report = {"hashed": 0, "compressed": 0, "bytes": 0, "compressed_bytes": 0}
+    compressed_suffixes = tuple(ENCODINGS.values())
+    for name in list_static_files():
+        path = os.path.join(STATIC_DIR, *name.split("/"))
+        stat = os.stat(path)
+        entry = old_manifest.get(name)
+        wanted = [encoding for encoding in encodings
+                  if name.endswith(COMPRESSIBLE_SUFFIXES) and stat.st_size >= MIN_COMPRESS_BYTES]
+        unchanged = (entry is not None and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size
+                     and entry["checked_encodings"] == sorted(wanted)
+                     and all(os.path.exists(path + ENCODINGS[encoding]) for encoding in entry["encodings"]))
+        if not unchanged:
+            entry = {"hash": hash_file(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                     "checked_encodings": sorted(wanted), "encodings": {}}
+            report["hashed"] += 1
+            for encoding in wanted:
+                compressed_size = compress_file(path, encoding)
+                if compressed_size < stat.st_size:
+                    entry["encodings"][encoding] = compressed_size
+                    report["compressed"] += 1
+        for encoding, suffix in ENCODINGS.items():
+            if encoding not in entry["encodings"] and os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        if wanted:
+            report["bytes"] += stat.st_size
+            report["compressed_bytes"] += min([stat.st_size, *entry["encodings"].values()])
+        manifest[name] = entry
+    for name in old_manifest.keys() - manifest.keys():
+        for suffix in compressed_suffixes:
+            path = os.path.join(STATIC_DIR, *name.split("/")) + suffix
+            if os.path.exists(path):
+                os.remove(path)
+    try:
+        with atomic_write(ASSET_MANIFEST_PATH) as handle:
+            json.dump(manifest, handle, indent=4)
+    except IOError:
+        print("There was an issue saving the static file manifest.")
+    return report
@@ -0,0 +1,192 @@
+"""
+Small static file server for the generated website.
+
+    python -m movie_app.static_server --port 8080
+
+Only the files listed in the manifest of update_static_assets() are served, e.g. index.html or
+posters/<hash>.jpg, so no path outside the static folder can be requested. Text files are
+sent precompressed if the client accepts gzip (or xz) in Accept-Encoding, the smallest accepted
+variant wins. The content hash from the manifest is sent as ETag, so a revisit with
+If-None-Match is answered with 304 Not Modified instead of the whole page. The manifest is
+read again when it changes, so a new generate is picked up without restarting the server.
+"""
+import argparse
+import mimetypes
+import os
+import shutil
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+from movie_app.static_assets import ASSET_MANIFEST_PATH, ENCODINGS, STATIC_DIR, read_asset_manifest
+
+
+def accepted_encodings(header: str):
+    """
+    Parses an Accept-Encoding header.
+
+    Args:
+        header (str): The header value, e.g. "gzip, deflate, br;q=0.9".
+
+    Returns:
+        set: The encodings with a q-value above 0, "*" stands for all.
+    """
+    encodings = set()
+    for part in header.split(","):
+        encoding, _, parameters = part.strip().partition(";")
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            name, _, value = parameter.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if encoding and quality > 0:
+            encodings.add(encoding.lower())
+    return encodings
+
+
+def etag_matches(header: str, content_hash: str):
+    """
+    Checks an If-None-Match header against the content hash of a file (weak comparison).
+
+    Args:
+        header (str): The header value, e.g. '"abc-gzip", W/"def"' or "*".
+        content_hash (str): The content hash from the manifest.
+
+    Returns:
+        bool: True if one of the tags belongs to the file, in any encoding.
+    """
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        tag = tag.removeprefix("W/").strip('"')
+        if tag.split("-", 1)[0] == content_hash:
+            return True
+    return False
+
+
+class StaticManifest:
+    """The manifest of the static files, read again whenever the file on disk changes."""
+
+    def __init__(self):
+        """Initializes the StaticManifest, the manifest is read on first use."""
+        self.entries = {}
+        self.signature = None
+
+
+    def get(self, name: str):
+        """
+        Returns the manifest entry of a file.
+
+        Args:
+            name (str): File name relative to the static folder, "/" separated.
+
+        Returns:
+            dict or None: The entry, None if the file is not served.
+        """
+        try:
+            stat = os.stat(ASSET_MANIFEST_PATH)
+            signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            signature = None
+        if signature != self.signature:
+            self.entries = read_asset_manifest()
+            self.signature = signature
+        return self.entries.get(name)
+
+
+class StaticRequestHandler(BaseHTTPRequestHandler):
+    """Answers GET and HEAD requests for the files in the manifest."""
+
+    manifest = StaticManifest()
+    protocol_version = "HTTP/1.1"
+
+
+    def do_GET(self):
+        """Sends the file, precompressed if possible, or 304 if the client has it already."""
+        self.send_file(include_body=True)
+
+
+    def do_HEAD(self):
+        """Sends the headers of the file without the body."""
+        self.send_file(include_body=False)
+
+
+    def send_file(self, include_body: bool):
+        """
+        Answers a request for a static file.
+
+        Args:
+            include_body (bool): If False, only the headers are sent.
+        """
+        name = unquote(urlsplit(self.path).path).lstrip("/") or "index.html"
+        entry = self.manifest.get(name)
+        if entry is None:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+        encoding = None
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding", ""))
+        for candidate, size in sorted(entry["encodings"].items(), key=lambda item: item[1]):
+            if candidate in accepted or "*" in accepted:
+                encoding = candidate
+                break
+        etag = f'"{entry["hash"]}-{encoding}"' if encoding else f'"{entry["hash"]}"'
+        if etag_matches(self.headers.get("If-None-Match", ""), entry["hash"]):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_common_headers(etag)
+            self.end_headers()
+            return
+        path = os.path.join(STATIC_DIR, *name.split("/")) + (ENCODINGS[encoding] if encoding else "")
+        try:
+            handle = open(path, "rb")
+        except FileNotFoundError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+        with handle:
+            self.send_response(HTTPStatus.OK)
+            self.send_common_headers(etag)
+            self.send_header("Content-Type", mimetypes.guess_type(name)[0] or "application/octet-stream")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.send_header("Content-Length", str(os.fstat(handle.fileno()).st_size))
+            self.end_headers()
+            if include_body:
+                shutil.copyfileobj(handle, self.wfile, 1024 * 1024)
+
+
+    def send_common_headers(self, etag: str):
+        """
+        Sends the headers of both 200 and 304 responses.
+
+        Args:
+            etag (str): The ETag of the sent variant.
+        """
+        self.send_header("ETag", etag)
+        # Browsers may keep the file but have to revalidate it, which costs a 304 when nothing changed.
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+
+
+def main():
+    """Parses the command line and serves the static folder until it is interrupted."""
+    parser = argparse.ArgumentParser(description="Serve the generated website.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default %(default)s)")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (default %(default)s)")
+    args = parser.parse_args()
+    if not read_asset_manifest():
+        print("No static file manifest found, generate the website first.")
+        return
+    server = ThreadingHTTPServer((args.host, args.port), StaticRequestHandler)
+    print(f"Serving {STATIC_DIR} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Bye!")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import contextlib
+import os
+import tempfile
+
+
+@contextlib.contextmanager
+def atomic_write(path: str, newline: str = None, binary: bool = False):
+    """
+    Opens a temporary file next to path for writing and moves it over path once it is complete.
+
+    The data is flushed and fsynced before the rename, so after a crash the file either holds
+    the old or the new content, never a truncated mix. If the block raises, the temporary
+    file is removed and path is left untouched.
+
+    Args:
+        path (str): The file to replace.
+        newline (str): Passed on to open(), e.g. "" for the csv module.
+        binary (bool): If True, the temporary file is opened in binary mode.
+
+    Yields:
+        The text or binary handle of the temporary file.
+    """
+    folder_path = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=folder_path, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with open(fd, "wb") if binary else open(fd, "w", newline=newline) as handle:
+            yield handle
+            handle.flush()
+            os.fsync(handle.fileno())
+        try:
+            os.chmod(temp_path, os.stat(path).st_mode)
+        except FileNotFoundError:
+            os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+    # The rename itself is only durable once the directory entry is on disk.
+    with contextlib.suppress(OSError):
+        directory_fd = os.open(folder_path, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
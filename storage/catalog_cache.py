@@ -0,0 +1,68 @@
+import os
+
+
+class CatalogCache:
+    """Keeps the parsed movie data in memory as long as the files on disk did not change."""
+
+    def __init__(self):
+        """Initializes an empty CatalogCache with zeroed hit and miss counters."""
+        self.data = None
+        self.signature = None
+        self.hits = 0
+        self.misses = 0
+
+
+    @staticmethod
+    def file_signature(*paths: str):
+        """
+        Builds a signature of the given files from their mtime, size and inode.
+
+        Args:
+            *paths (str): Paths of all files the parsed data depends on.
+
+        Returns:
+            tuple: One (mtime_ns, size, inode) entry per file, None for missing files.
+        """
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+
+    def get(self, signature: tuple):
+        """
+        Returns the cached data if it was stored for the same file signature.
+
+        Args:
+            signature (tuple): The current signature of the files, see file_signature().
+
+        Returns:
+            dict or None: The cached movie data, or None on a cache miss.
+        """
+        if self.data is not None and self.signature == signature:
+            self.hits += 1
+            return self.data
+        self.misses += 1
+        return None
+
+
+    def store(self, data: dict, signature: tuple):
+        """
+        Stores parsed or freshly written data together with the signature of its files.
+
+        Args:
+            data (dict): The movie data.
+            signature (tuple): The signature of the files holding exactly this data.
+        """
+        self.data = data
+        self.signature = signature
+
+
+    def invalidate(self):
+        """Drops the cached data, the next read parses the files again."""
+        self.data = None
+        self.signature = None
@@ -0,0 +1,457 @@
+import json
+import math
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import MutableMapping
+from storage.movie import Movie
+from storage.title_index import normalize_title
+
+MAGIC = b"MOVCOL01"
+# Missing years are stored as this value, missing ratings as NaN.
+NO_YEAR = -2 ** 31
+SECTIONS = (
+    "years",             # int32 per row
+    "ratings",           # float64 per row
+    "title_order",       # uint32 rows sorted by title
+    "key_order",         # uint32 rows sorted by normalized title, for case-insensitive lookups
+    "year_order",        # uint32 rows with a year, sorted by (year, title)
+    "year_missing",      # uint32 rows without a year, sorted by title
+    "rating_order",      # uint32 rows with a rating, sorted by (rating, title)
+    "rating_missing",    # uint32 rows without a rating, sorted by title
+    "title_offsets", "title_heap",
+    "poster_offsets", "poster_heap",
+    "raw_year_offsets", "raw_year_heap",
+    "raw_rating_offsets", "raw_rating_heap",
+)
+# magic, movie count, rated movie count, sum of all ratings, then (offset, length) per section.
+HEADER = struct.Struct("<8sIId" + "QQ" * len(SECTIONS))
+# Typecodes of the numeric sections, the heaps are plain bytes.
+TYPECODES = {"years": "i", "ratings": "d", "title_offsets": "Q", "poster_offsets": "Q",
+             "raw_year_offsets": "Q", "raw_rating_offsets": "Q"}
+
+
+def _string_heap(values):
+    """
+    Packs strings into one UTF-8 heap with an offsets table.
+
+    Args:
+        values: The strings, in row order.
+
+    Returns:
+        tuple: (offsets, heap), string i is heap[offsets[i]:offsets[i + 1]].
+    """
+    offsets = array("Q", [0])
+    heap = bytearray()
+    for value in values:
+        heap += value.encode("utf-8")
+        offsets.append(len(heap))
+    return offsets, heap
+
+
+class _SpilledHeap:
+    """String heap built in a temporary file, only its offsets table is kept in memory."""
+
+    def __init__(self):
+        """Creates the empty heap."""
+        self.offsets = array("Q", [0])
+        self.file = tempfile.TemporaryFile()
+
+
+    def append(self, value: str):
+        """
+        Adds a string at the end of the heap.
+
+        Args:
+            value (str): The string.
+        """
+        encoded = value.encode("utf-8")
+        self.file.write(encoded)
+        self.offsets.append(self.offsets[-1] + len(encoded))
+
+
+    def __len__(self):
+        """Returns the size of the heap in bytes."""
+        return self.offsets[-1]
+
+
+    def copy_to(self, handle):
+        """
+        Writes the heap to a handle.
+
+        Args:
+            handle: Binary handle to write to.
+        """
+        self.file.seek(0)
+        shutil.copyfileobj(self.file, handle)
+
+
+def write_columnar(handle, movies):
+    """
+    Writes movies in the binary columnar format.
+
+    Year and rating become fixed-width numeric columns. Title, poster URL and the raw year
+    and rating values go to string heaps. The sort orders used for lookups, sorting, filtering
+    and statistics are precomputed, so readers never have to sort.
+
+    The titles, the numeric columns and the sort orders are built in memory, the sort orders
+    need all of them. Poster URLs and raw values are only copied, their heaps are spilled to
+    temporary files while the movies are read.
+
+    Args:
+        handle: Binary handle to write to.
+        movies: Iterable of (title, Movie) pairs.
+    """
+    posters, raw_years, raw_ratings = _SpilledHeap(), _SpilledHeap(), _SpilledHeap()
+    try:
+        _write_columnar(handle, movies, posters, raw_years, raw_ratings)
+    finally:
+        for heap in (posters, raw_years, raw_ratings):
+            heap.file.close()
+
+
+def _write_columnar(handle, movies, posters: _SpilledHeap, raw_years: _SpilledHeap, raw_ratings: _SpilledHeap):
+    """
+    Writes movies in the binary columnar format, see write_columnar().
+
+    Args:
+        handle: Binary handle to write to.
+        movies: Iterable of (title, Movie) pairs.
+        posters (_SpilledHeap): Empty heap for the JSON encoded poster URLs.
+        raw_years (_SpilledHeap): Empty heap for the JSON encoded raw years.
+        raw_ratings (_SpilledHeap): Empty heap for the JSON encoded raw ratings.
+    """
+    titles = []
+    years = array("i")
+    ratings = array("d")
+    for title, movie in movies:
+        titles.append(title)
+        posters.append(json.dumps(movie.poster_url))
+        raw_years.append(json.dumps(movie.raw_year))
+        raw_ratings.append(json.dumps(movie.raw_rating))
+        years.append(NO_YEAR if movie.year is None else movie.year)
+        ratings.append(math.nan if movie.rating is None else movie.rating)
+
+    rows = range(len(titles))
+    title_order = sorted(rows, key=titles.__getitem__)
+    # Stable sorts: equal normalized titles keep the file order, equal values keep the title order.
+    key_order = sorted(rows, key=lambda row: normalize_title(titles[row]))
+    year_order = sorted((row for row in title_order if years[row] != NO_YEAR), key=years.__getitem__)
+    rating_order = sorted((row for row in title_order if ratings[row] == ratings[row]), key=ratings.__getitem__)
+    title_offsets, title_heap = _string_heap(titles)
+    sections = {
+        "years": years.tobytes(),
+        "ratings": ratings.tobytes(),
+        "title_order": array("I", title_order).tobytes(),
+        "key_order": array("I", key_order).tobytes(),
+        "year_order": array("I", year_order).tobytes(),
+        "year_missing": array("I", (row for row in title_order if years[row] == NO_YEAR)).tobytes(),
+        "rating_order": array("I", rating_order).tobytes(),
+        "rating_missing": array("I", (row for row in title_order if ratings[row] != ratings[row])).tobytes(),
+        "title_offsets": title_offsets.tobytes(), "title_heap": title_heap,
+        "poster_offsets": posters.offsets.tobytes(), "poster_heap": posters,
+        "raw_year_offsets": raw_years.offsets.tobytes(), "raw_year_heap": raw_years,
+        "raw_rating_offsets": raw_ratings.offsets.tobytes(), "raw_rating_heap": raw_ratings,
+    }
+
+    table = []
+    position = HEADER.size
+    for name in SECTIONS:
+        position += -position % 8  # 8-byte aligned, so the sections can be cast to numeric views
+        table += [position, len(sections[name])]
+        position += len(sections[name])
+    rating_sum = math.fsum(ratings[row] for row in rating_order)
+    handle.write(HEADER.pack(MAGIC, len(titles), len(rating_order), rating_sum, *table))
+    position = HEADER.size
+    for name in SECTIONS:
+        handle.write(b"\0" * (-position % 8))
+        position += -position % 8
+        if isinstance(sections[name], _SpilledHeap):
+            sections[name].copy_to(handle)
+        else:
+            handle.write(sections[name])
+        position += len(sections[name])
+
+
+class ColumnarMovies(MutableMapping):
+    """
+    Movie dictionary backed by a memory-mapped columnar file.
+
+    Opening only maps the file and reads the header, rows are decoded when they are accessed.
+    Titles are found by binary search in the precomputed title order. Changes are kept in
+    an overlay in memory until the data is written again, the column queries only work
+    on a clean mapping (see clean).
+    """
+
+    def __init__(self, file_path: str):
+        """
+        Maps the columnar file. A missing or empty file gives an empty mapping.
+
+        Args:
+            file_path (str): Path to the columnar file.
+
+        Raises:
+            ValueError: If the file is not in the columnar format.
+        """
+        self.count = 0
+        self.rated_count = 0
+        self.rating_sum = 0.0
+        self._sections = {}
+        self._mmap = None
+        self._changed = {}
+        self._added = {}
+        self._deleted = set()
+        try:
+            with open(file_path, "rb") as handle:
+                if os.fstat(handle.fileno()).st_size:
+                    self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return
+        if self._mmap is None:
+            return
+        if len(self._mmap) < HEADER.size or self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError("File is not in the columnar movie format")
+        magic, self.count, self.rated_count, self.rating_sum, *table = HEADER.unpack_from(self._mmap)
+        view = memoryview(self._mmap)
+        for number, name in enumerate(SECTIONS):
+            offset, length = table[2 * number], table[2 * number + 1]
+            if offset + length > len(self._mmap):
+                raise ValueError("Columnar file is truncated")
+            section = view[offset:offset + length]
+            self._sections[name] = section if name.endswith("_heap") else section.cast(TYPECODES.get(name, "I"))
+
+
+    @property
+    def clean(self):
+        """True if a file is mapped and there are no changes on top of it, only then the column queries work."""
+        return bool(self._sections) and not (self._changed or self._deleted)
+
+
+    def _string(self, field: str, row: int):
+        """
+        Decodes one string of a heap.
+
+        Args:
+            field (str): "title", "poster", "raw_year" or "raw_rating".
+            row (int): The row number.
+
+        Returns:
+            str: The stored string.
+        """
+        offsets = self._sections[field + "_offsets"]
+        return str(self._sections[field + "_heap"][offsets[row]:offsets[row + 1]], "utf-8")
+
+
+    def title_at(self, row: int):
+        """Returns the title of a row."""
+        return self._string("title", row)
+
+
+    def movie_at(self, row: int):
+        """Decodes the Movie record of a row."""
+        return Movie(self.title_at(row), json.loads(self._string("raw_year", row)),
+                     json.loads(self._string("raw_rating", row)), json.loads(self._string("poster", row)))
+
+
+    def find_row(self, title: str):
+        """
+        Finds the row of a title in the file by binary search.
+
+        Args:
+            title (str): Title as stored.
+
+        Returns:
+            int or None: The row number, None if the file does not hold the title.
+        """
+        order = self._sections.get("title_order", ())
+        position = bisect_left(order, title, key=self.title_at)
+        if position < len(order) and self.title_at(order[position]) == title:
+            return order[position]
+        return None
+
+
+    def find_title(self, title: str):
+        """
+        Finds a title case-insensitive by binary search in the normalized title order.
+
+        Args:
+            title (str): Title of the movie in any casing.
+
+        Returns:
+            str or None: The title as stored, the one with the same casing if several only differ
+                         in case, otherwise the first one in file order.
+        """
+        if self.find_row(title) is not None:
+            return title
+        key = normalize_title(title)
+        order = self._sections.get("key_order", ())
+        position = bisect_left(order, key, key=lambda row: normalize_title(self.title_at(row)))
+        if position < len(order) and normalize_title(self.title_at(order[position])) == key:
+            return self.title_at(order[position])
+        return None
+
+
+    def __getitem__(self, title: str):
+        """Returns the Movie record of a title, decoded from the file unless it was changed."""
+        if title in self._changed:
+            return self._changed[title]
+        if title not in self._deleted:
+            row = self.find_row(title)
+            if row is not None:
+                return self.movie_at(row)
+        raise KeyError(title)
+
+
+    def __setitem__(self, title: str, movie):
+        """Adds or replaces a movie in the overlay."""
+        # Like a dict, a new or deleted and re-added title goes to the end.
+        if title not in self._changed and (title in self._deleted or self.find_row(title) is None):
+            self._added[title] = None
+        self._changed[title] = movie
+
+
+    def __delitem__(self, title: str):
+        """Deletes a movie, file rows are hidden by the overlay."""
+        if title in self._added:
+            del self._added[title]
+            del self._changed[title]
+            return
+        if title in self._deleted or self.find_row(title) is None:
+            raise KeyError(title)
+        self._changed.pop(title, None)
+        self._deleted.add(title)
+
+
+    def __len__(self):
+        """Returns the number of movies."""
+        return self.count - len(self._deleted) + len(self._added)
+
+
+    def __iter__(self):
+        """Iterates over the titles in file order, added titles last."""
+        for row in range(self.count):
+            title = self.title_at(row)
+            if title not in self._deleted:
+                yield title
+        yield from list(self._added)
+
+
+    def items(self):
+        """
+        Iterates over all movies, decoding one row at a time.
+
+        Yields:
+            tuple: (title, Movie) in file order, added movies last.
+        """
+        for row in range(self.count):
+            title = self.title_at(row)
+            if title in self._deleted:
+                continue
+            movie = self._changed.get(title)
+            yield title, movie if movie is not None else self.movie_at(row)
+        for title in list(self._added):
+            yield title, self._changed[title]
+
+
+    def values(self):
+        """Iterates over the Movie records in file order."""
+        for _, movie in self.items():
+            yield movie
+
+
+    def range_rows(self, field: str, low=None, high=None):
+        """
+        Returns the rows with a year or rating between low and high, by binary search in the sort order.
+
+        Args:
+            field (str): "year" or "rating".
+            low (int or float): Lowest value, None for no lower bound.
+            high (int or float): Highest value, None for no upper bound.
+
+        Returns:
+            memoryview: The rows sorted by (value, title).
+        """
+        order = self._sections[field + "_order"]
+        values = self._sections[field + "s"]
+        start = 0 if low is None else bisect_left(order, low, key=values.__getitem__)
+        end = len(order) if high is None else bisect_right(order, high, key=values.__getitem__)
+        return order[start:max(start, end)]
+
+
+    def value_at(self, field: str, row: int):
+        """
+        Returns the year or rating of a row.
+
+        Returns:
+            int or float or None: The value, None if the movie has none.
+        """
+        value = self._sections[field + "s"][row]
+        if field == "year":
+            return None if value == NO_YEAR else value
+        return None if value != value else value
+
+
+    def sorted_rows(self, field: str, descending: bool = False):
+        """
+        Iterates over all rows sorted by year or rating, movies without a value below all numbers.
+
+        Ties, and the movies without a value, are in title order in both directions.
+
+        Args:
+            field (str): "year" or "rating".
+            descending (bool): If True, the highest values come first.
+
+        Yields:
+            int: The row numbers.
+        """
+        order = self._sections[field + "_order"]
+        missing = self._sections[field + "_missing"]
+        values = self._sections[field + "s"]
+        if not descending:
+            yield from missing
+            yield from order
+            return
+        end = len(order)
+        while end:
+            start = bisect_left(order, values[order[end - 1]], 0, end, key=values.__getitem__)
+            yield from order[start:end]
+            end = start
+        yield from missing
+
+
+    def median_rating(self):
+        """Returns the median rating, None if there are no rated movies."""
+        order = self._sections.get("rating_order", ())
+        ratings = self._sections.get("ratings")
+        size = len(order)
+        if not size:
+            return None
+        if size % 2:
+            return ratings[order[size // 2]]
+        return (ratings[order[size // 2 - 1]] + ratings[order[size // 2]]) / 2
+
+
+    def rating_ties(self, best: bool):
+        """
+        Returns the titles sharing the highest or the lowest rating.
+
+        Args:
+            best (bool): True for the highest, False for the lowest rating.
+
+        Returns:
+            list: The titles in alphabetical order.
+        """
+        order = self._sections.get("rating_order", ())
+        if not len(order):
+            return []
+        ratings = self._sections["ratings"]
+        if best:
+            start = bisect_left(order, ratings[order[-1]], key=ratings.__getitem__)
+            rows = order[start:]
+        else:
+            rows = order[:bisect_right(order, ratings[order[0]], key=ratings.__getitem__)]
+        return [self.title_at(row) for row in rows]
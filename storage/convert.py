@@ -0,0 +1,195 @@
+"""
+Converts a movie catalog from one storage backend into another, streaming the movies.
+
+Run from the repository root, the files are looked up in the data folder:
+
+    python -m storage.convert movies.json movies.csv
+    python -m storage.convert movies.csv movies.sqlite --force
+
+The movies are streamed from the source and written to the target one by one, so for the
+JSON, CSV and SQLite targets memory use does not grow with the catalog. The columnar target
+is the exception: its sort orders are precomputed from the titles and the numeric columns,
+which stay in memory, only the other string columns are spilled to temporary files (about
+80 MB for 200,000 movies, against about 20 MB for CSV). Progress and throughput are printed
+while copying. Afterwards the target is streamed again and its record count and checksum must
+match the ones of the source, otherwise the script exits with status 1.
+
+Both files are opened in journal mode where the format has one: the changes still waiting in
+the log of the source are copied as well, and the log of an overwritten target is emptied.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from storage.storage_factory import JOURNAL_FORMATS, open_storage
+
+PROGRESS_INTERVAL = 1.0
+CHECKSUM_BITS = 128
+
+
+def record_checksum(title: str, movie) -> int:
+    """
+    Hashes one movie, with the values as text, the way the Csv format stores them.
+
+    Args:
+        title (str): Title of the movie.
+        movie (Movie): The movie record.
+
+    Returns:
+        int: The hash of the record.
+    """
+    fields = (title, "" if movie.raw_year is None else str(movie.raw_year),
+              "" if movie.raw_rating is None else str(movie.raw_rating),
+              "" if movie.poster_url is None else str(movie.poster_url))
+    text = "\0".join(fields).encode("utf-8", "surrogatepass")
+    digest = hashlib.blake2b(text, digest_size=CHECKSUM_BITS // 8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class ConversionProgress:
+    """
+    Passes the movies of a stream on, counting and checksumming them and printing the progress.
+
+    The checksum is the sum of the record hashes, so it does not depend on the order of the movies.
+    """
+
+    def __init__(self, movies, label: str, output=sys.stderr):
+        """
+        Initializes the ConversionProgress.
+
+        Args:
+            movies: Object with an items() method returning (title, Movie) pairs, like a MovieStream.
+            label (str): Name of the pass shown with the progress, e.g. "Copying".
+            output: Text handle the progress is printed to.
+        """
+        self.movies = movies
+        self.label = label
+        self.output = output
+        self.count = 0
+        self.checksum = 0
+        self.seconds = 0.0
+
+
+    def items(self):
+        """
+        Yields the movies of the stream and updates count, checksum and seconds along the way.
+
+        Yields:
+            tuple: (title, Movie) of every movie.
+        """
+        start = time.perf_counter()
+        next_report = start + PROGRESS_INTERVAL
+        for title, movie in self.movies.items():
+            self.count += 1
+            self.checksum = (self.checksum + record_checksum(title, movie)) % (1 << CHECKSUM_BITS)
+            yield title, movie
+            if self.count % 1000 == 0 and time.perf_counter() >= next_report:
+                self.seconds = time.perf_counter() - start
+                self._report()
+                next_report += PROGRESS_INTERVAL
+        self.seconds = time.perf_counter() - start
+        self._report()
+        print(file=self.output)
+
+
+    def run(self):
+        """Consumes the stream without passing the movies on, e.g. to checksum a file."""
+        for _ in self.items():
+            pass
+
+
+    def _report(self):
+        """Prints the number of movies so far and the rate, overwriting the previous line."""
+        rate = self.count / self.seconds if self.seconds else 0
+        print(f"\r{self.label}: {self.count:,} movies, {rate:,.0f} movies/s", end="", file=self.output, flush=True)
+
+
+def open_journaled(file_path: str):
+    """
+    Opens a storage in journal mode if its format keeps a log of changes.
+
+    Args:
+        file_path (str): Name of the file in the data folder, e.g. "movies.json".
+
+    Returns:
+        IStorage: The storage object.
+
+    Raises:
+        ValueError: If there is no backend for the file extension.
+    """
+    journal = file_path.split(".")[-1] in JOURNAL_FORMATS
+    return open_storage(file_path, **({"journal": True} if journal else {}))
+
+
+def convert(source_path: str, target_path: str, force: bool = False, verify: bool = True):
+    """
+    Copies all movies from the source storage to the target storage, replacing its content.
+
+    Args:
+        source_path (str): Name of the source file in the data folder, e.g. "movies.json".
+        target_path (str): Name of the target file in the data folder, e.g. "movies.csv".
+        force (bool): If True, an existing target file is overwritten.
+        verify (bool): If True, the target is read back and compared with the source.
+
+    Returns:
+        dict: "movies", "checksum", "seconds", "bytes_read", "bytes_written" and,
+        if verified, "verified" (bool).
+
+    Raises:
+        ValueError: If source and target are the same file or an extension is unknown.
+        FileNotFoundError: If the source file does not exist.
+        FileExistsError: If the target file exists and force is False.
+    """
+    source = open_journaled(source_path)
+    if not os.path.exists(source.file_path):
+        raise FileNotFoundError(f"File {source.file_path} was not found.")
+    target_file = os.path.join("data", target_path)
+    if os.path.abspath(target_file) == os.path.abspath(source.file_path):
+        raise ValueError("Source and target are the same file")
+    if os.path.exists(target_file) and not force:
+        raise FileExistsError(f"File {target_file} already exists, use --force to overwrite it")
+    target = open_journaled(target_path)
+
+    copied = ConversionProgress(source.stream(), "Copying")
+    target.write_stream(copied)
+    result = {"movies": copied.count, "checksum": copied.checksum, "seconds": copied.seconds,
+              "bytes_read": os.path.getsize(source.file_path),
+              "bytes_written": os.path.getsize(target.file_path)}
+    if verify:
+        check = ConversionProgress(target.stream(), "Verifying")
+        check.run()
+        result["verified"] = check.count == copied.count and check.checksum == copied.checksum
+        if not result["verified"]:
+            print(f"Target has {check.count:,} movies with checksum {check.checksum:032x}", file=sys.stderr)
+    return result
+
+
+def main():
+    """Parses the command line, converts the file and prints the summary."""
+    parser = argparse.ArgumentParser(description="Convert a movie catalog between storage formats.")
+    parser.add_argument("source", help="source file in the data folder, e.g. movies.json")
+    parser.add_argument("target", help="target file in the data folder, e.g. movies.csv")
+    parser.add_argument("--force", action="store_true", help="overwrite an existing target file")
+    parser.add_argument("--no-verify", action="store_true", help="skip reading the target back")
+    args = parser.parse_args()
+
+    try:
+        result = convert(args.source, args.target, force=args.force, verify=not args.no_verify)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    seconds = max(result["seconds"], 1e-9)
+    print(f"Copied {result['movies']:,} movies in {result['seconds']:.2f}s "
+          f"({result['movies'] / seconds:,.0f} movies/s, {result['bytes_read'] / seconds / 1e6:.1f} MB/s read, "
+          f"{result['bytes_written'] / seconds / 1e6:.1f} MB/s written)")
+    print(f"Checksum: {result['checksum']:032x}")
+    if "verified" in result:
+        if not result["verified"]:
+            print("Verification failed: the target does not match the source.")
+            sys.exit(1)
+        print("Verified: record counts and checksums match.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import contextlib
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl, locking is skipped there.
+    fcntl = None
+
+
+class FileLock:
+    """
+    Advisory shared/exclusive lock on a sidecar "<file_path>.lock" file, with a version counter.
+
+    Readers hold the shared lock, so any number of them can read at the same time.
+    Writers hold the exclusive lock for the whole read-modify-write and bump the version
+    stored in the lock file. A reader that sees the version it parsed last can skip parsing.
+    The lock is reentrant within one instance. A shared lock can not be upgraded to an
+    exclusive one, writers have to take the exclusive lock before they read.
+    """
+
+    def __init__(self, file_path: str):
+        """
+        Initializes the FileLock for the given data file. The lock file is opened on first use.
+
+        Args:
+            file_path (str): Path to the data file the lock belongs to.
+        """
+        self.path = file_path + ".lock"
+        self.fd = None
+        self.mode = None
+        self.depth = 0
+
+
+    def _open(self):
+        """Opens the lock file, creating it if needed."""
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self.fd
+
+
+    @contextlib.contextmanager
+    def _hold(self, mode: int):
+        """
+        Holds the lock in the given mode for the duration of the with block.
+
+        Args:
+            mode (int): fcntl.LOCK_SH or fcntl.LOCK_EX.
+
+        Raises:
+            RuntimeError: If an exclusive lock is requested while only the shared lock is held.
+        """
+        if self.depth:
+            if mode == fcntl.LOCK_EX and self.mode != fcntl.LOCK_EX:
+                raise RuntimeError("Can not upgrade a shared lock to an exclusive lock")
+            self.depth += 1
+            try:
+                yield
+            finally:
+                self.depth -= 1
+            return
+        fcntl.flock(self._open(), mode)
+        self.mode = mode
+        self.depth = 1
+        try:
+            yield
+        finally:
+            self.depth = 0
+            self.mode = None
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+    def shared(self):
+        """
+        Returns a context manager holding the shared lock, for reading.
+        """
+        if fcntl is None:
+            return contextlib.nullcontext()
+        return self._hold(fcntl.LOCK_SH)
+
+
+    def exclusive(self):
+        """
+        Returns a context manager holding the exclusive lock, for read-modify-write.
+        """
+        if fcntl is None:
+            return contextlib.nullcontext()
+        return self._hold(fcntl.LOCK_EX)
+
+
+    def version(self):
+        """
+        Reads the version counter. Should be called while holding the lock.
+
+        Returns:
+            int: Number of writes so far, 0 for a new lock file.
+        """
+        if fcntl is None:
+            return 0
+        data = os.pread(self._open(), 8, 0)
+        return int.from_bytes(data, "little") if len(data) == 8 else 0
+
+
+    def bump(self):
+        """
+        Increments the version counter after a write. Must be called while holding the exclusive lock.
+
+        Returns:
+            int: The new version.
+        """
+        if fcntl is None:
+            return 0
+        version = self.version() + 1
+        os.pwrite(self._open(), version.to_bytes(8, "little"), 0)
+        return version
+
+
+    def close(self):
+        """Closes the lock file."""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
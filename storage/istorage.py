@@ -1,14 +1,47 @@
 from abc import ABC, abstractmethod
+import contextlib
+import heapq
 import os
+from itertools import islice
+from storage.journal import Journal
+from storage.file_lock import FileLock
+from storage.catalog_cache import CatalogCache
+from storage.title_index import TitleIndex
+from storage.search_index import SearchIndex
+from storage.range_index import RangeIndex, SortedView, filter_movies
+from storage.rating_stats import RatingStats
+from storage.movie import Movie
+from storage.movie_stream import MovieStream
+from storage.metrics import add_file_bytes, instrumented
+from storage.snapshot import CatalogSnapshot
+
+# Numeric movie fields that can be sorted by, mapped to the name of their sorted index.
+SORT_INDEXES = {"year": "years", "rating": "ratings"}
+# Indexes saved with the snapshot. Only the trigram index takes longer to rebuild than to unpickle.
+SNAPSHOT_INDEXES = ("search",)
+
+
 class IStorage(ABC):
     """Abstract parent class defining the interface of movie storage child classes."""
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, journal: bool = False, max_journal_records: int = 1000,
+                 max_journal_bytes: int = 1024 * 1024, persist_title_index: bool = False, locking: bool = True,
+                 snapshot: bool = False):
         """
         Initializes the IStorage instance.
 
         Args:
             file_path (str): The path to the storage file for the movie data.
+            journal (bool): If True, add/delete/update append a delta record to a sidecar log
+                            instead of rewriting the whole file.
+            max_journal_records (int): Number of log records after which the log is compacted.
+            max_journal_bytes (int): Size of the log in bytes after which the log is compacted.
+            persist_title_index (bool): If True, the case-insensitive title index is saved
+                                        next to the data file and reused on the next load.
+            locking (bool): If True, reads share and writes hold an exclusive lock on a sidecar
+                            lock file, so several processes can work on the same file.
+            snapshot (bool): If True, the parsed movies and their indexes are pickled next to the
+                             data file and loaded instead of parsing the file while it is unchanged.
 
         Raises:
             ValueError: If the provided file_path is an empty string.
@@ -22,30 +55,677 @@ class IStorage(ABC):
         os.makedirs(folder_path, exist_ok=True)
 
         self.file_path = os.path.join(folder_path, file_path.strip())
+        self.journal = None
+        if journal:
+            self.journal = Journal(self.file_path, max_journal_records, max_journal_bytes)
+        self.cache = CatalogCache()
+        self.lock = FileLock(self.file_path) if locking else None
+        self.persist_title_index = persist_title_index
+        self.snapshot = CatalogSnapshot(self.file_path) if snapshot else None
+        self._indexes = {}
+        self._batch_depth = 0
+        self._batch_dirty = False
+        self._pinned = 0
+        # True while the data file was written after the snapshot was saved, see save_snapshot().
+        self._snapshot_outdated = False
+        self._write_depth = 0
+        # Counts the changes made in place to the cached data, see _iter_cached().
+        self._data_changes = 0
+        self._index_builders = {"titles": self._build_title_index, "search": self._build_search_index,
+                                "years": self._build_year_index, "ratings": self._build_rating_index}
 
 
     @abstractmethod
-    def read_movies(self):
+    def _read_file(self):
         """Reads movie data from the chosen file extension."""
         pass
 
 
     @abstractmethod
-    def write_movies(self, data: dict):
+    def _write_file(self, data: dict):
         """Writes/Overwrites movie data to the chosen file extension."""
         pass
 
 
+    def _open_stream(self):
+        """
+        Opens the data file for reading movie records one by one.
+
+        Backends that can parse their file incrementally override this. It is called while
+        the shared lock is held, so the file has to be opened right away, not lazily.
+
+        Returns:
+            Iterator of (title, Movie) pairs, or None if the backend can not stream its file.
+        """
+        return None
+
+
+    def _write_stream_file(self, movies):
+        """
+        Writes/Overwrites the data file with movies that are not held in memory.
+
+        Called by write_stream(). The backend writers only use items(), so this defaults to
+        _write_file(), backends whose writer needs the whole dict override it.
+
+        Args:
+            movies: Object with an items() method returning (title, Movie) pairs, like a MovieStream.
+        """
+        self._write_file(movies)
+
+
+    def _load_file(self):
+        """
+        Parses the data file, or loads the parsed data from the snapshot if it is up to date.
+
+        After a parse the snapshot is rebuilt, so the next start can skip parsing. Called while
+        the shared lock is held.
+
+        Returns:
+            tuple: (data (dict), indexes (dict)), the movie data of the base file and the indexes
+                   saved with the snapshot, empty if the file was parsed.
+        """
+        if self.snapshot:
+            loaded = self.snapshot.load()
+            if loaded is not None:
+                return loaded
+        data = self._read_file()
+        add_file_bytes("storage.read_movies", self.file_path)
+        if self.snapshot:
+            self.snapshot.save(data)
+            self._snapshot_outdated = False
+        return data, {}
+
+
+    def _file_signature(self):
+        """
+        Builds the signature of all files the movie data is read from.
+
+        With locking, the version counter of the lock file comes first, it changes with every write.
+
+        Returns:
+            tuple: The signature of the data file and, in journal mode, of the log file.
+        """
+        version = (self.lock.version(),) if self.lock else ()
+        if self.journal:
+            return version + CatalogCache.file_signature(self.file_path, self.journal.path)
+        return version + CatalogCache.file_signature(self.file_path)
+
+
+    def _locked(self, exclusive: bool = False):
+        """
+        Returns a context manager holding the file lock, or doing nothing without locking.
+
+        Args:
+            exclusive (bool): If True, the exclusive lock for writing, otherwise the shared lock.
+        """
+        if exclusive:
+            return self._write_locked()
+        if self.lock is None:
+            return contextlib.nullcontext()
+        return self.lock.shared()
+
+
+    @contextlib.contextmanager
+    def _write_locked(self):
+        """
+        Holds the exclusive lock for a change and makes sure a pinned cache is current.
+
+        The mutators change the cached data and write it back. When the outermost exclusive lock
+        is taken, the pinned cache is checked against the files first, see _refresh_pinned().
+        """
+        with self.lock.exclusive() if self.lock is not None else contextlib.nullcontext():
+            self._write_depth += 1
+            try:
+                if self._write_depth == 1:
+                    self._refresh_pinned()
+                yield
+            finally:
+                self._write_depth -= 1
+
+
+    def _refresh_pinned(self):
+        """
+        Reloads the pinned data if another process changed the files since it was cached.
+
+        Inside pinned() reads skip the check of the files, so a write must not start from the
+        cached data without it, or it would overwrite the changes of the other process. The new
+        data is copied into the cached dictionary, which the owner of pinned() still holds.
+        """
+        data = self.cache.data
+        if not self._pinned or data is None or self.cache.signature == self._file_signature():
+            return
+        self.cache.invalidate()
+        fresh = self.read_movies()
+        data.clear()
+        data.update(fresh)
+        self._data_changes += 1
+        self.cache.store(data, self.cache.signature)
+
+
+    @instrumented("storage.read_movies")
+    def read_movies(self):
+        """
+        Reads movie data from the file, with all journal records applied.
+
+        The parsed data is cached. As long as mtime, size and inode of the files did not change,
+        the cached dictionary is returned without parsing the file again. With snapshot, a new
+        process loads the pickled data instead of parsing the file, see CatalogSnapshot. The returned dictionary
+        is shared with the cache, callers must not change it. With locking, the files are read
+        under the shared lock. Inside pinned() the cached data is returned without checking the files.
+
+        Returns:
+            dict: Dictionary of Movie records, the keys are the movie titles.
+        """
+        if self._pinned and self.cache.data is not None:
+            self.cache.hits += 1
+            return self.cache.data
+        with self._locked():
+            signature = self._file_signature()
+            data = self.cache.get(signature)
+            if data is not None:
+                return data
+            data, indexes = self._load_file()
+            if self.journal:
+                self.journal.replay(data)
+                add_file_bytes("storage.read_movies", self.journal.path)
+                # The indexes of the snapshot do not know the changes of the log.
+                indexes = {}
+        self.cache.store(data, signature)
+        self._indexes = indexes
+        return data
+
+
+    def iter_movies(self):
+        """
+        Iterates over all movies without loading the whole catalog, with all journal records applied.
+
+        If the cache holds the current data, it is iterated in place, without a copy. Otherwise the
+        file is parsed incrementally and only the current movie (and in journal mode the log) is
+        held in memory. Backends that can not stream their file fall back to read_movies().
+
+        The file is opened under the shared lock. Writes replace the file with a new one, so the
+        open file stays consistent while it is read, without holding the lock between movies.
+
+        Yields:
+            tuple: (title, Movie) of every movie, in file order.
+
+        Raises:
+            RuntimeError: If the cached data is changed through this storage while it is iterated,
+                          like a dict changed during iteration. Collect the changes and apply them afterwards.
+        """
+        if self._pinned and self.cache.data is not None:
+            yield from self._iter_cached(self.cache.data)
+            return
+        stream = None
+        with self._locked():
+            data = self.cache.get(self._file_signature())
+            if data is None:
+                stream = self._open_stream()
+                if stream is not None and self.journal:
+                    stream = self.journal.stream(stream, self.journal.pending_changes())
+        if stream is None:
+            yield from self._iter_cached(data if data is not None else self.read_movies())
+            return
+        yield from stream
+
+
+    def _iter_cached(self, data: dict):
+        """
+        Yields the pairs of the cached movie data without copying them.
+
+        The mutators patch the cached dictionary in place. A change between two pairs would make
+        the pass skip or repeat movies, so it ends the iteration with an error instead. If the
+        cache is replaced by newly read data, the old dictionary stays as it is and the pass goes on.
+
+        Args:
+            data (dict): The cached movie data.
+
+        Yields:
+            tuple: (title, Movie) of every movie.
+
+        Raises:
+            RuntimeError: If the data was changed in place during the iteration.
+        """
+        changes = self._data_changes
+        for pair in data.items():
+            if self._data_changes != changes:
+                raise RuntimeError("The movie data was changed while it was iterated")
+            yield pair
+
+
+    @contextlib.contextmanager
+    def pinned(self):
+        """
+        Serves the movie data from memory for a long-running owner of the catalog, like a server.
+
+        Inside the with block read_movies() and iter_movies() return the cached data without
+        checking the files or taking the shared lock. Changes made through this storage keep the
+        cache up to date. Changes of other processes are not seen by reads until the block ends,
+        but every change through this storage first reloads the data if the files changed.
+
+        Yields:
+            dict: The movie data.
+        """
+        movies_data_dict = self.read_movies()
+        self._pinned += 1
+        try:
+            yield movies_data_dict
+        finally:
+            self._pinned -= 1
+
+
+    def stream(self):
+        """
+        Returns a re-iterable view of the catalog that streams it on every pass, see iter_movies().
+
+        Returns:
+            MovieStream: Provides items() and iteration over the titles, like the movie dictionary.
+        """
+        return MovieStream(self)
+
+
+    @instrumented("storage.write_movies")
+    def write_movies(self, data: dict):
+        """
+        Writes/Overwrites movie data to the file.
+
+        In journal mode this folds the log into the base file, so the log is emptied afterwards.
+        With snapshot, hashing and pickling the whole catalog on every write would cost more than
+        the parse it saves the next start. The snapshot is only marked as outdated and saved once
+        by save_snapshot(). In journal mode this write is the compaction of the log, which is rare,
+        so the snapshot is saved along with the file, still under the exclusive lock.
+
+        Args:
+            data (dict): Dictionary of Movie records to save.
+        """
+        if data is not self.cache.data:
+            # Indexes were patched along with the cached data, a different dictionary needs new ones.
+            self._indexes = {}
+        with self._locked(exclusive=True):
+            self._write_file(data)
+            add_file_bytes("storage.write_movies", self.file_path, written=True)
+            if self.journal:
+                self.journal.clear()
+            if self.lock:
+                self.lock.bump()
+            signature = self._file_signature()
+            if self.snapshot and self.journal:
+                self._save_snapshot(data)
+            elif self.snapshot:
+                self._snapshot_outdated = True
+        self.cache.store(data, signature)
+        if self.persist_title_index and "titles" in self._indexes:
+            self._indexes["titles"].save(self.file_path + ".titles.json", self.cache.signature)
+
+
+    def save_snapshot(self):
+        """
+        Saves the snapshot of the cached data, if the data file was written since it was last saved.
+
+        Owners of a storage opened with snapshot call this once they are done with it, e.g. at exit,
+        so the next start loads the snapshot instead of parsing the file. Nothing is saved if another
+        process changed the files since they were cached, its snapshot is rebuilt by the next parse.
+        """
+        if not self._snapshot_outdated or self.cache.data is None:
+            return
+        with self._locked():
+            if self.cache.signature == self._file_signature():
+                self._save_snapshot(self.cache.data)
+        self._snapshot_outdated = False
+
+
+    def _save_snapshot(self, data: dict):
+        """
+        Saves the movie data of the data file and the indexes worth keeping to the snapshot.
+
+        Args:
+            data (dict): The movie data, exactly as stored in the data file.
+        """
+        self.snapshot.save(data, {name: index for name, index in list(self._indexes.items())
+                                  if name in SNAPSHOT_INDEXES})
+
+
+    @instrumented("storage.write_stream")
+    def write_stream(self, movies):
+        """
+        Writes/Overwrites the file with movies that are not held in memory, e.g. read from another storage.
+
+        The movies are passed on to the backend writer pair by pair, nothing is cached.
+        In journal mode the log is emptied, as the new file replaces all earlier changes.
+
+        Args:
+            movies: Object with an items() method returning (title, Movie) pairs, like a MovieStream.
+        """
+        with self._locked(exclusive=True):
+            self._write_stream_file(movies)
+            add_file_bytes("storage.write_stream", self.file_path, written=True)
+            if self.journal:
+                self.journal.clear()
+            if self.lock:
+                self.lock.bump()
+        self._indexes = {}
+        self.cache.invalidate()
+
+
+    def _save_change(self, data: dict, op: str, title: str, fields: dict = None):
+        """
+        Persists a single change of a mutator.
+
+        Without journal the whole data is rewritten. In journal mode only a delta record is
+        appended, and the log is compacted into the base file once it passes its thresholds.
+        Inside batch() nothing is written, the change is saved with the rest of the batch.
+
+        Args:
+            data (dict): All Movie records with the change already applied.
+            op (str): "add", "update" or "delete".
+            title (str): Title of the changed movie.
+            fields (dict): The changed fields of the movie, not needed for "delete".
+        """
+        if self._batch_depth:
+            self._batch_dirty = True
+            return
+        if self.journal is None:
+            self.write_movies(data)
+            return
+        with self._locked(exclusive=True):
+            self.journal.append(op, title, fields)
+            if self.journal.needs_compaction():
+                self.write_movies(data)
+                return
+            if self.lock:
+                self.lock.bump()
+            self.cache.store(data, self._file_signature())
+
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Groups many changes into one write of the file.
+
+        Inside the with block add, delete and update only change the movie data in memory.
+        When the block ends, everything is saved with one write_movies(). If the block raises,
+        all changes of the batch are rolled back and the file is not touched. Nested batches
+        are part of the outermost one. With locking, the exclusive lock is held for the whole batch.
+
+        Example:
+            with storage.batch():
+                for title, rating in new_ratings.items():
+                    storage.update_movie(title, rating)
+
+        Yields:
+            dict: The movie data the batch works on.
+        """
+        if self._batch_depth:
+            self._batch_depth += 1
+            try:
+                yield self.read_movies()
+            finally:
+                self._batch_depth -= 1
+            return
+        with self._locked(exclusive=True):
+            movies_data_dict = self.read_movies()
+            snapshot = dict(movies_data_dict)
+            self._batch_depth = 1
+            self._batch_dirty = False
+            try:
+                yield movies_data_dict
+            except BaseException:
+                self._batch_depth = 0
+                self._rollback(movies_data_dict, snapshot)
+                raise
+            self._batch_depth = 0
+            if self._batch_dirty:
+                self.write_movies(movies_data_dict)
+
+
+    def _rollback(self, data: dict, snapshot: dict):
+        """
+        Restores the movie data as it was at the start of a batch.
+
+        Args:
+            data (dict): The movie data changed by the batch, restored in place for callers still holding it.
+            snapshot (dict): Copy of the movie data taken at the start of the batch.
+        """
+        data.clear()
+        data.update(snapshot)
+        self._data_changes += 1
+        self._indexes = {}
+        self.cache.invalidate()
+
+
+    def _get_index(self, name: str):
+        """
+        Returns an index over the current movie data, building it on first use.
+
+        Indexes are dropped whenever the data is parsed again and patched by the mutators
+        in between, so they always match the cached movie data.
+
+        Args:
+            name (str): Name of the index, a key of self._index_builders.
+
+        Returns:
+            The index object.
+        """
+        movies_data_dict = self.read_movies()
+        index = self._indexes.get(name)
+        if index is None:
+            index = self._index_builders[name](movies_data_dict)
+            self._indexes[name] = index
+        return index
+
+
+    def _update_indexes(self, title: str, old_info: Movie = None, new_info: Movie = None):
+        """
+        Patches all built indexes after a single movie changed, and counts the change for running iterations.
+
+        Args:
+            title (str): Title of the changed movie.
+            old_info (Movie): The movie record before the change, None if the movie was added.
+            new_info (Movie): The movie record after the change, None if the movie was deleted.
+        """
+        self._data_changes += 1
+        for index in self._indexes.values():
+            if old_info is not None:
+                index.remove(title, old_info)
+            if new_info is not None:
+                index.add(title, new_info)
+
+
+    def _build_title_index(self, movies: dict):
+        """
+        Builds the case-insensitive title index, or loads it from disk if it is up to date.
+
+        Args:
+            movies (dict): The current movie data.
+
+        Returns:
+            TitleIndex: The title index for the given movie data.
+        """
+        index = TitleIndex()
+        index_path = self.file_path + ".titles.json"
+        if self.persist_title_index and index.load(index_path, self.cache.signature):
+            return index
+        index.rebuild(movies)
+        if self.persist_title_index:
+            index.save(index_path, self.cache.signature)
+        return index
+
+
+    def _build_search_index(self, movies: dict):
+        """
+        Builds the trigram search index over the titles.
+
+        Args:
+            movies (dict): The current movie data.
+
+        Returns:
+            SearchIndex: The search index for the given movie data.
+        """
+        index = SearchIndex()
+        index.rebuild(movies)
+        return index
+
+
+    def _build_year_index(self, movies: dict):
+        """
+        Builds the sorted index over the release years.
+
+        Args:
+            movies (dict): The current movie data.
+
+        Returns:
+            RangeIndex: The year index for the given movie data.
+        """
+        index = RangeIndex("year")
+        index.rebuild(movies)
+        return index
+
+
+    def _build_rating_index(self, movies: dict):
+        """
+        Builds the sorted index over the numeric ratings, which also keeps the rating statistics.
+
+        Args:
+            movies (dict): The current movie data.
+
+        Returns:
+            RatingStats: The rating index for the given movie data.
+        """
+        index = RatingStats()
+        index.rebuild(movies)
+        return index
+
+
+    def filter_movies(self, min_rating: float = None, max_rating: float = None, start_year: int = None,
+                      end_year: int = None):
+        """
+        Finds the movies within a rating and year range with binary search in the sorted indexes.
+
+        Bounds are inclusive. Movies without a numeric rating or year only match if that field is not filtered.
+
+        Args:
+            min_rating (float): Lowest rating, None for no lower bound.
+            max_rating (float): Highest rating, None for no upper bound.
+            start_year (int): First year, None for no lower bound.
+            end_year (int): Last year, None for no upper bound.
+
+        Returns:
+            FilterResult: Read-only mapping of the matching titles to their Movie records.
+        """
+        year_index = self._get_index("years")
+        rating_index = self._get_index("ratings")
+        return filter_movies(self.read_movies(), year_index, rating_index, min_rating, max_rating,
+                             start_year, end_year)
+
+
+    def rating_stats(self):
+        """
+        Returns the rating statistics of the current movie data.
+
+        They are kept up to date by add, delete and update, so reading them does not scan the catalog.
+
+        Returns:
+            RatingStats: Provides mean(), median(), best() and worst().
+        """
+        return self._get_index("ratings")
+
+
+    def sorted_movies(self, key: str = "rating", descending: bool = True):
+        """
+        Returns all titles sorted by year or rating.
+
+        The order is kept by the sorted index of the field, which is built once and then patched
+        by every change, so repeated calls do not sort the catalog again.
+
+        Args:
+            key (str): "year" or "rating".
+            descending (bool): If True, the highest values come first.
+
+        Returns:
+            SortedView: The titles in sorted order, movies without a value come last when descending.
+
+        Raises:
+            ValueError: If key is not a sortable field.
+        """
+        self._validate_sort_key(key)
+        return SortedView(self._get_index(SORT_INDEXES[key]), descending)
+
+
+    def top_movies(self, key: str = "rating", k: int = 10, descending: bool = True):
+        """
+        Returns the first k titles of the sorted order by year or rating.
+
+        If the sorted index of the field is already built, the titles are read from it.
+        Otherwise they are selected with a heap in O(n log k), without sorting the whole catalog.
+
+        Args:
+            key (str): "year" or "rating".
+            k (int): Number of titles.
+            descending (bool): If True, the highest values come first.
+
+        Returns:
+            list: At most k titles, in the same order as sorted_movies().
+
+        Raises:
+            ValueError: If key is not a sortable field.
+        """
+        self._validate_sort_key(key)
+        movies_data_dict = self.read_movies()
+        index = self._indexes.get(SORT_INDEXES[key])
+        if index is not None:
+            return list(islice(SortedView(index, descending), k))
+
+        def rank(title):
+            value = getattr(movies_data_dict[title], key)
+            if descending:
+                return value is None, 0 if value is None else -value, title
+            return value is not None, 0 if value is None else value, title
+
+        return heapq.nsmallest(k, movies_data_dict, key=rank)
+
+
+    def search(self, query: str, limit: int = None, fuzzy: bool = True):
+        """
+        Searches movies by part of the title, case-insensitive and typo-tolerant, see SearchIndex.search().
+
+        Args:
+            query (str): The part of the title to search for.
+            limit (int): Maximum number of results, None for all substring matches.
+            fuzzy (bool): If False, only titles containing the query are returned.
+
+        Returns:
+            list: The matching titles as stored, best match first.
+        """
+        return self._get_index("search").search(query, limit, fuzzy)
+
+
+    def find_title(self, title: str):
+        """
+        Finds a movie by title, case-insensitive, with one lookup in the title index.
+
+        Args:
+            title (str): Title of the movie in any casing.
+
+        Returns:
+            str or None: The title as stored, or None if there is no such movie.
+        """
+        return self._get_index("titles").lookup(title)
+
+
     def list_movies(self):
         """
         Prints all movies stored in the file-type along with their year and rating.
+
+        The movies are streamed from the file, so the total is printed after them.
         """
-        movies_data_dict = self.read_movies()
-        print(f"{len(movies_data_dict)} movies in total:")
-        for name, value in movies_data_dict.items():
-            print(f"{name} ({value['year']}): {value['rating']}")
+        total = 0
+        for name, movie in self.iter_movies():
+            print(f"{name} ({movie.raw_year}): {movie.raw_rating}")
+            total += 1
+        print(f"{total} movies in total")
 
 
+    @instrumented("storage.add_movie")
     def add_movie(self, title: str, year: str, rating: str, poster_url: str):
         """
         Adds a new movie to the file-type file of the instance.
@@ -59,15 +739,37 @@ class IStorage(ABC):
         Raises:
             ValueError: If any of the inputs fail validation. This is checked with the validate functions.
         """
-        movies_data_dict = self.read_movies()
-        movies_data_dict[title] = {}
-        movies_data_dict[title]['year'] = year
-        movies_data_dict[title]['rating'] = rating
-        movies_data_dict[title]['poster_url'] = poster_url
-        print(f"Movie {title} successfully added")
-        self.write_movies(movies_data_dict)
+        with self._locked(exclusive=True):
+            movies_data_dict = self.read_movies()
+            old_info = movies_data_dict.get(title)
+            movies_data_dict[title] = Movie(title, year, rating, poster_url)
+            self._update_indexes(title, old_info, movies_data_dict[title])
+            print(f"Movie {title} successfully added")
+            self._save_change(movies_data_dict, "add", title, movies_data_dict[title].to_dict())
+
 
+    @instrumented("storage.add_movies")
+    def add_movies(self, movies: list):
+        """
+        Adds many movies with a single write of the file.
 
+        Args:
+            movies (list): Tuples of (title, year, rating, poster_url), like the arguments of add_movie().
+        """
+        with self._locked(exclusive=True):
+            movies_data_dict = self.read_movies()
+            for title, year, rating, poster_url in movies:
+                old_info = movies_data_dict.get(title)
+                movies_data_dict[title] = Movie(title, year, rating, poster_url)
+                self._update_indexes(title, old_info, movies_data_dict[title])
+            print(f"{len(movies)} movies successfully added")
+            if self._batch_depth:
+                self._batch_dirty = True
+            else:
+                self.write_movies(movies_data_dict)
+
+
+    @instrumented("storage.delete_movie")
     def delete_movie(self, title: str):
         """
         Deletes a new movie to the file-type of the instance.
@@ -81,17 +783,19 @@ class IStorage(ABC):
         Raises:
             ValueError: If the title input fails validation.
         """
-        movies_data_dict = self.read_movies()
-        self._validate_title(title)
-        movie = next((movie for movie in movies_data_dict if movie.lower() == title.lower()), None)
-        if movie:
-            del movies_data_dict[movie]
-            print(f"Movie {movie} successfully deleted")
-        else:
-            print(f"Movie {title} doesn't exist!")
-        self.write_movies(movies_data_dict)
-
-
+        with self._locked(exclusive=True):
+            movies_data_dict = self.read_movies()
+            self._validate_title(title)
+            movie = self.find_title(title)
+            if movie:
+                self._update_indexes(movie, movies_data_dict.pop(movie))
+                print(f"Movie {movie} successfully deleted")
+                self._save_change(movies_data_dict, "delete", movie)
+            else:
+                print(f"Movie {title} doesn't exist!")
+
+
+    @instrumented("storage.update_movie")
     def update_movie(self, title: str, rating: float):
         """
         Update a new movie to the json file of the instance.
@@ -106,17 +810,20 @@ class IStorage(ABC):
         Raises:
             ValueError: If the title or rating input fails validation.
         """
-        movies_data_dict = self.read_movies()
-        self._validate_title(title)
-        self._validate_rating(rating)
-        new_movie_rating_formated = str(rating) + "/10"
-        movie = next((movie for movie in movies_data_dict if movie.lower() == title.lower()), None)
-        if movie:
-            movies_data_dict[movie]["rating"] = new_movie_rating_formated
-            print(f"Movie {movie} successfully updated")
-        else:
-            print(f"Movie {movie} doesn't exist!")
-        self.write_movies(movies_data_dict)
+        with self._locked(exclusive=True):
+            movies_data_dict = self.read_movies()
+            self._validate_title(title)
+            self._validate_rating(rating)
+            new_movie_rating_formated = str(rating) + "/10"
+            movie = self.find_title(title)
+            if movie:
+                old_info = movies_data_dict[movie]
+                movies_data_dict[movie] = old_info.updated({"rating": new_movie_rating_formated})
+                self._update_indexes(movie, old_info, movies_data_dict[movie])
+                print(f"Movie {movie} successfully updated")
+                self._save_change(movies_data_dict, "update", movie, {"rating": new_movie_rating_formated})
+            else:
+                print(f"Movie {title} doesn't exist!")
 
 
     def _validate_title(self, title: str):
@@ -133,6 +840,20 @@ class IStorage(ABC):
             raise ValueError(f"Title must be an string, got {type(title)}")
 
 
+    def _validate_sort_key(self, key: str):
+        """
+        Validates the field to sort by.
+
+        Args:
+            key (str): Name of the field.
+
+        Raises:
+            ValueError: If the field is not "year" or "rating".
+        """
+        if key not in SORT_INDEXES:
+            raise ValueError(f"Movies can only be sorted by {' or '.join(SORT_INDEXES)}, got {key!r}")
+
+
     def _validate_rating(self, rating: float):
         """
         Validates the rating input.
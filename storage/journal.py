@@ -0,0 +1,183 @@
+import json
+import os
+from storage.movie import Movie
+from storage.metrics import add_bytes, instrumented
+
+
+class Journal:
+    """Append-only change log kept next to a movie data file."""
+
+    def __init__(self, file_path: str, max_records: int = 1000, max_bytes: int = 1024 * 1024):
+        """
+        Initializes the Journal for the given data file.
+
+        The log lives in a sidecar file "<file_path>.log". Every line is one JSON delta record.
+
+        Args:
+            file_path (str): Path to the data file the journal belongs to.
+            max_records (int): Number of records after which the journal should be compacted.
+            max_bytes (int): Size of the log file in bytes after which the journal should be compacted.
+        """
+        self.path = file_path + ".log"
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.records = self._count_records()
+
+
+    def _count_records(self):
+        """
+        Counts the records currently stored in the log file.
+
+        Returns:
+            int: Number of records, 0 if there is no log file.
+        """
+        try:
+            with open(self.path, "rb") as handle:
+                return sum(1 for _ in handle)
+        except FileNotFoundError:
+            return 0
+
+
+    @instrumented("storage.journal_append")
+    def append(self, op: str, title: str, fields: dict = None):
+        """
+        Appends one delta record to the log file.
+
+        Args:
+            op (str): "add", "update" or "delete".
+            title (str): Title of the changed movie.
+            fields (dict): The changed fields of the movie, not needed for "delete".
+        """
+        record = {"op": op, "title": title}
+        if fields is not None:
+            record["fields"] = fields
+        line = json.dumps(record) + "\n"
+        with open(self.path, "a") as handle:
+            handle.write(line)
+        self.records += 1
+        add_bytes("storage.journal_append", written=len(line.encode("utf-8")))
+
+
+    def replay(self, data: dict):
+        """
+        Applies all records of the log file on top of the given movie data.
+
+        A damaged last line, e.g. from a crash in the middle of an append, is ignored.
+
+        Args:
+            data (dict): Movie records read from the base file, changed in place.
+
+        Returns:
+            dict: The given movie data with all changes applied.
+        """
+        for record in self._read_records():
+            self._apply(data, record)
+        return data
+
+
+    def _read_records(self):
+        """
+        Reads all records of the log file, skipping damaged lines.
+
+        Returns:
+            list: The records in log order, empty if there is no log file.
+        """
+        records = []
+        try:
+            with open(self.path, "r") as handle:
+                for line in handle:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return records
+
+
+    def pending_changes(self):
+        """
+        Reads the log file and groups its records by title, for stream().
+
+        Returns:
+            dict: Title mapped to the list of its records in log order.
+        """
+        changes = {}
+        for record in self._read_records():
+            changes.setdefault(record["title"], []).append(record)
+        return changes
+
+
+    def stream(self, movies, changes: dict):
+        """
+        Applies the log records on top of a stream of movies read from the base file.
+
+        Only the log is held in memory, the base file is never loaded as a whole.
+
+        Args:
+            movies: Iterable of (title, Movie) pairs from the base file.
+            changes (dict): The records grouped by title, see pending_changes().
+
+        Yields:
+            tuple: (title, Movie) of every movie, with the changes applied. Movies only added
+                   by the log come after the movies of the base file.
+        """
+        changes = dict(changes)
+        for title, movie in movies:
+            records = changes.pop(title, None)
+            if records is None:
+                yield title, movie
+                continue
+            data = {title: movie}
+            for record in records:
+                self._apply(data, record)
+            if title in data:
+                yield title, data[title]
+        for title, records in changes.items():
+            data = {}
+            for record in records:
+                self._apply(data, record)
+            if title in data:
+                yield title, data[title]
+
+
+    def _apply(self, data: dict, record: dict):
+        """
+        Applies one delta record to the movie data.
+
+        Args:
+            data (dict): Movie records, changed in place.
+            record (dict): A record as written by append().
+        """
+        title = record["title"]
+        if record["op"] == "add":
+            data[title] = Movie.from_dict(title, record["fields"])
+        elif record["op"] == "update":
+            if title in data:
+                data[title] = data[title].updated(record["fields"])
+        elif record["op"] == "delete":
+            data.pop(title, None)
+
+
+    def needs_compaction(self):
+        """
+        Checks if the log grew past one of its thresholds.
+
+        Returns:
+            bool: True if the log should be folded back into the base file.
+        """
+        if self.records >= self.max_records:
+            return True
+        try:
+            return os.path.getsize(self.path) >= self.max_bytes
+        except FileNotFoundError:
+            return False
+
+
+    def clear(self):
+        """Removes the log file after its records were written into the base file."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.records = 0
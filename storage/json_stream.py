@@ -0,0 +1,86 @@
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def iter_json_object(handle, chunk_size: int = CHUNK_SIZE):
+    """
+    Parses the members of a top-level JSON object one by one, reading the file in chunks.
+
+    Only the current chunk and the member being parsed are held in memory, so files
+    much larger than the available memory can be scanned.
+
+    Args:
+        handle: Text handle of a file holding one JSON object.
+        chunk_size (int): Number of characters read at once.
+
+    Yields:
+        tuple: (key, value) of every member, in file order.
+
+    Raises:
+        json.JSONDecodeError: If the file is not a valid JSON object.
+    """
+    buffer = ""
+    position = 0
+    at_end = False
+
+    def fill():
+        """Reads the next chunk, drops the parsed part of the buffer. Returns False at end of file."""
+        nonlocal buffer, position, at_end
+        chunk = handle.read(chunk_size)
+        if not chunk:
+            at_end = True
+            return False
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    def skip_whitespace():
+        """Moves position to the next non-whitespace character, reading chunks as needed."""
+        nonlocal position
+        while True:
+            position = _WHITESPACE.match(buffer, position).end()
+            if position < len(buffer) or not fill():
+                return
+
+    def expect(characters: str):
+        """Consumes one of the given characters and returns it."""
+        nonlocal position
+        skip_whitespace()
+        if position >= len(buffer) or buffer[position] not in characters:
+            raise json.JSONDecodeError(f"Expecting one of {characters!r}", buffer, position)
+        position += 1
+        return buffer[position - 1]
+
+    def decode():
+        """Decodes the next JSON value, reading chunks until it is complete."""
+        nonlocal position
+        skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buffer, position)
+                # A number at the end of the buffer may continue in the next chunk.
+                if end < len(buffer) or at_end:
+                    position = end
+                    return value
+            except json.JSONDecodeError:
+                if at_end:
+                    raise
+            fill()
+
+    expect("{")
+    skip_whitespace()
+    if position < len(buffer) and buffer[position] == "}":
+        return
+    while True:
+        key = decode()
+        if not isinstance(key, str):
+            raise json.JSONDecodeError("Expecting property name", buffer, position)
+        expect(":")
+        yield key, decode()
+        if expect(",}") == "}":
+            return
@@ -0,0 +1,268 @@
+"""
+Opt-in timing of the hot paths: storage reads and writes, OMDB requests, website generation
+and the commands of the menu and the command line.
+
+Switched on with environment variables, read once at import:
+
+    MOVIE_METRICS=metrics.json python main.py
+    MOVIE_METRICS=metrics.json MOVIE_PROFILE=generate_website python main.py
+
+With MOVIE_METRICS, every instrumented operation counts its calls, errors, a latency histogram
+and the bytes read or written, and the report is written as JSON to the given file at exit.
+With MOVIE_PROFILE, the command of that name (a MovieApp method like "generate_website" or a
+command line command like "generate") runs under cProfile, the statistics are dumped to
+profile_<command>.prof and the slowest functions are added to the report.
+
+Without MOVIE_METRICS, instrumented() returns the function unchanged and the other functions
+return at once, so the instrumentation costs nothing when it is off.
+"""
+import atexit
+import bisect
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+
+REPORT_PATH = os.environ.get("MOVIE_METRICS") or None
+PROFILE_COMMAND = os.environ.get("MOVIE_PROFILE") or None
+ENABLED = REPORT_PATH is not None
+# Upper bounds of the latency histogram buckets in milliseconds, the last bucket is unbounded.
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PROFILE_TOP_FUNCTIONS = 20
+
+_metrics = {}
+_profiles = {}
+_lock = threading.Lock()
+
+
+def _entry(name: str):
+    """
+    Returns the metrics of an operation, created on first use. The caller holds the lock.
+
+    Args:
+        name (str): Name of the operation, e.g. "storage.read_movies".
+
+    Returns:
+        dict: Calls, errors, latencies, histogram and bytes of the operation.
+    """
+    entry = _metrics.get(name)
+    if entry is None:
+        entry = {"calls": 0, "errors": 0, "total_ms": 0.0, "min_ms": None, "max_ms": 0.0,
+                 "histogram": [0] * (len(HISTOGRAM_BOUNDS_MS) + 1), "bytes_read": 0, "bytes_written": 0}
+        _metrics[name] = entry
+    return entry
+
+
+def record_call(name: str, seconds: float, failed: bool = False):
+    """
+    Records one call of an operation.
+
+    Args:
+        name (str): Name of the operation.
+        seconds (float): Duration of the call.
+        failed (bool): True if the call raised an exception.
+    """
+    if not ENABLED:
+        return
+    milliseconds = seconds * 1000
+    with _lock:
+        entry = _entry(name)
+        entry["calls"] += 1
+        entry["errors"] += failed
+        entry["total_ms"] += milliseconds
+        entry["min_ms"] = milliseconds if entry["min_ms"] is None else min(entry["min_ms"], milliseconds)
+        entry["max_ms"] = max(entry["max_ms"], milliseconds)
+        entry["histogram"][bisect.bisect_left(HISTOGRAM_BOUNDS_MS, milliseconds)] += 1
+
+
+def add_bytes(name: str, read: int = 0, written: int = 0):
+    """
+    Adds bytes read or written to the metrics of an operation.
+
+    Args:
+        name (str): Name of the operation.
+        read (int): Bytes read.
+        written (int): Bytes written.
+    """
+    if not ENABLED:
+        return
+    with _lock:
+        entry = _entry(name)
+        entry["bytes_read"] += read
+        entry["bytes_written"] += written
+
+
+def add_file_bytes(name: str, path: str, written: bool = False):
+    """
+    Adds the size of a file that was just read or written to the metrics of an operation.
+
+    Args:
+        name (str): Name of the operation.
+        path (str): The file, a missing file counts 0 bytes.
+        written (bool): If True, the bytes count as written, otherwise as read.
+    """
+    if not ENABLED:
+        return
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    if written:
+        add_bytes(name, written=size)
+    else:
+        add_bytes(name, read=size)
+
+
+@contextlib.contextmanager
+def _timer(name: str):
+    """
+    Times the with block as one call of an operation, see timed().
+
+    Args:
+        name (str): Name of the operation.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        record_call(name, time.perf_counter() - start, failed=True)
+        raise
+    record_call(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """
+    Returns a context manager timing its with block as one call of an operation.
+
+    Args:
+        name (str): Name of the operation.
+
+    Returns:
+        A context manager, one doing nothing if the metrics are off.
+    """
+    return _timer(name) if ENABLED else contextlib.nullcontext()
+
+
+def instrumented(name: str):
+    """
+    Decorator timing every call of the function as the operation name.
+
+    Args:
+        name (str): Name of the operation, e.g. "storage.write_movies".
+
+    Returns:
+        The decorator. If the metrics are off, it returns the function itself.
+    """
+    def decorator(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def _profile(command: str):
+    """
+    Runs the with block under cProfile and keeps the statistics, see profiled().
+
+    Args:
+        command (str): Name of the command.
+    """
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        path = f"profile_{command}.prof"
+        profile.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        with _lock:
+            _profiles[command] = {"file": path, "top_functions": summary.getvalue().strip().splitlines()}
+
+
+def profiled(command: str):
+    """
+    Returns a context manager running the with block under cProfile if the command was selected with MOVIE_PROFILE.
+
+    Args:
+        command (str): Name of the command.
+
+    Returns:
+        A context manager, one doing nothing for all other commands.
+    """
+    return _profile(command) if command == PROFILE_COMMAND else contextlib.nullcontext()
+
+
+def command(name: str):
+    """
+    Returns a context manager timing a command and profiling it if it was selected.
+
+    Args:
+        name (str): Name of the command, the operation is named "command.<name>".
+
+    Returns:
+        A context manager, one doing nothing if neither metrics nor profiling are on.
+    """
+    if not ENABLED and name != PROFILE_COMMAND:
+        return contextlib.nullcontext()
+    stack = contextlib.ExitStack()
+    stack.enter_context(timed(f"command.{name}"))
+    stack.enter_context(profiled(name))
+    return stack
+
+
+def report():
+    """
+    Builds the metrics report of all operations recorded so far.
+
+    Returns:
+        dict: "operations", the name of every operation mapped to calls, errors, total/mean/min/max
+              latency, the latency histogram (bucket upper bound in ms mapped to calls, empty
+              buckets left out) and bytes read and written, and "profiles" of profiled commands.
+    """
+    bounds = [str(bound) for bound in HISTOGRAM_BOUNDS_MS] + ["inf"]
+    operations = {}
+    with _lock:
+        for name, entry in sorted(_metrics.items()):
+            operations[name] = {
+                "calls": entry["calls"], "errors": entry["errors"], "total_ms": round(entry["total_ms"], 3),
+                "mean_ms": round(entry["total_ms"] / entry["calls"], 3) if entry["calls"] else None,
+                "min_ms": round(entry["min_ms"], 3) if entry["min_ms"] is not None else None,
+                "max_ms": round(entry["max_ms"], 3),
+                "histogram_ms": {bound: count for bound, count in zip(bounds, entry["histogram"]) if count},
+                "bytes_read": entry["bytes_read"], "bytes_written": entry["bytes_written"]}
+        profiles = dict(_profiles)
+    return {"operations": operations, "profiles": profiles}
+
+
+def write_report(path: str = None):
+    """
+    Writes the metrics report as JSON.
+
+    Args:
+        path (str): The report file, defaults to the file given in MOVIE_METRICS.
+
+    Handles:
+        IOError: If the report can not be written, a message is printed.
+    """
+    try:
+        with open(path or REPORT_PATH, "w") as handle:
+            json.dump(report(), handle, indent=4)
+    except IOError:
+        print("There was an issue saving the metrics report.")
+
+
+if ENABLED:
+    atexit.register(write_report)
@@ -0,0 +1,157 @@
+import re
+
+YEAR_PATTERN = re.compile(r"\d{4}")
+
+
+def parse_rating(raw_rating):
+    """
+    Parses a rating as stored in the files into a number on a 0-10 scale.
+
+    Args:
+        raw_rating: A number or a string like "7.9/10", "74/100" or "85%".
+
+    Returns:
+        float or None: The rating, or None if there is no rating (e.g. "No rating available").
+    """
+    if isinstance(raw_rating, (int, float)):
+        return float(raw_rating)
+    if not isinstance(raw_rating, str):
+        return None
+    text = raw_rating.strip()
+    try:
+        if text.endswith("%"):
+            return float(text[:-1]) / 10
+        if "/" in text:
+            value, scale = text.split("/", 1)
+            return float(value) * 10 / float(scale)
+        return float(text)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def parse_year(raw_year):
+    """
+    Parses a year as stored in the files into the (first) release year.
+
+    Args:
+        raw_year: A number or a string like "2010" or "2005–2008".
+
+    Returns:
+        int or None: The release year, or None if the value holds no year.
+    """
+    if isinstance(raw_year, int):
+        return raw_year
+    if not isinstance(raw_year, str):
+        return None
+    match = YEAR_PATTERN.search(raw_year)
+    return int(match.group()) if match else None
+
+
+def restore_movie(title: str, year, rating, raw_year, raw_rating, poster_url: str):
+    """
+    Recreates a pickled Movie from its fields without parsing year and rating again.
+
+    Args:
+        title (str): Title of the movie.
+        year (int or None): The parsed release year.
+        rating (float or None): The parsed rating.
+        raw_year: Release year as stored.
+        raw_rating: Rating as stored.
+        poster_url (str): URL to the movie's poster image.
+
+    Returns:
+        Movie: The movie record.
+    """
+    movie = Movie.__new__(Movie)
+    movie.title = title
+    movie.year = year
+    movie.rating = rating
+    movie.raw_year = raw_year
+    movie.raw_rating = raw_rating
+    movie.poster_url = poster_url
+    return movie
+
+
+class Movie:
+    """
+    Compact record of one movie, parsed once when the data is loaded.
+
+    year and rating are numbers for sorting, filtering and statistics. raw_year and raw_rating
+    keep the values exactly as stored, so writing the data back does not change the files.
+    """
+
+    __slots__ = ("title", "year", "rating", "raw_year", "raw_rating", "poster_url")
+
+    def __init__(self, title: str, raw_year, raw_rating, poster_url: str):
+        """
+        Initializes the Movie and parses year and rating.
+
+        Args:
+            title (str): Title of the movie.
+            raw_year: Release year as stored, e.g. "2010" or "2005–2008".
+            raw_rating: Rating as stored, e.g. "7.9/10".
+            poster_url (str): URL to the movie's poster image.
+        """
+        self.title = title
+        self.raw_year = raw_year
+        self.raw_rating = raw_rating
+        self.poster_url = poster_url
+        self.year = parse_year(raw_year)
+        self.rating = parse_rating(raw_rating)
+
+
+    @classmethod
+    def from_dict(cls, title: str, info: dict):
+        """
+        Creates a Movie from the dictionary format used in the data files.
+
+        Args:
+            title (str): Title of the movie.
+            info (dict): Dictionary with "year", "rating" and "poster_url" keys.
+
+        Returns:
+            Movie: The parsed movie record.
+        """
+        return cls(title, info.get("year"), info.get("rating"), info.get("poster_url"))
+
+
+    def to_dict(self):
+        """
+        Returns the movie in the dictionary format used in the data files.
+
+        Returns:
+            dict: Dictionary with "year", "rating" and "poster_url" keys, values as stored.
+        """
+        return {"year": self.raw_year, "rating": self.raw_rating, "poster_url": self.poster_url}
+
+
+    def updated(self, fields: dict):
+        """
+        Returns a copy of the movie with some stored fields replaced.
+
+        Args:
+            fields (dict): Fields in the data file format, e.g. {"rating": "8.0/10"}.
+
+        Returns:
+            Movie: The new movie record.
+        """
+        info = self.to_dict()
+        info.update(fields)
+        return Movie.from_dict(self.title, info)
+
+
+    def __reduce__(self):
+        """
+        Pickles the movie as a flat tuple of its fields, see restore_movie().
+
+        This is smaller and faster to load than the default pickling of slots.
+
+        Returns:
+            tuple: The function recreating the movie and its arguments.
+        """
+        return restore_movie, (self.title, self.year, self.rating, self.raw_year, self.raw_rating, self.poster_url)
+
+
+    def __repr__(self):
+        """Returns a readable representation of the movie."""
+        return f"Movie({self.title!r}, year={self.raw_year!r}, rating={self.raw_rating!r})"
@@ -0,0 +1,31 @@
+class MovieStream:
+    """
+    Re-iterable, read-only view of a catalog that is read from the storage on every pass.
+
+    It offers the items() and iteration of a movie dictionary, so it can be passed where
+    only these are used, without keeping the whole catalog in memory.
+    """
+
+    def __init__(self, storage):
+        """
+        Initializes the MovieStream.
+
+        Args:
+            storage (IStorage): The storage the movies are streamed from, see IStorage.iter_movies().
+        """
+        self.storage = storage
+
+
+    def items(self):
+        """
+        Returns a new pass over the catalog.
+
+        Returns:
+            Iterator of (title, Movie) pairs in file order.
+        """
+        return self.storage.iter_movies()
+
+
+    def __iter__(self):
+        """Iterates over the titles in file order."""
+        return (title for title, _ in self.items())
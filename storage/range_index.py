@@ -0,0 +1,243 @@
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Mapping
+from operator import itemgetter
+
+_value = itemgetter(0)
+_title = itemgetter(1)
+
+
+def in_range(value, low=None, high=None):
+    """
+    Checks a year or rating against inclusive bounds.
+
+    Args:
+        value (int or float or None): The value, None if the movie has none.
+        low (int or float): Lowest value, None for no lower bound.
+        high (int or float): Highest value, None for no upper bound.
+
+    Returns:
+        bool: True if there is a value and it lies within the bounds.
+    """
+    return value is not None and (low is None or low <= value) and (high is None or value <= high)
+
+
+class RangeIndex:
+    """
+    Sorted (value, title) pairs of one numeric movie field, answering range queries by binary search.
+
+    Titles without a value for the field are kept apart in insertion order, so the index
+    also provides the complete sorted order of the catalog, see SortedView.
+
+    The pairs are a plain sorted list. Queries cost O(log n), but add and remove cost O(n),
+    as the list shifts everything behind the position. The shift is a single memmove of
+    pointers, about 0.2 ms per change at a million movies, far less than writing the file.
+    """
+
+    def __init__(self, field: str):
+        """
+        Initializes an empty RangeIndex.
+
+        Args:
+            field (str): Name of the numeric Movie attribute, "year" or "rating".
+        """
+        self.field = field
+        self.entries = []
+        self.missing = {}
+
+
+    def rebuild(self, movies: dict):
+        """
+        Builds the index from scratch. Movies without a value for the field go to missing.
+
+        Args:
+            movies (dict): The movie data, keys are the stored titles.
+        """
+        field = self.field
+        entries = [(getattr(movie, field), title) for title, movie in movies.items()]
+        self.missing = {title: None for value, title in entries if value is None}
+        entries = [entry for entry in entries if entry[0] is not None]
+        # Two stable sorts by single keys are much faster than comparing tuples with many equal values.
+        entries.sort(key=_title)
+        entries.sort(key=_value)
+        self.entries = entries
+
+
+    def add(self, title: str, info):
+        """
+        Inserts a movie at its sorted position, O(n) for the list insert.
+
+        Args:
+            title (str): Title as stored.
+            info (Movie): The movie record.
+        """
+        value = getattr(info, self.field)
+        if value is None:
+            self.missing[title] = None
+        else:
+            insort(self.entries, (value, title))
+
+
+    def remove(self, title: str, info):
+        """
+        Removes a movie, found by binary search, O(n) for the list delete.
+
+        Args:
+            title (str): Title as stored.
+            info (Movie): The movie record as it was added.
+        """
+        value = getattr(info, self.field)
+        if value is None:
+            self.missing.pop(title, None)
+            return
+        position = bisect_left(self.entries, (value, title))
+        if position < len(self.entries) and self.entries[position] == (value, title):
+            del self.entries[position]
+
+
+    def range(self, low=None, high=None):
+        """
+        Returns the titles with a value between low and high, both included.
+
+        Args:
+            low (int or float): Lowest value, None for no lower bound.
+            high (int or float): Highest value, None for no upper bound.
+
+        Returns:
+            list: The titles, sorted by value.
+        """
+        start = 0 if low is None else bisect_left(self.entries, low, key=_value)
+        end = len(self.entries) if high is None else bisect_right(self.entries, high, key=_value)
+        return [title for _, title in self.entries[start:end]]
+
+
+    def count(self, low=None, high=None):
+        """
+        Counts the titles with a value between low and high without building the list.
+
+        Args:
+            low (int or float): Lowest value, None for no lower bound.
+            high (int or float): Highest value, None for no upper bound.
+
+        Returns:
+            int: Number of matching titles.
+        """
+        start = 0 if low is None else bisect_left(self.entries, low, key=_value)
+        end = len(self.entries) if high is None else bisect_right(self.entries, high, key=_value)
+        return max(0, end - start)
+
+
+class SortedView:
+    """
+    The titles of the catalog in the order of a RangeIndex, read lazily from the index.
+
+    Titles without a value sort below all numbers. Ties, and the titles without a value,
+    are in title order in both directions.
+    The view reads the live index, it is meant to be consumed before the storage changes again.
+    """
+
+    def __init__(self, index: RangeIndex, descending: bool = False):
+        """
+        Initializes the view.
+
+        Args:
+            index (RangeIndex): The index providing the order.
+            descending (bool): If True, the highest values come first.
+        """
+        self._index = index
+        self.descending = descending
+
+
+    def __len__(self):
+        """Returns the number of titles in the view."""
+        return len(self._index.entries) + len(self._index.missing)
+
+
+    def __iter__(self):
+        """Iterates over the titles in sorted order."""
+        entries = self._index.entries
+        if not self.descending:
+            yield from sorted(self._index.missing)
+            for _, title in entries:
+                yield title
+            return
+        end = len(entries)
+        while end:
+            # Walk the groups of equal values backwards, each group in title order.
+            start = bisect_left(entries, (entries[end - 1][0],), 0, end)
+            for position in range(start, end):
+                yield entries[position][1]
+            end = start
+        yield from sorted(self._index.missing)
+
+
+class FilterResult(Mapping):
+    """Read-only view of the movies matching a filter. The movie records are looked up on access."""
+
+    def __init__(self, movies: dict, titles):
+        """
+        Initializes the view.
+
+        Args:
+            movies (dict): All Movie records, keys are the stored titles.
+            titles: The matching titles, in result order.
+        """
+        self._movies = movies
+        self._titles = titles
+        self._title_set = None
+
+
+    def __getitem__(self, title: str):
+        """Returns the Movie record of a matching title, raises KeyError for all others."""
+        if self._title_set is None:
+            self._title_set = set(self._titles)
+        if title not in self._title_set:
+            raise KeyError(title)
+        return self._movies[title]
+
+
+    def __iter__(self):
+        """Iterates over the matching titles in result order."""
+        return iter(self._titles)
+
+
+    def __len__(self):
+        """Returns the number of matching movies."""
+        return len(self._titles)
+
+
+def filter_movies(movies: dict, year_index: RangeIndex, rating_index: RangeIndex, min_rating=None,
+                  max_rating=None, start_year=None, end_year=None):
+    """
+    Finds the movies within a rating and year range.
+
+    Each constrained field is answered by binary search in its index. Only the smaller of the
+    two candidate ranges is built, its movies are then checked against the other range.
+    This costs O(log n + k) instead of a pass over the whole catalog.
+
+    Args:
+        movies (dict): All Movie records, keys are the stored titles.
+        year_index (RangeIndex): Index over the year field.
+        rating_index (RangeIndex): Index over the rating field.
+        min_rating (float): Lowest rating, None for no lower bound.
+        max_rating (float): Highest rating, None for no upper bound.
+        start_year (int): First year, None for no lower bound.
+        end_year (int): Last year, None for no upper bound.
+
+    Returns:
+        FilterResult: Read-only view of the matching movies, ordered by the field of the index used.
+    """
+    rating_filtered = min_rating is not None or max_rating is not None
+    year_filtered = start_year is not None or end_year is not None
+    if not rating_filtered and not year_filtered:
+        return FilterResult(movies, movies.keys())
+    if not year_filtered:
+        return FilterResult(movies, rating_index.range(min_rating, max_rating))
+    if not rating_filtered:
+        return FilterResult(movies, year_index.range(start_year, end_year))
+    if rating_index.count(min_rating, max_rating) <= year_index.count(start_year, end_year):
+        titles = [title for title in rating_index.range(min_rating, max_rating)
+                  if in_range(movies[title].year, start_year, end_year)]
+    else:
+        titles = [title for title in year_index.range(start_year, end_year)
+                  if in_range(movies[title].rating, min_rating, max_rating)]
+    return FilterResult(movies, titles)
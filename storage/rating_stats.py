@@ -0,0 +1,113 @@
+import math
+from bisect import bisect_left, bisect_right
+from storage.range_index import RangeIndex
+
+
+class RatingStats(RangeIndex):
+    """
+    Rating index that also keeps the running sum of all ratings.
+
+    The sorted (rating, title) pairs serve as order statistics: the median is read by position,
+    the best and worst movies with all their ties by binary search at both ends.
+    Every add, delete and update patches the pairs and the sum, so no statistic needs a pass over the catalog.
+    Patching costs O(n) for the list insert or delete, see RangeIndex.
+    """
+
+    def __init__(self):
+        """Initializes empty RatingStats."""
+        super().__init__("rating")
+        self.total = 0.0
+
+
+    def rebuild(self, movies: dict):
+        """
+        Builds the statistics from scratch. Movies without a numeric rating are not counted.
+
+        The sum is computed exactly with math.fsum, which also drops the rounding errors the
+        running sum picked up from earlier adds and removes.
+
+        Args:
+            movies (dict): The movie data, keys are the stored titles.
+        """
+        super().rebuild(movies)
+        self.total = math.fsum(rating for rating, _ in self.entries)
+
+
+    def add(self, title: str, info):
+        """
+        Adds the rating of a movie.
+
+        Args:
+            title (str): Title as stored.
+            info (Movie): The movie record.
+        """
+        super().add(title, info)
+        if info.rating is not None:
+            self.total += info.rating
+
+
+    def remove(self, title: str, info):
+        """
+        Removes the rating of a movie.
+
+        Args:
+            title (str): Title as stored.
+            info (Movie): The movie record as it was added.
+        """
+        size = len(self.entries)
+        super().remove(title, info)
+        if len(self.entries) < size:
+            self.total = self.total - info.rating if self.entries else 0.0
+
+
+    def mean(self):
+        """
+        Returns the average rating.
+
+        Returns:
+            float or None: The mean of all ratings, None if there are no rated movies.
+        """
+        if not self.entries:
+            return None
+        return self.total / len(self.entries)
+
+
+    def median(self):
+        """
+        Returns the median rating, for an even count the mean of the two middle ratings.
+
+        Returns:
+            float or None: The median of all ratings, None if there are no rated movies.
+        """
+        size = len(self.entries)
+        if not size:
+            return None
+        if size % 2:
+            return self.entries[size // 2][0]
+        return (self.entries[size // 2 - 1][0] + self.entries[size // 2][0]) / 2
+
+
+    def best(self):
+        """
+        Returns the titles sharing the highest rating.
+
+        Returns:
+            list: The titles in alphabetical order, empty if there are no rated movies.
+        """
+        if not self.entries:
+            return []
+        start = bisect_left(self.entries, (self.entries[-1][0],))
+        return [title for _, title in self.entries[start:]]
+
+
+    def worst(self):
+        """
+        Returns the titles sharing the lowest rating.
+
+        Returns:
+            list: The titles in alphabetical order, empty if there are no rated movies.
+        """
+        if not self.entries:
+            return []
+        end = bisect_right(self.entries, self.entries[0][0], key=lambda entry: entry[0])
+        return [title for _, title in self.entries[:end]]
@@ -0,0 +1,206 @@
+import heapq
+from array import array
+from collections import Counter
+from storage.title_index import normalize_title
+
+# Share of the query trigrams a typo-tolerant match must contain at least.
+FUZZY_THRESHOLD = 0.3
+# Number of candidates with the most shared trigrams that get an exact similarity score.
+FUZZY_CANDIDATES = 200
+
+
+def trigrams(text: str):
+    """
+    Returns the trigrams of a normalized title, padded so word starts get their own trigrams.
+
+    Args:
+        text (str): A normalized title, see normalize_title().
+
+    Returns:
+        set: The trigrams of the text.
+    """
+    padded = f"  {text} "
+    return {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    Inverted trigram index over the movie titles for substring and typo-tolerant search.
+
+    Every title gets an integer id, the posting list of a trigram is a compact array of ids.
+    The normalized titles are kept by id, so candidates are checked without normalizing them again.
+    Deleted titles only get a tombstone, the posting lists are compacted once many ids are dead.
+    """
+
+    def __init__(self):
+        """Initializes an empty SearchIndex."""
+        self.titles = []
+        self.keys = []
+        self.ids = {}
+        self.removed = {}
+        self.postings = {}
+
+
+    def rebuild(self, movies: dict):
+        """
+        Builds the index from scratch.
+
+        Args:
+            movies (dict): The movie data, keys are the stored titles.
+        """
+        self.titles = []
+        self.keys = []
+        self.ids = {}
+        self.removed = {}
+        self.postings = {}
+        postings = self.postings
+        for title in movies:
+            title_id = len(self.titles)
+            key = normalize_title(title)
+            self.titles.append(title)
+            self.keys.append(key)
+            self.ids[title] = title_id
+            for trigram in trigrams(key):
+                posting = postings.get(trigram)
+                if posting is None:
+                    posting = postings[trigram] = array("i")
+                posting.append(title_id)
+
+
+    def _insert(self, title: str):
+        """
+        Gives a title a new id and adds it to the posting lists of its trigrams.
+
+        Args:
+            title (str): Title as stored.
+        """
+        title_id = len(self.titles)
+        key = normalize_title(title)
+        self.titles.append(title)
+        self.keys.append(key)
+        self.ids[title] = title_id
+        for trigram in trigrams(key):
+            posting = self.postings.get(trigram)
+            if posting is None:
+                posting = self.postings[trigram] = array("i")
+            posting.append(title_id)
+
+
+    def add(self, title: str, info):
+        """
+        Adds a title to the index. A title that was just removed, e.g. by an update, gets its old id back.
+
+        Args:
+            title (str): Title as stored.
+            info (Movie): The movie record, not used by this index.
+        """
+        if title in self.ids:
+            return
+        title_id = self.removed.pop(title, None)
+        if title_id is not None:
+            self.titles[title_id] = title
+            self.keys[title_id] = normalize_title(title)
+            self.ids[title] = title_id
+        else:
+            self._insert(title)
+
+
+    def remove(self, title: str, info):
+        """
+        Removes a title from the index by leaving a tombstone.
+
+        Args:
+            title (str): Title as stored.
+            info (Movie): The movie record, not used by this index.
+        """
+        title_id = self.ids.pop(title, None)
+        if title_id is None:
+            return
+        self.titles[title_id] = None
+        self.keys[title_id] = None
+        self.removed[title] = title_id
+        if len(self.removed) > 1000 and len(self.removed) > len(self.titles) // 4:
+            self.rebuild(self.ids)
+
+
+    def search(self, query: str, limit: int = None, fuzzy: bool = True):
+        """
+        Searches titles containing the query, case-insensitive, and typo-tolerant matches.
+
+        Substring matches are ranked first: titles starting with the query, then shorter titles.
+        With a limit only the best matches are selected with a heap instead of sorting all of them.
+        Typo-tolerant matches are ranked by trigram similarity and fill up the result up to limit.
+        Without limit they are only returned if there is no substring match.
+
+        Args:
+            query (str): The part of the title to search for.
+            limit (int): Maximum number of results, None for all substring matches.
+            fuzzy (bool): If False, only substring matches are returned.
+
+        Returns:
+            list: The matching titles as stored, best match first.
+        """
+        key = normalize_title(query).strip()
+        if not key:
+            return []
+        if len(key) < 3:
+            candidates = range(len(self.titles))
+        else:
+            # Every trigram of a substring is a trigram of the title, the rarest ones give the fewest candidates.
+            query_trigrams = {key[position:position + 3] for position in range(len(key) - 2)}
+            postings = sorted((self.postings.get(trigram, array("i")) for trigram in query_trigrams), key=len)
+            candidates = postings[0]
+            if len(candidates) > 1000 and len(postings) > 1:
+                candidates = set(candidates).intersection(postings[1])
+        keys = self.keys
+        matches = [title_id for title_id in candidates if keys[title_id] is not None and key in keys[title_id]]
+
+        def rank(title_id):
+            return not keys[title_id].startswith(key), len(keys[title_id]), self.titles[title_id]
+
+        if limit is not None and len(matches) > limit:
+            matches = heapq.nsmallest(limit, matches, key=rank)
+        else:
+            matches.sort(key=rank)
+        results = [self.titles[title_id] for title_id in matches]
+        wanted_fuzzy = (limit is None and not results) or (limit is not None and len(results) < limit)
+        if fuzzy and wanted_fuzzy and len(key) >= 3:
+            results.extend(self._fuzzy_search(key, set(matches)))
+        return results if limit is None else results[:limit]
+
+
+    def _fuzzy_search(self, key: str, exclude: set):
+        """
+        Finds titles with a similar trigram set, for queries with typos.
+
+        Args:
+            key (str): The normalized query.
+            exclude (set): Ids of titles that already matched as substring.
+
+        Returns:
+            list: Titles containing at least FUZZY_THRESHOLD of the query trigrams,
+                  ranked by that share and then by the similarity of the whole trigram sets.
+        """
+        query_trigrams = trigrams(key)
+        shared = Counter()
+        live_titles = len(self.ids)
+        large_posting = max(1000, live_titles // 20)
+        postings = sorted((self.postings.get(trigram, array("i")) for trigram in query_trigrams), key=len)
+        for number, posting in enumerate(postings):
+            # Very common trigrams barely change the ranking, skip them once rarer ones were counted.
+            if len(posting) > large_posting and number >= len(postings) // 2:
+                break
+            shared.update(posting)
+        scored = []
+        for title_id, count in shared.most_common(FUZZY_CANDIDATES):
+            title = self.titles[title_id]
+            if title is None or title_id in exclude:
+                continue
+            title_trigrams = trigrams(self.keys[title_id])
+            common = len(query_trigrams & title_trigrams)
+            containment = common / len(query_trigrams)
+            similarity = common / (len(query_trigrams) + len(title_trigrams) - common)
+            if containment >= FUZZY_THRESHOLD:
+                scored.append((containment, similarity, title))
+        scored.sort(key=lambda match: (-match[0], -match[1], match[2]))
+        return [title for _, _, title in scored]
@@ -0,0 +1,129 @@
+import gc
+import hashlib
+import os
+import pickle
+from storage.atomic_file import atomic_write
+
+# Bump when Movie or the pickled indexes change, so old snapshots are rebuilt.
+SNAPSHOT_VERSION = 1
+
+
+class CatalogSnapshot:
+    """
+    Binary copy of the parsed movie data and its indexes in a sidecar "<file_path>.snapshot" file.
+
+    Parsing a large CSV or JSON file is much slower than unpickling the same movies, so the parsed
+    data is kept next to the file and loaded instead as long as the file did not change. The
+    snapshot starts with a small header holding size, mtime and content hash of the data file it
+    was made from, followed by the pickled movies. Like the data file itself, the snapshot has to
+    come from a trusted source, unpickling can run code.
+    """
+
+    def __init__(self, file_path: str):
+        """
+        Initializes the CatalogSnapshot for the given data file.
+
+        Args:
+            file_path (str): Path to the data file the snapshot belongs to.
+        """
+        self.file_path = file_path
+        self.path = file_path + ".snapshot"
+        self.loaded = 0
+        self.saved = 0
+
+
+    def _hash_file(self):
+        """
+        Hashes the content of the data file in chunks.
+
+        Returns:
+            str: Hex BLAKE2b digest of the content.
+        """
+        file_hash = hashlib.blake2b(digest_size=16)
+        with open(self.file_path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+
+    def load(self):
+        """
+        Loads the movie data if the snapshot was made from the current content of the data file.
+
+        Size and mtime of the data file are compared first. If only the mtime differs, e.g. after
+        a copy or touch, the content hash decides, and a matching snapshot gets a new header so
+        the next load does not hash again.
+
+        Returns:
+            tuple: (movies (dict), indexes (dict)), or None if there is no valid snapshot.
+
+        Handles:
+            Exception: A missing, damaged or outdated snapshot counts as no snapshot.
+        """
+        try:
+            with open(self.path, "rb") as handle:
+                header = pickle.load(handle)
+                stat = os.stat(self.file_path)
+                if header.get("version") != SNAPSHOT_VERSION or header["size"] != stat.st_size:
+                    return None
+                touched = header["mtime_ns"] != stat.st_mtime_ns
+                if touched and self._hash_file() != header["hash"]:
+                    return None
+                # The collector would scan the growing object graph again and again while it is unpickled.
+                gc_enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    movies, indexes = pickle.load(handle)
+                finally:
+                    if gc_enabled:
+                        gc.enable()
+        except Exception:
+            return None
+        if touched:
+            self.save(movies, indexes, stat, header["hash"])
+        self.loaded += 1
+        return movies, indexes
+
+
+    def save(self, movies: dict, indexes: dict = None, stat: os.stat_result = None, file_hash: str = None):
+        """
+        Saves the movie data, to be called right after the data file was parsed or written.
+
+        Args:
+            movies (dict): The movie data, exactly as stored in the data file.
+            indexes (dict): Indexes built over this movie data, by index name.
+            stat (os.stat_result): Stat of the data file the movies belong to, taken now if not given.
+            file_hash (str): Content hash of the data file, computed now if not given.
+
+        Handles:
+            FileNotFoundError: If there is no data file yet, nothing is saved.
+            OSError: If the snapshot can not be written, a message is printed.
+            pickle.PicklingError: If an index can not be pickled, the snapshot is saved without indexes.
+        """
+        try:
+            stat = stat or os.stat(self.file_path)
+            header = {"version": SNAPSHOT_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                      "hash": file_hash or self._hash_file()}
+            try:
+                self._write(header, movies, indexes or {})
+            except (pickle.PicklingError, TypeError, AttributeError):
+                self._write(header, movies, {})
+            self.saved += 1
+        except FileNotFoundError:
+            pass
+        except OSError:
+            print("There was an issue saving the catalog snapshot.")
+
+
+    def _write(self, header: dict, movies: dict, indexes: dict):
+        """
+        Replaces the snapshot file with the header followed by the pickled movies and indexes.
+
+        Args:
+            header (dict): Version, size, mtime and hash of the data file.
+            movies (dict): The movie data.
+            indexes (dict): Indexes built over this movie data, by index name.
+        """
+        with atomic_write(self.path, binary=True) as handle:
+            pickle.dump(header, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump((movies, indexes), handle, protocol=pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,307 @@
+from storage.istorage import IStorage
+from storage.columnar_file import ColumnarMovies, write_columnar
+from storage.atomic_file import atomic_write
+from storage.range_index import FilterResult, in_range
+from itertools import islice
+
+
+class ColumnarRatingStats:
+    """Rating statistics read from the columns and precomputed sums of a columnar file, see RatingStats."""
+
+    def __init__(self, movies: ColumnarMovies):
+        """
+        Initializes the ColumnarRatingStats.
+
+        Args:
+            movies (ColumnarMovies): A clean mapping of the columnar file.
+        """
+        self.movies = movies
+
+
+    def mean(self):
+        """
+        Returns the average rating.
+
+        Returns:
+            float or None: The mean of all ratings, None if there are no rated movies.
+        """
+        if not self.movies.rated_count:
+            return None
+        return self.movies.rating_sum / self.movies.rated_count
+
+
+    def median(self):
+        """
+        Returns the median rating, for an even count the mean of the two middle ratings.
+
+        Returns:
+            float or None: The median of all ratings, None if there are no rated movies.
+        """
+        return self.movies.median_rating()
+
+
+    def best(self):
+        """
+        Returns the titles sharing the highest rating.
+
+        Returns:
+            list: The titles in alphabetical order, empty if there are no rated movies.
+        """
+        return self.movies.rating_ties(best=True)
+
+
+    def worst(self):
+        """
+        Returns the titles sharing the lowest rating.
+
+        Returns:
+            list: The titles in alphabetical order, empty if there are no rated movies.
+        """
+        return self.movies.rating_ties(best=False)
+
+
+class ColumnarSortedView:
+    """The titles of a columnar file in the precomputed order of a numeric column, see SortedView."""
+
+    def __init__(self, movies: ColumnarMovies, field: str, descending: bool = False):
+        """
+        Initializes the view.
+
+        Args:
+            movies (ColumnarMovies): A clean mapping of the columnar file.
+            field (str): "year" or "rating".
+            descending (bool): If True, the highest values come first.
+        """
+        self.movies = movies
+        self.field = field
+        self.descending = descending
+
+
+    def __len__(self):
+        """Returns the number of titles in the view."""
+        return self.movies.count
+
+
+    def __iter__(self):
+        """Iterates over the titles in sorted order, decoding only the titles."""
+        for row in self.movies.sorted_rows(self.field, self.descending):
+            yield self.movies.title_at(row)
+
+
+class StorageColumnar(IStorage):
+    """
+    Handles CRUD and managing movie data in a memory-mapped binary columnar file.
+
+    Loading the file only maps it, movies are decoded when they are accessed. Title lookups,
+    statistics, sorting and filtering run on the numeric columns and the sort orders stored
+    in the file, without creating a Movie for every row. Changes are saved by rewriting the file,
+    until then (e.g. in a batch or in journal mode) the queries fall back to the in-memory indexes.
+    """
+
+    def __init__(self, file_path: str, journal: bool = False, max_journal_records: int = 1000,
+                 max_journal_bytes: int = 1024 * 1024, persist_title_index: bool = False, locking: bool = True):
+        """
+        Initializes the StorageColumnar instance to handle movie data storage in a columnar file.
+
+        Args:
+            file_path (str): Path to the columnar file used for storing movie data.
+            journal (bool): If True, changes are appended to a sidecar log and compacted later.
+            max_journal_records (int): Number of log records after which the log is compacted.
+            max_journal_bytes (int): Size of the log in bytes after which the log is compacted.
+            persist_title_index (bool): If True, the title index is saved next to the data file.
+            locking (bool): If True, reads and writes are guarded by a shared/exclusive file lock.
+
+        Raises:
+            ValueError: If the file_path is empty or does not have a ".mcol" extension.
+            TypeError: If the file_path is not a string.
+        """
+        file_format = file_path.split(".")[-1]
+        if file_format != "mcol":
+            raise ValueError (f"Invalid file extension. Expected .mcol file but got {file_format}")
+        super().__init__(file_path, journal, max_journal_records, max_journal_bytes, persist_title_index,
+                         locking)
+
+
+    def _read_file(self):
+        """
+        Maps the columnar file, in O(1) regardless of the number of movies.
+
+        Returns:
+            ColumnarMovies: Dictionary-like view of the Movie records, the keys are the movie titles.
+
+        Handles:
+            ValueError: If the file is not in the columnar format, returns an empty dictionary.
+            OSError: If the file can not be mapped, returns an empty dictionary.
+        """
+        try:
+            return ColumnarMovies(self.file_path)
+        except (ValueError, OSError) as e:
+            print(f"Error reading columnar file: {e}")
+            return {}
+
+
+    def _open_stream(self):
+        """
+        Maps the columnar file for decoding it row by row.
+
+        Returns:
+            Iterator of (title, Movie) pairs.
+        """
+        return self._read_file().items()
+
+
+    def _write_file(self, data: dict):
+        """
+        Writes/Overwrites movie data to the columnar file.
+
+        Args:
+            data (dict): Dictionary of Movie records to save.
+
+        Handles:
+            IOError: If there is an error while writing to the file. Like no permission.
+        """
+        try:
+            with atomic_write(self.file_path, binary=True) as handle:
+                write_columnar(handle, data.items())
+        except IOError as e:
+            print(f"Error writing to file: {e}")
+
+
+    def write_movies(self, data: dict):
+        """
+        Writes/Overwrites movie data to the columnar file.
+
+        The next read maps the new file, so the column queries work on the saved data again.
+
+        Args:
+            data (dict): Dictionary of Movie records to save.
+        """
+        super().write_movies(data)
+        self.cache.invalidate()
+
+
+    def _rollback(self, data: dict, snapshot: dict):
+        """
+        Drops the changes of a failed batch. The file was not touched, so it is just mapped again.
+
+        Args:
+            data (dict): The movie data changed by the batch.
+            snapshot (dict): Copy of the movie data taken at the start of the batch, not needed.
+        """
+        self._indexes = {}
+        self.cache.invalidate()
+
+
+    def _columns(self):
+        """
+        Returns the mapped file if the column queries can be used.
+
+        Returns:
+            ColumnarMovies or None: The mapping, None if it has unsaved changes on top of the file.
+        """
+        movies_data_dict = self.read_movies()
+        if isinstance(movies_data_dict, ColumnarMovies) and movies_data_dict.clean:
+            return movies_data_dict
+        return None
+
+
+    def find_title(self, title: str):
+        """
+        Finds a movie by title, case-insensitive, by binary search in the normalized title order.
+
+        Args:
+            title (str): Title of the movie in any casing.
+
+        Returns:
+            str or None: The title as stored, or None if there is no such movie.
+        """
+        columns = self._columns()
+        if columns is None:
+            return super().find_title(title)
+        return columns.find_title(title)
+
+
+    def rating_stats(self):
+        """
+        Returns the rating statistics, read from the rating column and the sums in the file header.
+
+        Returns:
+            ColumnarRatingStats or RatingStats: Provides mean(), median(), best() and worst().
+        """
+        columns = self._columns()
+        if columns is None:
+            return super().rating_stats()
+        return ColumnarRatingStats(columns)
+
+
+    def sorted_movies(self, key: str = "rating", descending: bool = True):
+        """
+        Returns all titles sorted by year or rating, in the sort order stored in the file.
+
+        Args:
+            key (str): "year" or "rating".
+            descending (bool): If True, the highest values come first.
+
+        Returns:
+            ColumnarSortedView or SortedView: The titles in sorted order.
+
+        Raises:
+            ValueError: If key is not a sortable field.
+        """
+        self._validate_sort_key(key)
+        columns = self._columns()
+        if columns is None:
+            return super().sorted_movies(key, descending)
+        return ColumnarSortedView(columns, key, descending)
+
+
+    def top_movies(self, key: str = "rating", k: int = 10, descending: bool = True):
+        """
+        Returns the first k titles of the sorted order by year or rating, see sorted_movies().
+
+        Args:
+            key (str): "year" or "rating".
+            k (int): Number of titles.
+            descending (bool): If True, the highest values come first.
+
+        Returns:
+            list: At most k titles.
+
+        Raises:
+            ValueError: If key is not a sortable field.
+        """
+        self._validate_sort_key(key)
+        columns = self._columns()
+        if columns is None:
+            return super().top_movies(key, k, descending)
+        return list(islice(ColumnarSortedView(columns, key, descending), k))
+
+
+    def filter_movies(self, min_rating: float = None, max_rating: float = None, start_year: int = None,
+                      end_year: int = None):
+        """
+        Finds the movies within a rating and year range by binary search in the sorted columns.
+
+        Args:
+            min_rating (float): Lowest rating, None for no lower bound.
+            max_rating (float): Highest rating, None for no upper bound.
+            start_year (int): First year, None for no lower bound.
+            end_year (int): Last year, None for no upper bound.
+
+        Returns:
+            FilterResult: Read-only mapping of the matching titles to their Movie records.
+        """
+        columns = self._columns()
+        if columns is None:
+            return super().filter_movies(min_rating, max_rating, start_year, end_year)
+        bounds = {"rating": (min_rating, max_rating), "year": (start_year, end_year)}
+        ranges = {field: columns.range_rows(field, low, high)
+                  for field, (low, high) in bounds.items() if low is not None or high is not None}
+        if not ranges:
+            return FilterResult(columns, columns.keys())
+        # Walk the smaller range and check the other bounds on the numeric column.
+        field = min(ranges, key=lambda name: len(ranges[name]))
+        checks = [(other, *bounds[other]) for other in ranges if other != field]
+        titles = [columns.title_at(row) for row in ranges[field]
+                  if all(in_range(columns.value_at(other, row), low, high) for other, low, high in checks)]
+        return FilterResult(columns, titles)
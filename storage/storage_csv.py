@@ -1,16 +1,26 @@
 from storage.istorage import IStorage
+from storage.movie import Movie
+from storage.atomic_file import atomic_write
 import csv
 
 
 class StorageCsv(IStorage):
     """Handles CRUD and managing movie data in a Csv file"""
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, journal: bool = False, max_journal_records: int = 1000,
+                 max_journal_bytes: int = 1024 * 1024, persist_title_index: bool = False, locking: bool = True,
+                 snapshot: bool = False):
         """
         Initializes the StorageCsv instance to handle movie data storage in a CSV file.
 
         Args:
             file_path (str): Path to the CSV file used for storing movie data.
+            journal (bool): If True, changes are appended to a sidecar log and compacted later.
+            max_journal_records (int): Number of log records after which the log is compacted.
+            max_journal_bytes (int): Size of the log in bytes after which the log is compacted.
+            persist_title_index (bool): If True, the title index is saved next to the data file.
+            locking (bool): If True, reads and writes are guarded by a shared/exclusive file lock.
+            snapshot (bool): If True, the parsed movies are pickled next to the file for a fast next start.
 
         Raises:
             ValueError: If the file_path is empty or does not have a ".csv" extension.
@@ -19,16 +29,17 @@ class StorageCsv(IStorage):
         file_format = file_path.split(".")[-1]
         if file_format != "csv":
             raise ValueError (f"Invalid file extension. Expected .csv file but got {file_format}")
-        super().__init__(file_path)
+        super().__init__(file_path, journal, max_journal_records, max_journal_bytes, persist_title_index,
+                         locking, snapshot)
 
 
 
-    def read_movies(self):
+    def _read_file(self):
         """
         Reads movie data from the Csv file.
 
         The function reads the CSV file, extracts the movie data, and organizes it into
-        a dictionary where the keys are the movie titles and the values are dictionaries
+        a dictionary where the keys are the movie titles and the values are Movie records
         containing the movie's details (year, rating, poster_url).
 
         Returns:
@@ -40,13 +51,7 @@ class StorageCsv(IStorage):
         """
         try:
             with open(self.file_path, "r") as handle:
-                reader = csv.DictReader(handle)
-
-                data = {}
-                for row in reader:
-                    title = row["title"]
-                    del row["title"]
-                    data[title] = row
+                data = dict(self._iter_rows(handle))
         except FileNotFoundError:
             print(f"File {self.file_path} was not found.")
             data = {}
@@ -56,31 +61,73 @@ class StorageCsv(IStorage):
         return data
 
 
-    def write_movies(self, data: dict):
+    def _iter_rows(self, handle):
+        """
+        Parses the Csv rows one by one.
+
+        Args:
+            handle: Text handle of the open Csv file.
+
+        Yields:
+            tuple: (title, Movie) of every row.
+        """
+        for row in csv.DictReader(handle):
+            title = row["title"]
+            yield title, Movie(title, row["year"], row["rating"], row["poster_url"])
+
+
+    def _open_stream(self):
+        """
+        Opens the Csv file for reading it row by row.
+
+        Returns:
+            Iterator of (title, Movie) pairs, empty if the file does not exist.
+        """
+        try:
+            handle = open(self.file_path, "r")
+        except FileNotFoundError:
+            print(f"File {self.file_path} was not found.")
+            return iter(())
+        return self._stream_rows(handle)
+
+
+    def _stream_rows(self, handle):
+        """
+        Yields the rows of the open Csv file and closes it at the end.
+
+        Args:
+            handle: Text handle of the open Csv file.
+
+        Handles:
+            csv.Error: If the file is not in valid Csv format, the stream ends early.
+        """
+        with handle:
+            try:
+                yield from self._iter_rows(handle)
+            except csv.Error as e:
+                print(f"Error reading CSV file: {e}")
+
+
+    def _write_file(self, data: dict):
         """
         Writes/Overwrites movie data to the Csv file.
 
         This function takes a dictionary containing the movie data and writes it to a CSV file.
-        It overwrites any existing content in the file.
+        It overwrites any existing content in the file. The rows go to a temporary file first,
+        which replaces the Csv file once it is complete, so a crash can not leave a truncated file.
 
         Args:
-            data (dict): Dictionary containing the movie data to save.
+            data (dict): Dictionary of Movie records to save.
 
         Handles:
             IOError: If there is an error while writing to the file. Like no permission.
         """
         try:
-            with open(self.file_path, 'w', newline='') as handle:
-                first_movie = list(data.values())[0]
-                fieldnames = ['title'] + list(first_movie.keys())
-                writer = csv.DictWriter(handle, fieldnames=fieldnames)
-                writer.writeheader()
-                rows = []
-                for title, info in data.items():
-                    row = {'title': title}
-                    row.update(info)
-                    rows.append(row)
-                writer.writerows(rows)
+            with atomic_write(self.file_path, newline='') as handle:
+                writer = csv.writer(handle)
+                writer.writerow(['title', 'year', 'rating', 'poster_url'])
+                writer.writerows((title, movie.raw_year, movie.raw_rating, movie.poster_url)
+                                 for title, movie in data.items())
             print("CSV file was successfully created.")
         except IOError as e:
             print(f"Error writing to file: {e}")
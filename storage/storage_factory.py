@@ -0,0 +1,42 @@
+from storage.storage_json import StorageJson
+from storage.storage_csv import StorageCsv
+from storage.storage_sqlite import StorageSqlite
+from storage.storage_columnar import StorageColumnar
+
+STORAGE_CLASSES = {
+    "json": StorageJson,
+    "csv": StorageCsv,
+    "sqlite": StorageSqlite,
+    "sqlite3": StorageSqlite,
+    "db": StorageSqlite,
+    "mcol": StorageColumnar,
+}
+# Formats that are parsed as a whole on load and gain from a snapshot.
+SNAPSHOT_FORMATS = {"json", "csv"}
+# Formats that can keep changes in a sidecar log, see Journal. SQLite writes every change in place.
+JOURNAL_FORMATS = {"json", "csv", "mcol"}
+
+
+def open_storage(file_path: str, snapshot: bool = False, **options):
+    """
+    Opens the storage backend matching the file extension.
+
+    Args:
+        file_path (str): Name of the data file inside the data folder, e.g. "movies.csv".
+        snapshot (bool): If True, the text formats keep a pickled snapshot of the parsed catalog for a
+                         fast start, see CatalogSnapshot. SQLite and columnar files need no parsing.
+        **options: Passed on to the storage class, e.g. journal=True. StorageSqlite takes none.
+
+    Returns:
+        IStorage: The storage object.
+
+    Raises:
+        ValueError: If there is no backend for the file extension.
+    """
+    file_format = file_path.split(".")[-1]
+    storage_class = STORAGE_CLASSES.get(file_format)
+    if storage_class is None:
+        raise ValueError(f"Unknown file extension {file_format}, expected one of {', '.join(STORAGE_CLASSES)}")
+    if snapshot and file_format in SNAPSHOT_FORMATS:
+        options["snapshot"] = True
+    return storage_class(file_path, **options)
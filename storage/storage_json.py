@@ -1,17 +1,30 @@
 from storage.istorage import IStorage
+from storage.movie import Movie
+from storage.atomic_file import atomic_write
+from storage.json_stream import iter_json_object
 import json
 
+# Encodes the members of a streamed catalog, one encoder for all of them.
+MEMBER_ENCODER = json.JSONEncoder(indent=4)
 
 
 class StorageJson(IStorage):
     """Handles CRUD and managing movie data in a JSON file"""
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, journal: bool = False, max_journal_records: int = 1000,
+                 max_journal_bytes: int = 1024 * 1024, persist_title_index: bool = False, locking: bool = True,
+                 snapshot: bool = False):
         """
         Initializes the StorageJson instance to handle movie data storage in a json file.
 
         Args:
             file_path (str): Path to the json file used for storing movie data.
+            journal (bool): If True, changes are appended to a sidecar log and compacted later.
+            max_journal_records (int): Number of log records after which the log is compacted.
+            max_journal_bytes (int): Size of the log in bytes after which the log is compacted.
+            persist_title_index (bool): If True, the title index is saved next to the data file.
+            locking (bool): If True, reads and writes are guarded by a shared/exclusive file lock.
+            snapshot (bool): If True, the parsed movies are pickled next to the file for a fast next start.
 
         Raises:
             ValueError: If the file_path is empty or does not have a ".json" extension.
@@ -20,15 +33,16 @@ class StorageJson(IStorage):
         file_format = file_path.split(".")[-1]
         if file_format != "json":
             raise ValueError (f"Invalid file extension. Expected .json file but got {file_format}")
-        super().__init__(file_path)
+        super().__init__(file_path, journal, max_journal_records, max_journal_bytes, persist_title_index,
+                         locking, snapshot)
 
 
-    def read_movies(self):
+    def _read_file(self):
         """
         Reads movie data from the JSON file.
 
         Returns:
-            dict: Dictionary containing the movie data to read.
+            dict: Dictionary of Movie records, the keys are the movie titles.
 
         Handles:
             FileNotFoundError: If the file does not exist, returns an empty dictionary.
@@ -36,7 +50,7 @@ class StorageJson(IStorage):
         """
         try:
             with open(self.file_path , "r") as handle:
-                data = json.load(handle)
+                data = {title: Movie.from_dict(title, info) for title, info in json.load(handle).items()}
         except json.JSONDecodeError as e:
             print(f"Data type was not in JSON format: {e}")
             data = {}
@@ -46,19 +60,79 @@ class StorageJson(IStorage):
         return data
 
 
-    def write_movies(self, data: dict):
+    def _open_stream(self):
+        """
+        Opens the JSON file for parsing it movie by movie with the chunked parser.
+
+        Returns:
+            Iterator of (title, Movie) pairs, empty if the file does not exist.
+        """
+        try:
+            handle = open(self.file_path, "r")
+        except FileNotFoundError:
+            print(f"File {self.file_path} was not found.")
+            return iter(())
+        return self._stream_movies(handle)
+
+
+    def _stream_movies(self, handle):
+        """
+        Yields the movies of the open JSON file and closes it at the end.
+
+        Args:
+            handle: Text handle of the open JSON file.
+
+        Handles:
+            JSONDecodeError: If the file is not in valid JSON format, the stream ends early.
+        """
+        with handle:
+            try:
+                for title, info in iter_json_object(handle):
+                    yield title, Movie.from_dict(title, info)
+            except json.JSONDecodeError as e:
+                print(f"Data type was not in JSON format: {e}")
+
+
+    def _write_file(self, data: dict):
         """
         Writes/Overwrites movie data to the JSON file.
 
+        The data goes to a temporary file first, which replaces the JSON file once it is complete.
+
+        Args:
+            data (dict): Dictionary of Movie records to save.
+
+        Handles:
+            IOError: If there is an error while writing to the file. Like no permission.
+        """
+        try:
+            with atomic_write(self.file_path) as handle:
+                json.dump({title: movie.to_dict() for title, movie in data.items()}, handle, indent = 4)
+        except IOError as e:
+            print(f"Error at opening file: {e}")
+
+
+    def _write_stream_file(self, movies):
+        """
+        Writes/Overwrites the JSON file with movies that are not held in memory.
+
+        Movies are encoded one by one, so a MovieStream is written without loading it.
+        The layout is the same as the one of _write_file().
+
         Args:
-            data (dict): Dictionary containing the movie data to save.
+            movies: Object with an items() method returning (title, Movie) pairs, like a MovieStream.
 
         Handles:
             IOError: If there is an error while writing to the file. Like no permission.
         """
         try:
-            with open(self.file_path , "w") as handle:
-                json.dump(data ,handle, indent = 4)
+            with atomic_write(self.file_path) as handle:
+                separator = "{"
+                for title, movie in movies.items():
+                    member = MEMBER_ENCODER.encode({title: movie.to_dict()})
+                    handle.write(separator + member[1:-2])
+                    separator = ","
+                handle.write("{}" if separator == "{" else "\n}")
         except IOError as e:
             print(f"Error at opening file: {e}")
 
@@ -0,0 +1,331 @@
+from storage.istorage import IStorage
+from storage.title_index import normalize_title
+from storage.movie import Movie
+from storage.metrics import instrumented
+import contextlib
+import sqlite3
+
+
+class StorageSqlite(IStorage):
+    """Handles CRUD and managing movie data in a SQLite database file"""
+
+    def __init__(self, file_path: str):
+        """
+        Initializes the StorageSqlite instance to handle movie data storage in a SQLite file.
+
+        The movies table keeps title, year, rating and poster_url in their own columns, year and
+        rating as stored, e.g. "7.9/10". A normalized, casefolded copy of the title is indexed, so
+        delete and update find a movie with one index lookup instead of scanning the whole catalog.
+        Sorting and filtering by year or rating use the in-memory indexes of IStorage.
+
+        Args:
+            file_path (str): Path to the SQLite file used for storing movie data.
+
+        Raises:
+            ValueError: If the file_path is empty or does not have a ".sqlite", ".sqlite3" or ".db" extension.
+            TypeError: If the file_path is not a string.
+        """
+        file_format = file_path.split(".")[-1]
+        if file_format not in ("sqlite", "sqlite3", "db"):
+            raise ValueError (f"Invalid file extension. Expected .sqlite file but got {file_format}")
+        # SQLite locks the database itself, the sidecar lock file is not needed.
+        super().__init__(file_path, locking=False)
+        # The API server commits a batch from a worker thread, the default serialized mode of SQLite allows this.
+        self.connection = sqlite3.connect(self.file_path, check_same_thread=False)
+        self._create_tables()
+
+
+    def _create_tables(self):
+        """Creates the movies table and its title index, if they do not exist yet."""
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS movies (
+                    title TEXT PRIMARY KEY,
+                    title_key TEXT NOT NULL,
+                    year,
+                    rating,
+                    poster_url TEXT
+                )""")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_movies_title_key ON movies (title_key)")
+            # Year and rating hold the raw strings, an index on them only gives text order and no query used it.
+            self.connection.execute("DROP INDEX IF EXISTS idx_movies_year")
+            self.connection.execute("DROP INDEX IF EXISTS idx_movies_rating")
+
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        Commits the statements of the block, or rolls them back if it raises.
+
+        Inside batch() the statements are left to the transaction of the batch.
+        """
+        if self._batch_depth:
+            yield
+            return
+        with self.connection:
+            yield
+
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Groups many changes into one SQLite transaction.
+
+        add, delete and update run their statements without committing. When the with block ends,
+        all of them are committed at once. If it raises, they are rolled back.
+
+        Yields:
+            dict: The movie data at the start of the batch.
+        """
+        if self._batch_depth:
+            self._batch_depth += 1
+            try:
+                yield self.read_movies()
+            finally:
+                self._batch_depth -= 1
+            return
+        movies_data_dict = self.read_movies()
+        self._batch_depth = 1
+        try:
+            yield movies_data_dict
+        except BaseException:
+            self._batch_depth = 0
+            self.connection.rollback()
+            self._indexes = {}
+            self.cache.invalidate()
+            raise
+        self._batch_depth = 0
+        self.connection.commit()
+        self._refresh_cache_signature()
+
+
+    def _drop_stale_cache(self):
+        """
+        Drops the cached data if another process committed to the database since it was cached.
+
+        Called inside the transaction after the first statement of a change, when SQLite holds the
+        write lock and no other process can commit. The signature still has to match the one of the
+        cached data, otherwise patching it would stamp data that misses the other commit as current.
+        """
+        if self.cache.data is not None and self.cache.signature != self._file_signature():
+            self._indexes = {}
+            self.cache.invalidate()
+
+
+    def _patch_cache(self, title: str, new_info: Movie = None):
+        """
+        Applies a change that was just written to the database to the cached data and its indexes.
+
+        Nothing is done if the movies are not cached, or no longer after _drop_stale_cache(),
+        the next read loads them with the change.
+
+        Args:
+            title (str): Title of the changed movie, as stored.
+            new_info (Movie): The movie record after the change, None if the movie was deleted.
+        """
+        movies_data_dict = self.cache.data
+        if movies_data_dict is None:
+            return
+        old_info = movies_data_dict.pop(title, None) if new_info is None else movies_data_dict.get(title)
+        if new_info is not None:
+            movies_data_dict[title] = new_info
+        self._update_indexes(title, old_info, new_info)
+
+
+    def _refresh_cache_signature(self):
+        """
+        Marks the cached data as current after a commit, so it is not read from the database again.
+
+        Inside batch() nothing is done, the signature is refreshed once the batch is committed.
+        """
+        if not self._batch_depth and self.cache.data is not None:
+            self.cache.signature = self._file_signature()
+
+
+    def _read_file(self):
+        """
+        Reads movie data from the SQLite file.
+
+        Returns:
+            dict: Dictionary of Movie records, in insertion order.
+
+        Handles:
+            sqlite3.Error: If the database can not be read, returns an empty dictionary.
+        """
+        try:
+            rows = self.connection.execute(
+                "SELECT title, year, rating, poster_url FROM movies ORDER BY rowid")
+            data = {}
+            for title, year, rating, poster_url in rows:
+                data[title] = Movie(title, year, rating, poster_url)
+        except sqlite3.Error as e:
+            print(f"Error reading SQLite file: {e}")
+            data = {}
+        return data
+
+
+    def _open_stream(self):
+        """
+        Runs the query for reading the movies row by row, SQLite fetches them as the cursor advances.
+
+        Returns:
+            Iterator of (title, Movie) pairs, in insertion order.
+        """
+        try:
+            rows = self.connection.execute(
+                "SELECT title, year, rating, poster_url FROM movies ORDER BY rowid")
+        except sqlite3.Error as e:
+            print(f"Error reading SQLite file: {e}")
+            return iter(())
+        return ((title, Movie(title, year, rating, poster_url)) for title, year, rating, poster_url in rows)
+
+
+    def _write_file(self, data: dict):
+        """
+        Writes/Overwrites movie data to the SQLite file in one transaction.
+
+        Args:
+            data (dict): Dictionary of Movie records to save.
+
+        Handles:
+            sqlite3.Error: If there is an error while writing to the database.
+        """
+        try:
+            with self._transaction():
+                self.connection.execute("DELETE FROM movies")
+                self.connection.executemany(
+                    "INSERT INTO movies (title, title_key, year, rating, poster_url) VALUES (?, ?, ?, ?, ?)",
+                    ((title, normalize_title(title), movie.raw_year, movie.raw_rating, movie.poster_url)
+                     for title, movie in data.items()))
+        except sqlite3.Error as e:
+            print(f"Error writing to file: {e}")
+
+
+    @instrumented("storage.add_movie")
+    def add_movie(self, title: str, year: str, rating: str, poster_url: str):
+        """
+        Adds a new movie to the SQLite file with a single statement.
+
+        An existing movie with the same title is overwritten in place.
+
+        Args:
+            title (str): Title of the movie.
+            year (int): Release year of the movie.
+            rating (float): Rating of the movie.
+            poster_url (str): URL to the movie's poster image.
+        """
+        with self._transaction():
+            self.connection.execute("""
+                INSERT INTO movies (title, title_key, year, rating, poster_url) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (title) DO UPDATE SET
+                    year = excluded.year, rating = excluded.rating, poster_url = excluded.poster_url""",
+                (title, normalize_title(title), year, rating, poster_url))
+            self._drop_stale_cache()
+            self._patch_cache(title, Movie(title, year, rating, poster_url))
+        self._refresh_cache_signature()
+        print(f"Movie {title} successfully added")
+
+
+    @instrumented("storage.add_movies")
+    def add_movies(self, movies: list):
+        """
+        Adds many movies to the SQLite file in one transaction.
+
+        Args:
+            movies (list): Tuples of (title, year, rating, poster_url), like the arguments of add_movie().
+        """
+        with self._transaction():
+            self.connection.executemany("""
+                INSERT INTO movies (title, title_key, year, rating, poster_url) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (title) DO UPDATE SET
+                    year = excluded.year, rating = excluded.rating, poster_url = excluded.poster_url""",
+                ((title, normalize_title(title), year, rating, poster_url)
+                 for title, year, rating, poster_url in movies))
+            self._drop_stale_cache()
+            for title, year, rating, poster_url in movies:
+                self._patch_cache(title, Movie(title, year, rating, poster_url))
+        self._refresh_cache_signature()
+        print(f"{len(movies)} movies successfully added")
+
+
+    @instrumented("storage.delete_movie")
+    def delete_movie(self, title: str):
+        """
+        Deletes a movie from the SQLite file, case-insensitive.
+
+        Args:
+            title (str): Title of the movie to delete.
+
+        Prints:
+            Success or failure message indicating if the movie was found and deleted.
+
+        Raises:
+            ValueError: If the title input fails validation.
+        """
+        self._validate_title(title)
+        movie = self.find_title(title)
+        if movie:
+            with self._transaction():
+                self.connection.execute("DELETE FROM movies WHERE title = ?", (movie,))
+                self._drop_stale_cache()
+                self._patch_cache(movie)
+            self._refresh_cache_signature()
+            print(f"Movie {movie} successfully deleted")
+        else:
+            print(f"Movie {title} doesn't exist!")
+
+
+    @instrumented("storage.update_movie")
+    def update_movie(self, title: str, rating: float):
+        """
+        Updates the rating of a movie in the SQLite file, case-insensitive.
+
+        Args:
+            title (str): Title of the movie to update.
+            rating (float): New rating for the movie.
+
+        Prints:
+            Success or failure message indicating, if the movie was found and updated.
+
+        Raises:
+            ValueError: If the title or rating input fails validation.
+        """
+        self._validate_title(title)
+        self._validate_rating(rating)
+        new_movie_rating_formated = str(rating) + "/10"
+        movie = self.find_title(title)
+        if movie:
+            with self._transaction():
+                self.connection.execute("UPDATE movies SET rating = ? WHERE title = ?",
+                                        (new_movie_rating_formated, movie))
+                self._drop_stale_cache()
+                old_info = self.cache.data.get(movie) if self.cache.data is not None else None
+                if old_info is not None:
+                    self._patch_cache(movie, old_info.updated({"rating": new_movie_rating_formated}))
+                else:
+                    self.cache.invalidate()
+            self._refresh_cache_signature()
+            print(f"Movie {movie} successfully updated")
+        else:
+            print(f"Movie {title} doesn't exist!")
+
+
+    def find_title(self, title: str):
+        """
+        Looks up the stored title matching the given title, case-insensitive, with the title_key index.
+
+        Like TitleIndex.lookup(), a title stored in exactly the given casing is preferred over
+        other titles that only differ in case, otherwise the first one added is returned.
+
+        Args:
+            title (str): Title of the movie in any casing.
+
+        Returns:
+            str or None: The title as stored, or None if there is no such movie.
+        """
+        row = self.connection.execute("SELECT title FROM movies WHERE title = ?", (title,)).fetchone()
+        if row is None:
+            row = self.connection.execute(
+                "SELECT title FROM movies WHERE title_key = ? ORDER BY rowid LIMIT 1",
+                (normalize_title(title),)).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,145 @@
+import json
+import unicodedata
+
+# Bump when the layout of the saved index changes, so old index files are rebuilt.
+INDEX_VERSION = 2
+
+
+def normalize_title(title: str):
+    """
+    Normalizes a title for case-insensitive comparison.
+
+    Args:
+        title (str): Title of a movie.
+
+    Returns:
+        str: The NFKC normalized, casefolded title.
+    """
+    return unicodedata.normalize("NFKC", title).casefold()
+
+
+class TitleIndex:
+    """
+    Maps normalized titles to the titles as they are stored, for O(1) case-insensitive lookups.
+
+    Titles that only differ in case share a normalized title. The first of them is kept in
+    titles, all further ones in others, so each of them can still be found and removing
+    one does not hide the others. others only has entries for such collisions.
+    """
+
+    def __init__(self):
+        """Initializes an empty TitleIndex."""
+        self.titles = {}
+        self.others = {}
+
+
+    def rebuild(self, movies: dict):
+        """
+        Builds the index from scratch.
+
+        Args:
+            movies (dict): The movie data, keys are the stored titles.
+        """
+        self.titles = {}
+        self.others = {}
+        for title in movies:
+            key = normalize_title(title)
+            if self.titles.setdefault(key, title) != title:
+                self.others.setdefault(key, []).append(title)
+
+
+    def add(self, title: str, info):
+        """
+        Adds a stored title to the index.
+
+        Args:
+            title (str): Title as stored.
+            info (Movie): The movie record, not used by this index.
+        """
+        key = normalize_title(title)
+        first = self.titles.setdefault(key, title)
+        if first != title and title not in self.others.get(key, ()):
+            self.others.setdefault(key, []).append(title)
+
+
+    def remove(self, title: str, info):
+        """
+        Removes a stored title from the index. The next title sharing its normalized title takes its place.
+
+        Args:
+            title (str): Title as stored.
+            info (Movie): The movie record, not used by this index.
+        """
+        key = normalize_title(title)
+        others = self.others.get(key)
+        if self.titles.get(key) == title:
+            if others:
+                self.titles[key] = others.pop(0)
+            else:
+                del self.titles[key]
+        elif others and title in others:
+            others.remove(title)
+        if others is not None and not others:
+            del self.others[key]
+
+
+    def lookup(self, title: str):
+        """
+        Finds the stored title for a title in any casing.
+
+        Args:
+            title (str): Title of the movie.
+
+        Returns:
+            str or None: The title as stored, the one with the same casing if several only differ
+                         in case, or None if there is no such movie.
+        """
+        key = normalize_title(title)
+        first = self.titles.get(key)
+        if first is None or first == title:
+            return first
+        if title in self.others.get(key, ()):
+            return title
+        return first
+
+
+    def save(self, path: str, signature: tuple):
+        """
+        Saves the index next to the data file.
+
+        Args:
+            path (str): Path of the index file.
+            signature (tuple): Signature of the data files the index was built from.
+
+        Handles:
+            IOError: If the index can not be written. The index is just rebuilt on the next load.
+        """
+        try:
+            with open(path, "w") as handle:
+                json.dump({"version": INDEX_VERSION, "signature": signature, "titles": self.titles,
+                           "others": self.others}, handle)
+        except IOError as e:
+            print(f"Error writing title index: {e}")
+
+
+    def load(self, path: str, signature: tuple):
+        """
+        Loads a saved index, if it was built from data files with the same signature and has the current layout.
+
+        Args:
+            path (str): Path of the index file.
+            signature (tuple): Current signature of the data files.
+
+        Returns:
+            bool: True if the index was loaded, False if it is missing or outdated.
+        """
+        try:
+            with open(path, "r") as handle:
+                saved = json.load(handle)
+        except (IOError, ValueError):
+            return False
+        if saved.get("version") != INDEX_VERSION or saved.get("signature") != json.loads(json.dumps(signature)):
+            return False
+        self.titles = saved["titles"]
+        self.others = saved["others"]
+        return True